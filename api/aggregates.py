@@ -0,0 +1,136 @@
+from collections import Counter
+
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import Card, Team
+from .squad import GROUP_OF_POSITION, POSITION_GROUPS
+
+# Agregados desnormalizados de los equipos
+#
+# Team guarda el número de cartas activas, la suma de medias y de ritmo y el
+# número de cartas por grupo de posiciones, así los resúmenes y validaciones
+# de un equipo se leen sin cargar sus cartas. Se mantienen por incrementos:
+#   - m2m_changed en Team.cards: se suma/resta lo de las cartas añadidas o quitadas
+#   - post_save de Card: diferencia entre los valores cargados y los nuevos
+#   - cards_changed / borrados: se recalculan los equipos afectados
+# El comando rebuild_team_aggregates comprueba y reconstruye todos.
+
+GROUP_FIELDS = {"GK": "gk_count", "DEF": "def_count", "MID": "mid_count", "FWD": "fwd_count"}
+AGGREGATE_FIELDS = Team.AGGREGATE_FIELDS
+
+# Campos de Card que afectan a los agregados
+TRACKED_CARD_FIELDS = ("active", "position", "overall_rating", "pace")
+
+
+def contribution(position, overall_rating, pace, active, sign=1):
+    """Lo que aporta una carta a los agregados de cada equipo en el que está."""
+    delta = Counter()
+    if not active:
+        return delta
+    delta["card_count"] += sign
+    delta["rating_total"] += sign * (overall_rating or 0)
+    delta["pace_total"] += sign * (pace or 0)
+    group = GROUP_OF_POSITION.get(position)
+    if group is not None:
+        delta[GROUP_FIELDS[group]] += sign
+    return delta
+
+
+def cards_delta(card_ids, sign=1):
+    """Aportación conjunta de varias cartas, con una consulta agrupada por posición."""
+    delta = Counter()
+    rows = (
+        Card.objects.filter(pk__in=card_ids, active=True)
+        .values("position")
+        .annotate(n=Count("id"), rating=Sum("overall_rating"), pace=Sum("pace"))
+    )
+    for row in rows:
+        delta["card_count"] += sign * row["n"]
+        delta["rating_total"] += sign * row["rating"]
+        delta["pace_total"] += sign * row["pace"]
+        group = GROUP_OF_POSITION.get(row["position"])
+        if group is not None:
+            delta[GROUP_FIELDS[group]] += sign * row["n"]
+    return delta
+
+
+def delta_updates(delta):
+    """Argumentos para queryset.update(): ``campo = campo + delta``."""
+    return {field: F(field) + value for field, value in delta.items() if value}
+
+
+def card_contribution_change(card):
+    """
+    Diferencia entre lo que aportaba la carta al cargarla y lo que aporta
+    ahora, o None si no se conocen los valores originales (p. ej. ``only()``).
+    """
+    loaded = getattr(card, "_loaded_values", None)
+    if loaded is None or any(field not in loaded for field in TRACKED_CARD_FIELDS):
+        return None
+    if all(loaded[field] == getattr(card, field) for field in TRACKED_CARD_FIELDS):
+        return Counter()
+
+    delta = contribution(card.position, card.overall_rating, card.pace, card.active)
+    delta.update(
+        contribution(
+            loaded["position"], loaded["overall_rating"], loaded["pace"], loaded["active"], sign=-1
+        )
+    )
+    return delta
+
+
+def computed_aggregates(queryset):
+    """Anota en cada equipo sus agregados calculados desde las cartas (prefijo ``calc_``)."""
+    active = Q(cards__active=True)
+    annotations = {
+        "calc_card_count": Count("cards", filter=active),
+        "calc_rating_total": Coalesce(Sum("cards__overall_rating", filter=active), 0),
+        "calc_pace_total": Coalesce(Sum("cards__pace", filter=active), 0),
+    }
+    for group, field in GROUP_FIELDS.items():
+        annotations[f"calc_{field}"] = Count(
+            "cards", filter=active & Q(cards__position__in=POSITION_GROUPS[group])
+        )
+    return queryset.annotate(**annotations)
+
+
+def refresh_team_aggregates(team_ids=None, batch_size=500, dry_run=False):
+    """
+    Recalcula los agregados de los equipos indicados (o de todos) y guarda
+    solo los que no coinciden. Devuelve cuántos equipos estaban desfasados
+    (con ``dry_run`` solo se cuentan, no se guardan).
+    """
+    queryset = Team.objects.order_by("id")
+    if team_ids is not None:
+        queryset = queryset.filter(pk__in=team_ids)
+
+    fixed = 0
+    last_id = 0
+    while True:
+        teams = list(computed_aggregates(queryset.filter(id__gt=last_id))[:batch_size])
+        if not teams:
+            return fixed
+        last_id = teams[-1].id
+
+        stale = []
+        now = timezone.now()
+        for team in teams:
+            values = {field: getattr(team, f"calc_{field}") for field in AGGREGATE_FIELDS}
+            if any(getattr(team, field) != value for field, value in values.items()):
+                for field, value in values.items():
+                    setattr(team, field, value)
+                team.updated_at = now
+                stale.append(team)
+        if stale and not dry_run:
+            # updated_at también: el ranking (api/leaderboard.py) se sincroniza con él
+            Team.objects.bulk_update(stale, AGGREGATE_FIELDS + ("updated_at",))
+        fixed += len(stale)
+
+
+def team_ids_for_cards(card_ids):
+    """Equipos que contienen alguna de las cartas."""
+    return set(
+        Team.cards.through.objects.filter(card_id__in=card_ids).values_list("team_id", flat=True)
+    )
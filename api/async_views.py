@@ -0,0 +1,108 @@
+from django.conf import settings
+from django.http import JsonResponse
+from django.views.decorators.http import require_GET
+from rest_framework import status
+from rest_framework.exceptions import APIException, NotFound
+from rest_framework.request import Request
+from rest_framework.utils.encoders import JSONEncoder
+
+from .cache import amodel_version, card_cache_stats, get_cache, response_cache_key
+from .filters import card_queryset, filter_cards
+from .models import Card, User
+from .pagination import CardKeysetPagination
+from .serializers import CardSerializer, TeamSerializer
+
+# Ruta de lectura asíncrona (ASGI)
+#
+# Versiones async de GET /cards/, /cards/<pk>/ y /users/<pk>/team/ bajo
+# /async/. Usan el ORM asíncrono (aget, async for) y la API asíncrona de la
+# caché, así un worker ASGI no queda bloqueado mientras espera a la base de
+# datos. Devuelven exactamente lo mismo que las vistas DRF (mismos
+# serializers, filtros, paginación y caché de cartas) pero sin ETag: el GET
+# condicional sigue en la ruta síncrona.
+#
+# DRF no tiene vistas asíncronas, así que son vistas de Django. La petición se
+# envuelve en un Request de DRF solo para reutilizar query_params en filtros
+# y paginación (no se autentica ni se lee el body).
+
+
+def json_response(data, status_code=status.HTTP_200_OK):
+    # Mismo encoder que el JSONRenderer de DRF
+    return JsonResponse(
+        data,
+        status=status_code,
+        safe=False,
+        encoder=JSONEncoder,
+        json_dumps_params={"ensure_ascii": False, "separators": (",", ":")},
+    )
+
+
+def error_response(exc):
+    detail = exc.detail if isinstance(exc.detail, (dict, list)) else {"detail": exc.detail}
+    return json_response(detail, exc.status_code)
+
+
+async def cached_card_response(request, compute):
+    """Misma caché versionada que CardCacheMixin, con la API asíncrona."""
+    cache = get_cache()
+    key = response_cache_key(request, await amodel_version("cards"))
+
+    data = await cache.aget(key)
+    if data is not None:
+        card_cache_stats.hit()
+        response = json_response(data)
+        response["X-Cache"] = "HIT"
+        return response
+
+    card_cache_stats.miss()
+    try:
+        data = await compute()
+    except APIException as exc:
+        return error_response(exc)
+    await cache.aset(key, data, getattr(settings, "CARD_CACHE_TIMEOUT", 300))
+    response = json_response(data)
+    response["X-Cache"] = "MISS"
+    return response
+
+
+@require_GET
+async def card_list(request):
+    request = Request(request)
+
+    async def compute():
+        queryset = filter_cards(card_queryset(request.query_params), request.query_params)
+        paginator = CardKeysetPagination()
+        cards = await paginator.apaginate_queryset(queryset, request)
+        serializer = CardSerializer(cards, many=True)
+        return paginator.get_paginated_response(serializer.data).data
+
+    return await cached_card_response(request, compute)
+
+
+@require_GET
+async def card_detail(request, pk):
+    request = Request(request)
+
+    async def compute():
+        try:
+            card = await Card.all_objects.aget(pk=pk)
+        except Card.DoesNotExist:
+            raise NotFound("No Card matches the given query.")
+        return CardSerializer(card).data
+
+    return await cached_card_response(request, compute)
+
+
+@require_GET
+async def user_team(request, pk):
+    try:
+        # Equipo y cartas activas precargados: serializar no hace más consultas
+        user = await User.objects.with_team().aget(pk=pk)
+    except User.DoesNotExist:
+        return json_response({"error": "Usuario no encontrado"}, status.HTTP_404_NOT_FOUND)
+
+    if not user.team:
+        return json_response(
+            {"error": "Este usuario no tiene equipo"}, status.HTTP_404_NOT_FOUND
+        )
+    return json_response(TeamSerializer(user.team).data)
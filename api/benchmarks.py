@@ -0,0 +1,209 @@
+import asyncio
+import json
+import shutil
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management import call_command
+from django.db import connections
+from django.test import override_settings
+
+from .timing import percentile
+
+# Utilidades comunes de los comandos de benchmark
+#
+# Las peticiones se lanzan dentro del proceso con el cliente de pruebas de
+# Django (WSGI) o el asíncrono (ASGI): se mide el coste de la vista, el ORM y
+# la base de datos sin ruido de red. Las latencias se devuelven en segundos.
+
+# Sin caché se mide la ruta completa (vista + ORM + base de datos)
+NO_CACHE = {"default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"}}
+
+
+def summarize(latencies, elapsed, errors=0):
+    """Resumen de una ejecución: peticiones/s y percentiles en milisegundos."""
+    values = sorted(latencies)
+    return {
+        "requests": len(values),
+        "errors": errors,
+        "elapsed_s": round(elapsed, 4),
+        "rps": round(len(values) / elapsed, 1) if elapsed > 0 else 0.0,
+        "p50_ms": round(percentile(values, 50) * 1000, 3),
+        "p95_ms": round(percentile(values, 95) * 1000, 3),
+        "p99_ms": round(percentile(values, 99) * 1000, 3),
+        "max_ms": round(values[-1] * 1000, 3) if values else 0.0,
+    }
+
+
+def format_summary(name, summary):
+    return (
+        f"{name:<28} {summary['rps']:>9,.1f} req/s  "
+        f"p50 {summary['p50_ms']:>8.2f} ms  p95 {summary['p95_ms']:>8.2f} ms  "
+        f"p99 {summary['p99_ms']:>8.2f} ms  errores {summary['errors']}"
+    )
+
+
+def run_threaded(make_request, total, concurrency):
+    """
+    Ejecuta ``total`` llamadas a ``make_request(state)`` repartidas entre
+    ``concurrency`` hilos. ``state`` es un diccionario propio de cada hilo
+    (p. ej. para guardar su cliente). ``make_request`` devuelve True si la
+    respuesta es correcta. Devuelve (latencias, segundos, errores).
+    """
+    latencies, errors = [], [0]
+    lock = threading.Lock()
+    remaining = [total]
+
+    def worker():
+        state = {}
+        try:
+            while True:
+                with lock:
+                    if remaining[0] <= 0:
+                        return
+                    remaining[0] -= 1
+                start = time.perf_counter()
+                ok = make_request(state)
+                latency = time.perf_counter() - start
+                with lock:
+                    latencies.append(latency)
+                    if not ok:
+                        errors[0] += 1
+        finally:
+            # Cada hilo abre su propia conexión a la base de datos
+            connections.close_all()
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, time.perf_counter() - start, errors[0]
+
+
+def run_until(make_request, concurrency, stop):
+    """
+    Como ``run_threaded`` pero sin número fijo de llamadas: los hilos siguen
+    hasta que se activa el ``threading.Event`` ``stop``.
+    """
+    latencies, errors = [], [0]
+    lock = threading.Lock()
+
+    def worker():
+        state = {}
+        try:
+            while not stop.is_set():
+                start = time.perf_counter()
+                ok = make_request(state)
+                latency = time.perf_counter() - start
+                with lock:
+                    latencies.append(latency)
+                    if not ok:
+                        errors[0] += 1
+        finally:
+            connections.close_all()
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, time.perf_counter() - start, errors[0]
+
+
+def run_async(make_request, total, concurrency):
+    """
+    Igual que ``run_threaded`` pero con corrutinas: ``make_request()`` es
+    asíncrona y hay como mucho ``concurrency`` peticiones en vuelo.
+    """
+
+    async def main():
+        latencies, errors = [], 0
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def one():
+            nonlocal errors
+            async with semaphore:
+                start = time.perf_counter()
+                ok = await make_request()
+                latencies.append(time.perf_counter() - start)
+                if not ok:
+                    errors += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(total)))
+        return latencies, time.perf_counter() - start, errors
+
+    return asyncio.run(main())
+
+
+def use_database(name):
+    """Apunta la conexión "default" a otro fichero SQLite."""
+    connections.close_all()
+    settings.DATABASES["default"]["NAME"] = name
+    connections["default"].settings_dict["NAME"] = name
+
+
+@contextmanager
+def temporary_database(prefix="bench_"):
+    """
+    Sustituye la base de datos por una temporal con la misma configuración
+    (pragmas incluidos) y las migraciones aplicadas; al salir se borra y se
+    vuelve a la original. Las réplicas se ignoran: no tienen estos datos.
+    """
+    tmp_dir = Path(tempfile.mkdtemp(prefix=prefix))
+    original_name = settings.DATABASES["default"]["NAME"]
+    use_database(tmp_dir / "bench.sqlite3")
+    try:
+        with override_settings(DATABASE_REPLICAS=[]):
+            call_command("migrate", verbosity=0)
+            yield tmp_dir
+    finally:
+        use_database(original_name)
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def result_key(result):
+    return result["scale"], result["route"]
+
+
+def compare_results(baseline, current, threshold=20.0, min_delta_ms=0.5):
+    """
+    Regresiones de ``current`` respecto a ``baseline`` (listas de resultados de
+    ``manage.py bench``): p95 más de un ``threshold`` % más lento (y al menos
+    ``min_delta_ms`` ms, para no avisar por ruido en rutas muy rápidas) o más
+    consultas SQL por petición. Solo se comparan las rutas presentes en ambos.
+    """
+    previous = {result_key(result): result for result in baseline}
+    regressions = []
+    for result in current:
+        before = previous.get(result_key(result))
+        if before is None:
+            continue
+        slower = result["p95_ms"] - before["p95_ms"]
+        if slower >= min_delta_ms and result["p95_ms"] > before["p95_ms"] * (1 + threshold / 100):
+            regressions.append(regression(result, before, "p95_ms"))
+        if result["queries"] > before["queries"]:
+            regressions.append(regression(result, before, "queries"))
+    return regressions
+
+
+def regression(result, before, metric):
+    return {
+        "scale": result["scale"],
+        "route": result["route"],
+        "metric": metric,
+        "before": before[metric],
+        "after": result[metric],
+    }
+
+
+def load_results(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)["results"]
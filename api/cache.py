@@ -0,0 +1,201 @@
+import hashlib
+import threading
+import time
+from datetime import datetime, timezone
+from urllib.parse import urlencode
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import F, Value
+from django.db.models.functions import Greatest
+from rest_framework.response import Response
+
+from .metrics import CACHE_REQUESTS
+from .models import DataVersion
+from .routers import PRIMARY
+
+# Caché de respuestas del catálogo de cartas
+#
+# Las respuestas de /cards/ y /cards/<pk>/ se guardan con una clave que incluye
+# la URL, los parámetros y la versión del catálogo. Cualquier escritura sobre
+# cartas sube la versión (ver api/signals.py), así que las entradas antiguas
+# dejan de usarse sin tener que borrarlas una a una; caducan solas.
+#
+# Las versiones están en la base de datos (DataVersion), no en la caché: con
+# varios procesos (o un comando como load_cards) cada uno tendría las suyas y
+# un proceso seguiría sirviendo lo que otro acaba de cambiar. Leerlas es una
+# consulta por clave primaria; la caché de respuestas puede seguir siendo
+# propia de cada proceso (LocMemCache).
+
+
+def get_cache():
+    return caches[getattr(settings, "CARD_CACHE_ALIAS", "default")]
+
+
+def _initial_versions(names):
+    """
+    Crea en el primario las versiones que faltan. Parten de la hora actual, así
+    nunca se reutiliza una versión antigua (p. ej. tras vaciar la tabla).
+    """
+    versions = {}
+    for name in names:
+        row, _ = DataVersion.objects.using(PRIMARY).get_or_create(
+            name=name, defaults={"version": time.time_ns()}
+        )
+        versions[name] = row.version
+    return versions
+
+
+def model_versions(*names):
+    """
+    Contadores de versión de varios conjuntos de datos ("cards", "users",
+    "teams") en una sola consulta. Cambian con cada escritura de cualquier
+    proceso, así que sirven para construir claves de caché y validadores HTTP.
+    """
+    versions = dict(DataVersion.objects.filter(name__in=names).values_list("name", "version"))
+    missing = [name for name in names if name not in versions]
+    if missing:
+        versions.update(_initial_versions(missing))
+    return tuple(versions[name] for name in names)
+
+
+def model_version(name):
+    """Contador de versión de un conjunto de datos (ver ``model_versions``)."""
+    return model_versions(name)[0]
+
+
+async def amodel_version(name):
+    """``model_version`` para vistas asíncronas (ORM asíncrono)."""
+    version = await DataVersion.objects.filter(name=name).values_list("version", flat=True).afirst()
+    if version is None:
+        version = (await sync_to_async(_initial_versions)([name]))[name]
+    return version
+
+
+def bump_model_version(name):
+    """
+    Sube la versión con un UPDATE atómico. Dentro de una transacción el
+    cambio se ve a la vez que los datos, al hacer commit. La nueva versión es
+    la hora actual (o la anterior + 1 si es mayor): así nunca se repite una
+    versión aunque la tabla vuelva a un estado anterior (copia de una réplica,
+    rollback) y las respuestas cacheadas con ella no se reutilizan.
+    """
+    version = Greatest(F("version") + 1, Value(time.time_ns()))
+    if not DataVersion.objects.filter(name=name).update(version=version):
+        # Sin fila (tabla vaciada): la nueva versión ya es distinta de todas
+        _initial_versions([name])
+
+
+def version_time(version):
+    """
+    Fecha de una versión: es la hora en nanosegundos de la última escritura
+    (ver bump_model_version), así que sirve de Last-Modified también para los
+    borrados, que no dejan ningún updated_at.
+    """
+    return datetime.fromtimestamp(version / 1e9, tz=timezone.utc)
+
+
+def memoize_for_versions(prefix, versions, compute):
+    """
+    Guarda el resultado de ``compute()`` mientras no cambien las versiones
+    indicadas. Sirve para no repetir agregados que solo cambian al escribir.
+    """
+    cache = get_cache()
+    key = f"{prefix}:{':'.join(str(v) for v in versions)}"
+    value = cache.get(key)
+    if value is None:
+        value = (compute(),)
+        cache.set(key, value, getattr(settings, "CARD_CACHE_TIMEOUT", 300))
+    return value[0]
+
+
+def catalogue_version():
+    """Versión actual del catálogo de cartas."""
+    return model_version("cards")
+
+
+def bump_catalogue_version():
+    """Invalida todas las respuestas cacheadas del catálogo."""
+    bump_model_version("cards")
+
+
+class CacheStats:
+    """
+    Contadores de aciertos y fallos de la caché (por proceso, thread-safe).
+    También se suman a /metrics/ con la etiqueta ``cache=name``.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def hit(self):
+        with self._lock:
+            self.hits += 1
+        CACHE_REQUESTS.inc(cache=self.name, result="hit")
+
+    def miss(self):
+        with self._lock:
+            self.misses += 1
+        CACHE_REQUESTS.inc(cache=self.name, result="miss")
+
+    def reset(self):
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+
+    def as_dict(self):
+        with self._lock:
+            hits, misses = self.hits, self.misses
+        total = hits + misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_ratio": round(hits / total, 4) if total else 0.0,
+        }
+
+
+card_cache_stats = CacheStats("cards")
+
+
+def response_cache_key(request, version):
+    """Clave de caché: versión + host + ruta + parámetros ordenados."""
+    params = urlencode(sorted(request.query_params.lists()), doseq=True)
+    url = f"{request.get_host()}{request.path}?{params}"
+    digest = hashlib.md5(url.encode("utf-8")).hexdigest()
+    return f"cards:response:{version}:{digest}"
+
+
+class CardCacheMixin:
+    """
+    Cachea las respuestas GET correctas (200) de las vistas de cartas. Se
+    guarda ``response.data`` y no el cuerpo renderizado, así sirve para
+    cualquier formato de salida.
+    """
+
+    def request_catalogue_version(self):
+        """Versión del catálogo leída una sola vez por petición (clave y ETag)."""
+        if getattr(self, "_catalogue_version", None) is None:
+            self._catalogue_version = catalogue_version()
+        return self._catalogue_version
+
+    def get(self, request, *args, **kwargs):
+        cache = get_cache()
+        key = response_cache_key(request, self.request_catalogue_version())
+
+        data = cache.get(key)
+        if data is not None:
+            card_cache_stats.hit()
+            response = Response(data)
+            response["X-Cache"] = "HIT"
+            return response
+
+        card_cache_stats.miss()
+        response = super().get(request, *args, **kwargs)
+        if response.status_code == 200:
+            cache.set(key, response.data, getattr(settings, "CARD_CACHE_TIMEOUT", 300))
+        response["X-Cache"] = "MISS"
+        return response
@@ -0,0 +1,71 @@
+import hashlib
+
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+# GET condicional (ETag / Last-Modified)
+#
+# Antes de serializar nada, la vista calcula sus validadores con una consulta
+# agregada barata (MAX(updated_at) sobre índices) y los contadores de versión
+# de api/cache.py. Si el cliente ya tiene esa versión (If-None-Match /
+# If-Modified-Since) se responde 304 sin cuerpo.
+#
+# En los listados la fecha es también la de la última versión: al borrar (o
+# archivar) filas MAX(updated_at) no cambia, o incluso baja, y el cliente que
+# solo manda If-Modified-Since recibiría un 304 con la carta borrada.
+
+
+class ConditionalGetMixin:
+    """
+    Las vistas implementan ``get_validators`` y devuelven ``(estado, fecha)``:
+    ``estado`` es cualquier valor que cambie cuando cambia la respuesta y
+    ``fecha`` la última modificación (datetime o None). Si devuelven None la
+    petición sigue su curso normal (p. ej. para que la vista responda 404).
+    """
+
+    def get_validators(self, request, *args, **kwargs):
+        return None
+
+    def check_not_modified(self, request, *args, **kwargs):
+        """Devuelve la respuesta 304 si el cliente tiene la versión actual, o None."""
+        self.conditional_etag = None
+        self.conditional_last_modified = None
+
+        validators = self.get_validators(request, *args, **kwargs)
+        if validators is None:
+            return None
+
+        state, last_modified = validators
+        # La representación depende también de la URL (filtros, cursor) y del formato
+        source = f"{state}|{request.get_full_path()}|{request.accepted_media_type}"
+        self.conditional_etag = quote_etag(hashlib.md5(source.encode("utf-8")).hexdigest())
+        if last_modified is not None:
+            self.conditional_last_modified = int(last_modified.timestamp())
+
+        response = get_conditional_response(
+            request,
+            etag=self.conditional_etag,
+            last_modified=self.conditional_last_modified,
+        )
+        if response is not None:
+            self.add_validator_headers(response)
+        return response
+
+    def add_validator_headers(self, response):
+        if self.conditional_etag and response.status_code in (200, 304):
+            response["ETag"] = self.conditional_etag
+            if self.conditional_last_modified is not None:
+                response["Last-Modified"] = http_date(self.conditional_last_modified)
+        return response
+
+    def get(self, request, *args, **kwargs):
+        not_modified = self.check_not_modified(request, *args, **kwargs)
+        if not_modified is not None:
+            return not_modified
+        return self.add_validator_headers(super().get(request, *args, **kwargs))
+
+
+def latest(*timestamps):
+    """La fecha más reciente de las que no son None."""
+    values = [ts for ts in timestamps if ts is not None]
+    return max(values) if values else None
@@ -0,0 +1,67 @@
+import csv
+
+from rest_framework.utils.encoders import JSONEncoder
+
+from .serializers import CardSerializer
+
+# Export en streaming del catálogo de cartas
+#
+# Se recorre el queryset con .values() e .iterator(chunk_size=...), así que en
+# memoria solo hay un bloque de filas cada vez, y las líneas se agrupan en
+# trozos de ~64 KB para no hacer una escritura por fila.
+
+EXPORT_FIELDS = CardSerializer.Meta.fields
+DEFAULT_CHUNK_SIZE = 2000
+BUFFER_SIZE = 64 * 1024
+
+
+def iter_rows(queryset, chunk_size=DEFAULT_CHUNK_SIZE):
+    return queryset.values(*EXPORT_FIELDS).iterator(chunk_size=chunk_size)
+
+
+def buffered(lines, size=BUFFER_SIZE):
+    """Agrupa líneas en bloques de ``size`` caracteres aproximadamente."""
+    buffer = []
+    length = 0
+    for line in lines:
+        buffer.append(line)
+        length += len(line)
+        if length >= size:
+            yield "".join(buffer)
+            buffer = []
+            length = 0
+    if buffer:
+        yield "".join(buffer)
+
+
+def ndjson_lines(rows):
+    encoder = JSONEncoder(ensure_ascii=False)
+    for row in rows:
+        yield encoder.encode(row) + "\n"
+
+
+class _Echo:
+    """Pseudo-fichero para csv.writer: devuelve la línea en lugar de guardarla."""
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(EXPORT_FIELDS)
+    encoder = JSONEncoder()
+    for row in rows:
+        yield writer.writerow(
+            [
+                encoder.default(row[field]) if hasattr(row[field], "isoformat") else row[field]
+                for field in EXPORT_FIELDS
+            ]
+        )
+
+
+def stream_cards(queryset, fmt, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Generador con el contenido del export en el formato pedido (ndjson o csv)."""
+    rows = iter_rows(queryset, chunk_size)
+    lines = csv_lines(rows) if fmt == "csv" else ndjson_lines(rows)
+    return buffered(lines)
@@ -0,0 +1,63 @@
+from django.core.exceptions import ValidationError as DjangoValidationError
+from rest_framework.relations import (
+    MANY_RELATION_KWARGS,
+    ManyRelatedField,
+    PrimaryKeyRelatedField,
+)
+
+# Campos de relación por lotes
+#
+# PrimaryKeyRelatedField(many=True) resuelve cada id con un queryset.get(pk=...),
+# es decir, una consulta por id. Estos campos resuelven la lista completa con
+# una sola consulta pk__in, con los mismos mensajes de error y devolviendo los
+# objetos en el orden (y con las repeticiones) de la petición.
+
+_INVALID = object()
+
+
+class BulkManyRelatedField(ManyRelatedField):
+    def to_internal_value(self, data):
+        if isinstance(data, str) or not hasattr(data, "__iter__"):
+            self.fail("not_a_list", input_type=type(data).__name__)
+        if not self.allow_empty and len(data) == 0:
+            self.fail("empty")
+
+        return self.child_relation.to_internal_value_many(list(data))
+
+
+class BulkPrimaryKeyRelatedField(PrimaryKeyRelatedField):
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        list_kwargs = {"child_relation": cls(*args, **kwargs)}
+        for key in kwargs:
+            if key in MANY_RELATION_KWARGS:
+                list_kwargs[key] = kwargs[key]
+        return BulkManyRelatedField(**list_kwargs)
+
+    def to_pk(self, data):
+        """Convierte un id de la petición al tipo de la clave primaria, o _INVALID."""
+        if self.pk_field is not None:
+            data = self.pk_field.to_internal_value(data)
+        if isinstance(data, bool):
+            return _INVALID
+        try:
+            return self.get_queryset().model._meta.pk.to_python(data)
+        except (DjangoValidationError, TypeError, ValueError):
+            return _INVALID
+
+    def to_internal_value_many(self, data):
+        pks = [self.to_pk(item) for item in data]
+        valid = {pk for pk in pks if pk is not _INVALID and pk is not None}
+        objects = self.get_queryset().in_bulk(valid) if valid else {}
+
+        # Se recorre en el orden de la petición para fallar en el mismo id que
+        # fallaría la versión de una consulta por id
+        result = []
+        for item, pk in zip(data, pks):
+            if pk is _INVALID:
+                self.fail("incorrect_type", data_type=type(item).__name__)
+            obj = objects.get(pk)
+            if obj is None:
+                self.fail("does_not_exist", pk_value=item)
+            result.append(obj)
+        return result
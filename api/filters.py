@@ -0,0 +1,90 @@
+from rest_framework.exceptions import ValidationError
+
+from .models import Card
+from .ratings import STATS
+
+# Filtros y ordenación del listado de cartas
+#
+#   ?position=DC&league=Spain Primera Division      igualdad
+#   ?active=false                                   booleano (por defecto solo activas)
+#   ?pace_min=80&overall_rating_max=90              rangos (inclusivos)
+#   ?ordering=-pace                                 ordenación
+#
+# Las combinaciones habituales (posición/liga/club/país + media) tienen índices
+# compuestos y parciales (solo cartas activas) en Card, así que se resuelven
+# buscando en el índice.
+
+EQUALITY_FIELDS = ("position", "league", "club", "country")
+RANGE_FIELDS = STATS + ("overall_rating",)
+ORDERING_FIELDS = RANGE_FIELDS + ("name", "created_at", "id")
+DEFAULT_ORDERING = ("-overall_rating", "-id")
+
+TRUE_VALUES = {"true", "1", "yes"}
+FALSE_VALUES = {"false", "0", "no"}
+
+
+def parse_bool(name, value):
+    value = value.lower()
+    if value in TRUE_VALUES:
+        return True
+    if value in FALSE_VALUES:
+        return False
+    raise ValidationError({name: "Debe ser true o false."})
+
+
+def parse_int(name, value):
+    try:
+        return int(value)
+    except ValueError:
+        raise ValidationError({name: "Debe ser un número entero."})
+
+
+def card_queryset(params):
+    """
+    Cartas sobre las que se filtra: las activas (Card.objects), o todas si se
+    pide ``?active=`` explícitamente (el filtro se aplica en filter_cards).
+    """
+    return Card.all_objects.all() if "active" in params else Card.objects.all()
+
+
+def filter_cards(queryset, params):
+    """Aplica los filtros de la query string al queryset de cartas."""
+    filters = {}
+
+    for field in EQUALITY_FIELDS:
+        if field in params:
+            filters[field] = params[field]
+
+    if "active" in params:
+        filters["active"] = parse_bool("active", params["active"])
+
+    for field in RANGE_FIELDS:
+        if f"{field}_min" in params:
+            filters[f"{field}__gte"] = parse_int(f"{field}_min", params[f"{field}_min"])
+        if f"{field}_max" in params:
+            filters[f"{field}__lte"] = parse_int(f"{field}_max", params[f"{field}_max"])
+
+    return queryset.filter(**filters) if filters else queryset
+
+
+def card_ordering(params):
+    """
+    Ordenación pedida con ``?ordering=`` (un campo, con ``-`` para descendente).
+    Siempre termina en ``id`` para que el orden sea estable al paginar.
+    """
+    value = params.get("ordering")
+    if not value:
+        return DEFAULT_ORDERING
+
+    # Un solo "-": con "--pace" el campo sería "-pace", que no es válido
+    descending = value.startswith("-")
+    field = value[1:] if descending else value
+    if field not in ORDERING_FIELDS:
+        raise ValidationError(
+            {"ordering": f"Campo de ordenación no válido. Opciones: {', '.join(ORDERING_FIELDS)}"}
+        )
+
+    ordering = ("-" if descending else "") + field
+    if field == "id":
+        return (ordering,)
+    return (ordering, "-id" if descending else "id")
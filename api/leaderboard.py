@@ -0,0 +1,137 @@
+import bisect
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .cache import model_version
+from .models import Team
+
+# Ranking de equipos
+#
+# Cada proceso mantiene en memoria una lista ordenada (-puntuación, id) con
+# todos los equipos, así el top-K es un slice y la posición de un equipo una
+# búsqueda binaria. La puntuación es Team.rating_total (suma de medias de las
+# cartas activas, mantenida por api/aggregates.py).
+#
+# La lista se sincroniza al leer, si ha cambiado la versión "teams" de
+# api/cache.py (está en la base de datos y sube con cualquier cambio de
+# equipos o de sus cartas, lo haga este proceso, otro worker o un comando):
+#   - se leen los equipos con updated_at posterior a la última sincronización
+#     (menos un margen para transacciones que tardaron en hacer commit)
+#   - si el número de equipos no cuadra (borrados) se reconstruye entera con
+#     una sola consulta
+# Cada LEADERBOARD_FULL_REBUILD_INTERVAL segundos se reconstruye entera aunque
+# la versión no haya cambiado, por si alguna escritura no la subió.
+
+DEFAULT_SYNC_MARGIN = 5  # segundos
+DEFAULT_FULL_REBUILD_INTERVAL = 300  # segundos
+
+
+class Leaderboard:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self._entries = []  # (-puntuación, team_id), ordenada
+        self._teams = {}  # team_id -> (puntuación, nombre)
+        self.version = None
+        self.synced_at = None
+        self.rebuilt_at = 0.0
+
+    def __len__(self):
+        return len(self._entries)
+
+    # Mantenimiento de la lista
+
+    def _set(self, team_id, score, name):
+        current = self._teams.get(team_id)
+        if current is not None:
+            if current[0] == score:
+                self._teams[team_id] = (score, name)
+                return
+            self._remove(team_id)
+        bisect.insort(self._entries, (-score, team_id))
+        self._teams[team_id] = (score, name)
+
+    def _remove(self, team_id):
+        current = self._teams.pop(team_id, None)
+        if current is None:
+            return
+        index = bisect.bisect_left(self._entries, (-current[0], team_id))
+        del self._entries[index]
+
+    def rebuild(self):
+        rows = list(Team.objects.values_list("id", "rating_total", "name"))
+        self._entries = sorted((-score, team_id) for team_id, score, _ in rows)
+        self._teams = {team_id: (score, name) for team_id, score, name in rows}
+        self.rebuilt_at = time.monotonic()
+
+    def expired(self):
+        interval = getattr(
+            settings, "LEADERBOARD_FULL_REBUILD_INTERVAL", DEFAULT_FULL_REBUILD_INTERVAL
+        )
+        return time.monotonic() - self.rebuilt_at > interval
+
+    def sync(self):
+        """Pone la lista al día si la versión de los equipos ha cambiado o ha caducado."""
+        version = model_version("teams")
+        if version == self.version and not self.expired():
+            return
+
+        with self._lock:
+            if version == self.version and not self.expired():
+                return
+            # Se toma la hora antes de consultar: lo que cambie durante la
+            # consulta se vuelve a leer en la siguiente sincronización
+            now = timezone.now()
+            if self.synced_at is None or self.expired():
+                self.rebuild()
+            else:
+                margin = timedelta(
+                    seconds=getattr(settings, "LEADERBOARD_SYNC_MARGIN", DEFAULT_SYNC_MARGIN)
+                )
+                changed = Team.objects.filter(updated_at__gte=self.synced_at - margin)
+                for team_id, score, name in changed.values_list("id", "rating_total", "name"):
+                    self._set(team_id, score, name)
+                if Team.objects.count() != len(self._entries):
+                    self.rebuild()
+            self.synced_at = now
+            self.version = version
+
+    def team_deleted(self, team_id):
+        """Borrado en este proceso: se quita ya, sin esperar a la reconstrucción."""
+        with self._lock:
+            self._remove(team_id)
+
+    # Consultas
+
+    def top(self, limit, offset=0):
+        self.sync()
+        with self._lock:
+            return [self.entry(team_id) for _, team_id in self._entries[offset : offset + limit]]
+
+    def rank(self, team_id):
+        """Puesto del equipo (1 = primero; los empatados comparten puesto)."""
+        current = self._teams.get(team_id)
+        if current is None:
+            return None
+        return bisect.bisect_left(self._entries, (-current[0], float("-inf"))) + 1
+
+    def entry(self, team_id):
+        current = self._teams.get(team_id)
+        if current is None:
+            return None
+        score, name = current
+        return {"rank": self.rank(team_id), "team_id": team_id, "name": name, "score": score}
+
+    def team_entry(self, team_id):
+        self.sync()
+        with self._lock:
+            return self.entry(team_id)
+
+
+leaderboard = Leaderboard()
@@ -0,0 +1,96 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from api.models import Card, CardArchive
+
+DEFAULT_DAYS = 30
+DEFAULT_BATCH_SIZE = 1000
+
+# Campos que se copian tal cual de Card a CardArchive
+ARCHIVED_FIELDS = [
+    field.name
+    for field in CardArchive._meta.concrete_fields
+    if field.name not in ("id", "card_id", "archived_at")
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Mueve a CardArchive las cartas borradas (active=False) hace más de --days días "
+        "y que no están en ningún equipo, así la tabla de cartas solo tiene las que se usan."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=DEFAULT_DAYS,
+            help=f"Días desde el borrado para archivar una carta (por defecto {DEFAULT_DAYS}).",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=DEFAULT_BATCH_SIZE,
+            help=f"Cartas archivadas por transacción (por defecto {DEFAULT_BATCH_SIZE}).",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Solo cuenta las cartas que se archivarían.",
+        )
+
+    def handle(self, *args, **kwargs):
+        days = kwargs.get("days")
+        batch_size = kwargs.get("batch_size") or DEFAULT_BATCH_SIZE
+        if days is None or days < 0:
+            self.stdout.write(self.style.ERROR("❌ Los días no pueden ser negativos."))
+            return
+        if batch_size <= 0:
+            self.stdout.write(
+                self.style.ERROR("❌ El tamaño de lote debe ser mayor que 0.")
+            )
+            return
+
+        # Las cartas de algún equipo se quedan: al archivarlas desaparecerían de él
+        cutoff = timezone.now() - timedelta(days=days)
+        queryset = Card.all_objects.filter(
+            active=False, updated_at__lt=cutoff, teams__isnull=True
+        ).order_by("id")
+
+        if kwargs.get("dry_run"):
+            self.stdout.write(
+                self.style.WARNING(
+                    f"⚠️ {queryset.count()} cartas se archivarían "
+                    f"(borradas antes del {cutoff:%Y-%m-%d})"
+                )
+            )
+            return
+
+        start = time.perf_counter()
+        archived = 0
+        last_id = 0
+        while True:
+            rows = list(queryset.filter(id__gt=last_id).values("id", *ARCHIVED_FIELDS)[:batch_size])
+            if not rows:
+                break
+            last_id = rows[-1]["id"]
+            archived += self.archive_batch(rows)
+
+        elapsed = time.perf_counter() - start
+        self.stdout.write(
+            self.style.SUCCESS(f"✅ {archived} cartas archivadas ({elapsed:.2f} s)")
+        )
+
+    def archive_batch(self, rows):
+        ids = [row["id"] for row in rows]
+        with transaction.atomic():
+            CardArchive.objects.bulk_create(
+                [CardArchive(card_id=row.pop("id"), **row) for row in rows]
+            )
+            # delete() lanza post_delete: sube la versión del catálogo
+            Card.all_objects.filter(pk__in=ids).delete()
+        return len(ids)
@@ -0,0 +1,355 @@
+import io
+import itertools
+import json
+import platform
+import subprocess
+import time
+
+import django
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import AsyncClient, Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from api.benchmarks import (
+    NO_CACHE,
+    compare_results,
+    format_summary,
+    load_results,
+    run_async,
+    run_threaded,
+    summarize,
+    temporary_database,
+)
+from api.leaderboard import leaderboard
+from api.models import Card, Team, User
+from api.seeding import DEFAULT_FILE
+
+DEFAULT_SCALES = "600,10000,100000,1000000"
+DEFAULT_REQUESTS = 200
+DEFAULT_CONCURRENCY = 4
+DEFAULT_USERS = 50
+DEFAULT_TEAMS = 20
+DEFAULT_THRESHOLD = 20.0
+SEED_BATCH_SIZE = 5000
+BULK_ITEMS = 20  # elementos por petición en /cards/bulk/
+
+# Rutas de api/urls.py que no se miden, y por qué
+SKIPPED_ROUTES = {
+    "metrics": "desactivada por defecto; su coste depende de los ficheros de METRICS_DIR",
+    "profile-list": "herramienta de diagnóstico, desactivada por defecto",
+    "profile-download": "herramienta de diagnóstico, desactivada por defecto",
+}
+
+
+def endpoint(name, url, path, method="get", body=None, asgi=False, fraction=1.0):
+    """
+    Una petición del benchmark. ``url`` es el nombre de la ruta en api/urls.py,
+    ``body`` crea el JSON de cada petición, ``asgi`` la lanza con AsyncClient y
+    ``fraction`` reduce el número de peticiones de las rutas muy lentas.
+    """
+    return {
+        "name": name,
+        "url": url,
+        "path": path,
+        "method": method,
+        "body": body,
+        "asgi": asgi,
+        "fraction": fraction,
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark de todas las rutas de api/urls.py con el catálogo a varias escalas "
+        "(600 / 10k / 100k / 1M cartas): peticiones/s, p50/p95/p99 y consultas SQL por "
+        "petición. Usa una base de datos temporal por escala y puede guardar los "
+        "resultados en JSON y compararlos con una ejecución anterior."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--scales",
+            default=DEFAULT_SCALES,
+            help=f"Número de cartas de cada escala, separados por comas (por defecto {DEFAULT_SCALES}).",
+        )
+        parser.add_argument(
+            "--requests",
+            type=int,
+            default=DEFAULT_REQUESTS,
+            help=f"Peticiones por ruta (por defecto {DEFAULT_REQUESTS}; la exportación hace menos).",
+        )
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=DEFAULT_CONCURRENCY,
+            help=f"Peticiones simultáneas (por defecto {DEFAULT_CONCURRENCY}).",
+        )
+        parser.add_argument(
+            "--routes",
+            default="",
+            help="Solo las rutas cuyo nombre contenga alguno de estos textos (separados por comas).",
+        )
+        parser.add_argument(
+            "--cache",
+            action="store_true",
+            help="Usa la caché configurada (por defecto se desactiva para medir la base de datos).",
+        )
+        parser.add_argument("--output", help="Guarda los resultados en este fichero JSON.")
+        parser.add_argument(
+            "--compare",
+            help="JSON de una ejecución anterior: falla si alguna ruta empeora (ver --threshold).",
+        )
+        parser.add_argument(
+            "--threshold",
+            type=float,
+            default=DEFAULT_THRESHOLD,
+            help=f"Empeoramiento del p95 (en %%) que cuenta como regresión (por defecto {DEFAULT_THRESHOLD}).",
+        )
+
+    def handle(self, *args, **kwargs):
+        total = kwargs.get("requests") or DEFAULT_REQUESTS
+        concurrency = kwargs.get("concurrency") or DEFAULT_CONCURRENCY
+        try:
+            scales = [int(scale) for scale in kwargs.get("scales", DEFAULT_SCALES).split(",")]
+        except ValueError:
+            self.stdout.write(self.style.ERROR("❌ --scales debe ser una lista de números."))
+            return
+        if total <= 0 or concurrency <= 0 or any(scale <= 0 for scale in scales):
+            self.stdout.write(
+                self.style.ERROR("❌ --requests, --concurrency y las escalas deben ser mayores que 0.")
+            )
+            return
+        only = [name.strip() for name in (kwargs.get("routes") or "").split(",") if name.strip()]
+
+        overrides = {"ALLOWED_HOSTS": ["testserver"], "DEBUG": False}
+        if not kwargs.get("cache"):
+            overrides["CACHES"] = NO_CACHE
+
+        self.stdout.write(
+            f"🚀 Escalas {', '.join(f'{scale:,}' for scale in scales)} cartas, {total} peticiones "
+            f"por ruta, {concurrency} simultáneas{'' if kwargs.get('cache') else ' (sin caché)'}"
+        )
+        results = []
+        for scale in scales:
+            with temporary_database(prefix="bench_"):
+                fixtures = self.seed(scale)
+                with override_settings(**overrides):
+                    for cache in caches.all():
+                        cache.clear()
+                    leaderboard.reset()
+                    for route in self.routes(fixtures):
+                        if only and not any(name in route["name"] for name in only):
+                            continue
+                        results.append(self.bench_route(scale, route, total, concurrency))
+
+        report = {"meta": self.meta(total, concurrency, kwargs.get("cache")), "results": results}
+        if kwargs.get("output"):
+            with open(kwargs["output"], "w", encoding="utf-8") as f:
+                json.dump(report, f, indent=2, ensure_ascii=False)
+            self.stdout.write(f"💾 Resultados guardados en {kwargs['output']}")
+
+        if kwargs.get("compare"):
+            regressions = compare_results(
+                load_results(kwargs["compare"]), results, threshold=kwargs.get("threshold")
+            )
+            for item in regressions:
+                self.stdout.write(
+                    self.style.WARNING(
+                        f"⚠️ {item['route']} ({item['scale']:,} cartas): "
+                        f"{item['metric']} {item['before']} → {item['after']}"
+                    )
+                )
+            if regressions:
+                raise CommandError(f"❌ {len(regressions)} regresiones respecto a {kwargs['compare']}")
+        self.stdout.write(self.style.SUCCESS("✅ Benchmark terminado"))
+
+    # Datos de cada escala
+
+    def seed(self, scale):
+        """Cartas, usuarios y equipos legales del comando seed en la base de datos temporal."""
+        start = time.perf_counter()
+        call_command(
+            "seed",
+            cards=scale,
+            users=DEFAULT_USERS,
+            teams=DEFAULT_TEAMS,
+            batch_size=SEED_BATCH_SIZE,
+            stdout=io.StringIO(),
+        )
+        with open(DEFAULT_FILE, "r", encoding="utf-8") as f:
+            template = json.load(f)[0]
+
+        in_teams = set(Team.cards.through.objects.values_list("card_id", flat=True))
+        free_cards = list(
+            Card.objects.exclude(pk__in=in_teams)
+            .order_by("id")
+            .values_list("id", flat=True)[:BULK_ITEMS]
+        )
+        fixtures = {
+            "card_id": free_cards[0],
+            "free_cards": free_cards,
+            "user_id": User.objects.filter(team__isnull=False).values_list("id", flat=True).first(),
+            "template": template,
+        }
+        self.stdout.write(
+            f"📦 {scale:,} cartas, {DEFAULT_USERS} usuarios y {DEFAULT_TEAMS} equipos "
+            f"generados ({time.perf_counter() - start:.1f} s)"
+        )
+        return fixtures
+
+    def routes(self, fixtures):
+        """
+        Las peticiones medidas: al menos una por ruta de api/urls.py (``url``
+        es su nombre) salvo las de SKIPPED_ROUTES. Las de escritura crean o cambian objetos nuevos en cada
+        petición; DELETE de usuarios/equipos/cartas no se mide porque cada
+        petición solo puede hacerse una vez.
+        """
+        card_id, user_id = fixtures["card_id"], fixtures["user_id"]
+        template = fixtures["template"]
+        counter = itertools.count()
+
+        def new_card():
+            return {**template, "name": f"Bench {next(counter)}"}
+
+        def new_user():
+            n = next(counter)
+            return {"name": f"Bench {n}", "email": f"bench-new{n}@example.com"}
+
+        def changed_cards():
+            pace = next(counter) % 90 + 10
+            return [{"id": pk, "pace": pace} for pk in fixtures["free_cards"]]
+
+        return [
+            endpoint("GET /users/", "user-list-create", "/users/"),
+            endpoint("POST /users/", "user-list-create", "/users/", method="post", body=new_user),
+            endpoint("GET /users/<pk>/", "user-retrieve-update-destroy", f"/users/{user_id}/"),
+            endpoint("GET /cards/", "card-list-create", "/cards/?page_size=50"),
+            endpoint(
+                "GET /cards/?filtros",
+                "card-list-create",
+                "/cards/?position=DC&pace_min=70&ordering=-pace",
+            ),
+            endpoint("POST /cards/", "card-list-create", "/cards/", method="post", body=new_card),
+            endpoint("GET /cards/<pk>/", "card-retrieve-update-destroy", f"/cards/{card_id}/"),
+            endpoint("GET /cards/<pk>/similar/", "card-similar", f"/cards/{card_id}/similar/"),
+            endpoint(
+                "GET /cards/<pk>/percentiles/", "card-percentiles", f"/cards/{card_id}/percentiles/"
+            ),
+            endpoint(
+                "GET /cards/<pk>/similar/?group",
+                "card-similar",
+                f"/cards/{card_id}/similar/?group=MID&k=50",
+            ),
+            endpoint(
+                "PATCH /cards/<pk>/",
+                "card-retrieve-update-destroy",
+                f"/cards/{card_id}/",
+                method="patch",
+                body=lambda: {"pace": next(counter) % 90 + 10},
+            ),
+            endpoint(
+                "POST /cards/bulk/",
+                "card-bulk",
+                "/cards/bulk/",
+                method="post",
+                body=lambda: [new_card() for _ in range(BULK_ITEMS)],
+            ),
+            endpoint("PATCH /cards/bulk/", "card-bulk", "/cards/bulk/", method="patch", body=changed_cards),
+            # El catálogo entero en cada petición: se hacen menos
+            endpoint("GET /cards/export/", "card-export", "/cards/export/", fraction=0.02),
+            endpoint("GET /cards/cache/stats/", "card-cache-stats", "/cards/cache/stats/"),
+            endpoint("POST /squad/build/", "squad-build", "/squad/build/", method="post", body=dict),
+            endpoint("GET /teams/", "team-list-create", "/teams/"),
+            endpoint("GET /teams/<pk>/", "team-retrieve-update-destroy", f"/teams/{user_id}/"),
+            endpoint("GET /users/<pk>/team/", "user-team-view", f"/users/{user_id}/team/"),
+            endpoint("GET /users/<pk>/rank/", "user-rank", f"/users/{user_id}/rank/"),
+            endpoint(
+                "GET /users/<pk>/team/percentiles/",
+                "user-team-percentiles",
+                f"/users/{user_id}/team/percentiles/",
+            ),
+            endpoint("GET /leaderboard/", "leaderboard", "/leaderboard/?limit=50"),
+            endpoint("GET /timing/stats/", "timing-stats", "/timing/stats/"),
+            endpoint("GET /async/cards/", "async-card-list", "/async/cards/?page_size=50", asgi=True),
+            endpoint("GET /async/cards/<pk>/", "async-card-detail", f"/async/cards/{card_id}/", asgi=True),
+            endpoint(
+                "GET /async/users/<pk>/team/",
+                "async-user-team",
+                f"/async/users/{user_id}/team/",
+                asgi=True,
+            ),
+        ]
+
+    # Medidas
+
+    def request(self, client, route):
+        method = route["method"]
+        if method == "get":
+            return client.get(route["path"])
+        return getattr(client, method)(
+            route["path"], data=json.dumps(route["body"]()), content_type="application/json"
+        )
+
+    def bench_route(self, scale, route, total, concurrency):
+        # Una petición sola para contar consultas (y calentar la ruta)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.request(Client(), route)
+            if response.streaming:
+                b"".join(response.streaming_content)
+        status = response.status_code
+
+        runs = max(concurrency, int(total * route["fraction"]))
+        if route["asgi"]:
+            client = AsyncClient()
+
+            async def make_request():
+                response = await client.get(route["path"])
+                return response.status_code < 400
+
+            measured = run_async(make_request, runs, concurrency)
+        else:
+
+            def make_request(state):
+                response = self.request(state.setdefault("client", Client()), route)
+                if response.streaming:
+                    b"".join(response.streaming_content)
+                return response.status_code < 400
+
+            measured = run_threaded(make_request, runs, concurrency)
+
+        summary = summarize(*measured)
+        self.stdout.write(
+            f"{format_summary(route['name'], summary)}  consultas {len(queries)}"
+            f"{'' if status < 400 else f'  ❌ HTTP {status}'}"
+        )
+        return {
+            "scale": scale,
+            "route": route["name"],
+            "url": route["url"],
+            "status": status,
+            "queries": len(queries),
+            **summary,
+        }
+
+    def meta(self, total, concurrency, cache):
+        try:
+            commit = subprocess.run(
+                ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            commit = None
+        return {
+            "commit": commit,
+            "date": timezone.now().isoformat(),
+            "python": platform.python_version(),
+            "django": django.get_version(),
+            "db_profile": settings.DB_PROFILE,
+            "requests": total,
+            "concurrency": concurrency,
+            "cache": bool(cache),
+        }
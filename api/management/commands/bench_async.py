@@ -0,0 +1,99 @@
+from django.core.management.base import BaseCommand
+from django.test import AsyncClient, Client, override_settings
+
+from api.benchmarks import NO_CACHE, format_summary, run_async, run_threaded, summarize
+from api.models import Card, User
+
+DEFAULT_REQUESTS = 500
+DEFAULT_CONCURRENCY = 16
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara peticiones/s y latencias (p50/p95/p99) de las rutas de lectura "
+        "síncronas (WSGI) y asíncronas (/async/, ASGI) con peticiones concurrentes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--requests",
+            type=int,
+            default=DEFAULT_REQUESTS,
+            help=f"Peticiones por ruta (por defecto {DEFAULT_REQUESTS}).",
+        )
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=DEFAULT_CONCURRENCY,
+            help=f"Peticiones simultáneas (por defecto {DEFAULT_CONCURRENCY}).",
+        )
+        parser.add_argument(
+            "--cache",
+            action="store_true",
+            help="Usa la caché configurada (por defecto se desactiva para medir la base de datos).",
+        )
+
+    def handle(self, *args, **kwargs):
+        total = kwargs.get("requests") or DEFAULT_REQUESTS
+        concurrency = kwargs.get("concurrency") or DEFAULT_CONCURRENCY
+        if total <= 0 or concurrency <= 0:
+            self.stdout.write(
+                self.style.ERROR("❌ --requests y --concurrency deben ser mayores que 0.")
+            )
+            return
+
+        card_id = Card.objects.filter(active=True).values_list("id", flat=True).first()
+        if card_id is None:
+            self.stdout.write(
+                self.style.ERROR("❌ No hay cartas. Ejecuta antes: python manage.py load_cards")
+            )
+            return
+        user_id = (
+            User.objects.filter(team__isnull=False).values_list("id", flat=True).first()
+        )
+
+        routes = [
+            ("cards", "/cards/?page_size=50", "/async/cards/?page_size=50"),
+            ("card detail", f"/cards/{card_id}/", f"/async/cards/{card_id}/"),
+        ]
+        if user_id is not None:
+            routes.append(
+                ("user team", f"/users/{user_id}/team/", f"/async/users/{user_id}/team/")
+            )
+        else:
+            self.stdout.write(
+                self.style.WARNING("⚠️ Ningún usuario tiene equipo: se omite /users/<pk>/team/")
+            )
+
+        overrides = {"ALLOWED_HOSTS": ["testserver"], "DEBUG": False}
+        if not kwargs.get("cache"):
+            overrides["CACHES"] = NO_CACHE
+
+        self.stdout.write(
+            f"🚀 {total} peticiones por ruta, {concurrency} simultáneas"
+            f"{'' if kwargs.get('cache') else ' (sin caché)'}"
+        )
+        with override_settings(**overrides):
+            for name, sync_url, async_url in routes:
+                wsgi = summarize(*self.bench_wsgi(sync_url, total, concurrency))
+                asgi = summarize(*self.bench_asgi(async_url, total, concurrency))
+                self.stdout.write(format_summary(f"{name} (WSGI)", wsgi))
+                self.stdout.write(format_summary(f"{name} (ASGI)", asgi))
+
+        self.stdout.write(self.style.SUCCESS("✅ Benchmark terminado"))
+
+    def bench_wsgi(self, url, total, concurrency):
+        def make_request(state):
+            client = state.setdefault("client", Client())
+            return client.get(url).status_code == 200
+
+        return run_threaded(make_request, total, concurrency)
+
+    def bench_asgi(self, url, total, concurrency):
+        client = AsyncClient()
+
+        async def make_request():
+            response = await client.get(url)
+            return response.status_code == 200
+
+        return run_async(make_request, total, concurrency)
@@ -0,0 +1,144 @@
+import io
+import json
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connection, connections
+
+from api.benchmarks import format_summary, run_until, summarize, temporary_database
+from api.management.commands.load_cards import DEFAULT_FILE
+from api.models import Card
+
+DEFAULT_READERS = 4
+DEFAULT_CARDS = 3000
+DEFAULT_BASELINE_SECONDS = 2.0
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide lecturas/s y latencias de SQLite con el perfil actual (DB_PROFILE) "
+        "sin escrituras y mientras load_cards escribe. Usa una base de datos temporal."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--readers",
+            type=int,
+            default=DEFAULT_READERS,
+            help=f"Hilos lectores (por defecto {DEFAULT_READERS}).",
+        )
+        parser.add_argument(
+            "--cards",
+            type=int,
+            default=DEFAULT_CARDS,
+            help=f"Cartas que escribe load_cards durante la prueba (por defecto {DEFAULT_CARDS}).",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=100,
+            help="Lote de load_cards: lotes pequeños = más transacciones de escritura.",
+        )
+        parser.add_argument(
+            "--baseline-seconds",
+            type=float,
+            default=DEFAULT_BASELINE_SECONDS,
+            help="Duración de la medida sin escrituras.",
+        )
+
+    def handle(self, *args, **kwargs):
+        readers = kwargs.get("readers") or DEFAULT_READERS
+        cards = kwargs.get("cards") or DEFAULT_CARDS
+        batch_size = kwargs.get("batch_size") or 100
+        if readers <= 0 or cards <= 0 or batch_size <= 0:
+            self.stdout.write(
+                self.style.ERROR("❌ --readers, --cards y --batch-size deben ser mayores que 0.")
+            )
+            return
+
+        # Base de datos temporal con la misma configuración (pragmas incluidos)
+        with temporary_database(prefix="bench_db_") as tmp_dir:
+            call_command("load_cards", stdout=io.StringIO())
+
+            with connection.cursor() as cursor:
+                cursor.execute("PRAGMA journal_mode")
+                journal_mode = cursor.fetchone()[0]
+            self.stdout.write(
+                f"🚀 Perfil {settings.DB_PROFILE} (journal_mode={journal_mode}), "
+                f"{readers} lectores, {cards} cartas escritas en lotes de {batch_size}"
+            )
+
+            # 1️⃣ Solo lecturas
+            baseline = self.read_while(readers, lambda: time.sleep(kwargs.get("baseline_seconds")))
+            self.stdout.write(format_summary("lecturas sin escritor", baseline))
+
+            # 2️⃣ Lecturas mientras load_cards escribe
+            writer = {}
+
+            def write():
+                start = time.perf_counter()
+                try:
+                    call_command(
+                        "load_cards",
+                        file=self.cards_file(tmp_dir, cards),
+                        batch_size=batch_size,
+                        stdout=io.StringIO(),
+                    )
+                except OperationalError as exc:
+                    writer["error"] = str(exc)
+                finally:
+                    writer["elapsed"] = time.perf_counter() - start
+                    connections.close_all()
+
+            loaded = self.read_while(readers, write)
+            self.stdout.write(format_summary("lecturas con load_cards", loaded))
+
+            if "error" in writer:
+                self.stdout.write(self.style.ERROR(f"❌ load_cards falló: {writer['error']}"))
+            else:
+                rate = cards / writer["elapsed"] if writer["elapsed"] > 0 else 0.0
+                self.stdout.write(
+                    f"{'load_cards':<28} {rate:>9,.1f} cartas/s  ({writer['elapsed']:.2f} s)"
+                )
+            self.stdout.write(self.style.SUCCESS("✅ Benchmark terminado"))
+
+    def cards_file(self, tmp_dir, total):
+        """NDJSON con ``total`` cartas, repitiendo las del fichero por defecto."""
+        with open(DEFAULT_FILE, "r", encoding="utf-8") as f:
+            items = json.load(f)
+        path = Path(tmp_dir) / "cards.ndjson"
+        with open(path, "w", encoding="utf-8") as f:
+            for i in range(total):
+                f.write(json.dumps(items[i % len(items)]) + "\n")
+        return str(path)
+
+    def read_while(self, readers, task):
+        """Lectores concurrentes mientras se ejecuta ``task`` en otro hilo."""
+        stop = threading.Event()
+        max_id = Card.all_objects.order_by("-id").values_list("id", flat=True).first() or 1
+
+        def read(state):
+            state["n"] = state.get("n", 0) + 1
+            try:
+                # Lo mismo que hace el listado y el detalle de cartas
+                list(Card.objects.filter(active=True).order_by("-overall_rating", "-id")[:50])
+                Card.all_objects.filter(pk=state["n"] % max_id + 1).first()
+                return True
+            except OperationalError:
+                return False
+
+        def run_task():
+            try:
+                task()
+            finally:
+                stop.set()
+
+        thread = threading.Thread(target=run_task)
+        thread.start()
+        result = summarize(*run_until(read, readers, stop))
+        thread.join()
+        return result
@@ -1,71 +1,143 @@
 import json
+import time
+from itertools import islice
+
 from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from api.metrics import LOAD_CARDS_BATCH, LOAD_CARDS_CARDS, LOAD_CARDS_SECONDS
 from api.models import Card
+from api.ratings import rate_cards
+from api.signals import cards_changed
+
+DEFAULT_FILE = "api/data/cards.json"
+DEFAULT_BATCH_SIZE = 1000
 
 
 class Command(BaseCommand):
-    help = "Carga cartas desde un JSON (api/data/cards.json). Se puede limitar con --limit <número>."
+    help = (
+        "Carga cartas desde un JSON (api/data/cards.json) o un NDJSON en lotes con bulk_create. "
+        "Se puede limitar con --limit <número> y ajustar el tamaño de lote con --batch-size."
+    )
 
     def add_arguments(self, parser):
         parser.add_argument(
             "--limit",
             type=int,
             default=None,
-            help="Número de cartas a cargar (entre 0 y 600). Si no se indica, se cargan todas.",
+            help="Número máximo de cartas a cargar. Si no se indica, se cargan todas.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=DEFAULT_BATCH_SIZE,
+            help=f"Cartas insertadas por transacción (por defecto {DEFAULT_BATCH_SIZE}).",
+        )
+        parser.add_argument(
+            "--file",
+            default=DEFAULT_FILE,
+            help="Fichero de cartas: JSON (lista) o NDJSON (.ndjson/.jsonl, una carta por línea).",
         )
 
     def handle(self, *args, **kwargs):
-        file_path = "api/data/cards.json"
+        file_path = kwargs.get("file") or DEFAULT_FILE
         limit = kwargs.get("limit")
+        batch_size = kwargs.get("batch_size") or DEFAULT_BATCH_SIZE
+
+        # Validar argumentos
+        if limit is not None and limit < 0:
+            self.stdout.write(self.style.ERROR("❌ El límite no puede ser negativo."))
+            return
+        if batch_size <= 0:
+            self.stdout.write(
+                self.style.ERROR("❌ El tamaño de lote debe ser mayor que 0.")
+            )
+            return
 
         try:
-            with open(file_path, "r", encoding="utf-8") as f:
-                data = json.load(f)
-
-            # Validar límite
-            if limit is not None:
-                if limit < 0 or limit > 600:
-                    self.stdout.write(
-                        self.style.ERROR("❌ El límite debe estar entre 0 y 600.")
-                    )
-                    return
-                data = data[:limit]
-
-            cards = []
-            for item in data:
-                card = Card(
-                    name=item.get("name"),
-                    country=item.get("country"),
-                    club=item.get("club"),
-                    league=item.get("league"),
-                    position=item.get("position"),
-                    pace=item.get("pace", 0),
-                    shooting=item.get("shooting", 0),
-                    passing=item.get("passing", 0),
-                    dribbling=item.get("dribbling", 0),
-                    defending=item.get("defending", 0),
-                    physical=item.get("physical", 0),
-                    diving=item.get("diving", 0),
-                    reflexes=item.get("reflexes", 0),
-                    handling=item.get("handling", 0),
-                    positioning=item.get("positioning", 0),
-                    kicking=item.get("kicking", 0),
-                    speed=item.get("speed", 0),
-                )
-                card.save()
-                cards.append(card)
+            start = time.perf_counter()
+            total = 0
+
+            items = islice(self.read_items(file_path), limit)
+            while True:
+                batch = [self.build_card(item) for item in islice(items, batch_size)]
+                if not batch:
+                    break
+                total += self.insert_batch(batch)
 
+            elapsed = time.perf_counter() - start
+            rate = total / elapsed if elapsed > 0 else 0.0
             self.stdout.write(
                 self.style.SUCCESS(
-                    f"✅ {len(cards)} cartas cargadas satisfactoriamente!"
+                    f"✅ {total} cartas cargadas satisfactoriamente! "
+                    f"({elapsed:.2f} s, {rate:,.0f} cartas/s)"
                 )
             )
 
         except FileNotFoundError:
-            self.stdout.write(
-                self.style.ERROR("❌ Archivo no encontrado: api/data/cards.json")
-            )
+            self.stdout.write(self.style.ERROR(f"❌ Archivo no encontrado: {file_path}"))
         except json.JSONDecodeError:
             self.stdout.write(self.style.ERROR("❌ Formato JSON inválido"))
         except KeyError as e:
             self.stdout.write(self.style.ERROR(f"❌ Faltan campos en el JSON: {e}"))
+
+    def read_items(self, file_path):
+        """
+        Devuelve un iterador con las cartas del fichero. Los NDJSON se leen línea
+        a línea, así que la memoria no depende del tamaño del fichero.
+        """
+        if file_path.endswith((".ndjson", ".jsonl")):
+            return self.read_ndjson(file_path)
+
+        with open(file_path, "r", encoding="utf-8") as f:
+            return iter(json.load(f))
+
+    def read_ndjson(self, file_path):
+        with open(file_path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    yield json.loads(line)
+
+    def build_card(self, item):
+        return Card(
+            name=item.get("name"),
+            country=item.get("country"),
+            club=item.get("club"),
+            league=item.get("league"),
+            position=item.get("position"),
+            pace=item.get("pace", 0),
+            shooting=item.get("shooting", 0),
+            passing=item.get("passing", 0),
+            dribbling=item.get("dribbling", 0),
+            defending=item.get("defending", 0),
+            physical=item.get("physical", 0),
+            diving=item.get("diving", 0),
+            reflexes=item.get("reflexes", 0),
+            handling=item.get("handling", 0),
+            positioning=item.get("positioning", 0),
+            kicking=item.get("kicking", 0),
+            speed=item.get("speed", 0),
+        )
+
+    def insert_batch(self, cards):
+        start = time.perf_counter()
+        # bulk_create no llama a save(), así que la media de todo el lote se
+        # calcula antes de insertar con una sola operación vectorizada
+        rate_cards(cards)
+
+        # Un único INSERT por lote dentro de su propia transacción
+        with transaction.atomic():
+            Card.objects.bulk_create(cards, batch_size=len(cards))
+
+        # bulk_create no lanza post_save: se avisa a cachés y agregados
+        cards_changed.send(
+            sender=Card, card_ids=[card.pk for card in cards], created=True
+        )
+
+        # Ritmo de importación en /metrics/ (METRICS_ENABLED)
+        elapsed = time.perf_counter() - start
+        LOAD_CARDS_CARDS.inc(len(cards))
+        LOAD_CARDS_SECONDS.inc(elapsed)
+        LOAD_CARDS_BATCH.observe(elapsed)
+        return len(cards)
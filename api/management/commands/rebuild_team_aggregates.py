@@ -0,0 +1,59 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.aggregates import refresh_team_aggregates
+from api.cache import bump_model_version
+from api.models import Team
+
+DEFAULT_BATCH_SIZE = 500
+
+
+class Command(BaseCommand):
+    help = (
+        "Comprueba los agregados desnormalizados de los equipos (número de cartas, "
+        "medias, cartas por posición) y corrige los que no coinciden con sus cartas."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="Solo informa de los equipos desfasados, sin corregirlos.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=DEFAULT_BATCH_SIZE,
+            help=f"Equipos revisados por consulta (por defecto {DEFAULT_BATCH_SIZE}).",
+        )
+
+    def handle(self, *args, **kwargs):
+        check = kwargs.get("check", False)
+        batch_size = kwargs.get("batch_size") or DEFAULT_BATCH_SIZE
+        if batch_size <= 0:
+            self.stdout.write(
+                self.style.ERROR("❌ El tamaño de lote debe ser mayor que 0.")
+            )
+            return
+
+        start = time.perf_counter()
+        total = Team.objects.count()
+        stale = refresh_team_aggregates(batch_size=batch_size, dry_run=check)
+        elapsed = time.perf_counter() - start
+
+        if check:
+            style = self.style.WARNING if stale else self.style.SUCCESS
+            icon = "⚠️" if stale else "✅"
+            self.stdout.write(
+                style(f"{icon} {total} equipos revisados, {stale} con agregados desfasados ({elapsed:.2f} s)")
+            )
+            return
+
+        if stale:
+            bump_model_version("teams")
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"✅ {total} equipos revisados, {stale} corregidos ({elapsed:.2f} s)"
+            )
+        )
@@ -0,0 +1,84 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from api.models import Card
+from api.ratings import STATS, rate_cards
+from api.signals import cards_changed
+
+DEFAULT_BATCH_SIZE = 2000
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcula overall_rating de todas las cartas por lotes y guarda solo "
+        "las que cambian con bulk_update."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=DEFAULT_BATCH_SIZE,
+            help=f"Cartas leídas y actualizadas por lote (por defecto {DEFAULT_BATCH_SIZE}).",
+        )
+
+    def handle(self, *args, **kwargs):
+        batch_size = kwargs.get("batch_size") or DEFAULT_BATCH_SIZE
+        if batch_size <= 0:
+            self.stdout.write(
+                self.style.ERROR("❌ El tamaño de lote debe ser mayor que 0.")
+            )
+            return
+
+        start = time.perf_counter()
+        processed = 0
+        updated = 0
+
+        for batch in self.iter_batches(batch_size):
+            processed += len(batch)
+            updated += self.update_batch(batch)
+
+        elapsed = time.perf_counter() - start
+        rate = processed / elapsed if elapsed > 0 else 0.0
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"✅ {processed} cartas revisadas, {updated} medias actualizadas "
+                f"({elapsed:.2f} s, {rate:,.0f} cartas/s)"
+            )
+        )
+
+    def iter_batches(self, batch_size):
+        """
+        Recorre la tabla por lotes ordenados por id (paginación por clave), así
+        cada consulta usa el índice de la clave primaria y la memoria no crece
+        con el tamaño de la tabla.
+        """
+        queryset = Card.all_objects.only("id", "position", "overall_rating", *STATS).order_by("id")
+        last_id = 0
+        while True:
+            batch = list(queryset.filter(id__gt=last_id)[:batch_size])
+            if not batch:
+                return
+            last_id = batch[-1].id
+            yield batch
+
+    def update_batch(self, cards):
+        previous = [card.overall_rating for card in cards]
+        rate_cards(cards)
+        changed = [
+            card for card, old in zip(cards, previous) if card.overall_rating != old
+        ]
+
+        if changed:
+            # bulk_update no rellena los campos auto_now
+            now = timezone.now()
+            for card in changed:
+                card.updated_at = now
+            with transaction.atomic():
+                Card.all_objects.bulk_update(changed, ["overall_rating", "updated_at"])
+            # bulk_update no lanza post_save: se avisa a cachés y agregados
+            cards_changed.send(sender=Card, card_ids=[card.pk for card in changed])
+        return len(changed)
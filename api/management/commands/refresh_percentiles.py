@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.percentiles import POSITIONS, refresh_percentiles
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcula los percentiles por posición de las stats y la media de las cartas activas "
+        "y los guarda en la base de datos. Pensado para lanzarlo periódicamente (cron)."
+    )
+
+    def handle(self, *args, **kwargs):
+        start = time.perf_counter()
+        table = refresh_percentiles()
+        elapsed = time.perf_counter() - start
+
+        cards = int(table.totals[:, 0].sum())
+        positions = int((table.totals[:, 0] > 0).sum())
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"✅ Percentiles recalculados: {cards} cartas activas en {positions} de "
+                f"{len(POSITIONS)} posiciones ({elapsed:.2f} s)"
+            )
+        )
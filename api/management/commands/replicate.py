@@ -0,0 +1,82 @@
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from api.cache import bump_model_version
+from api.routers import PRIMARY
+
+DEFAULT_PAGES = 1024  # páginas copiadas por paso (4 MB con páginas de 4 KiB)
+
+
+class Command(BaseCommand):
+    help = (
+        "Copia la base de datos primaria en las réplicas de lectura (DB_REPLICAS) "
+        "con la API de backup de SQLite, sin parar las escrituras."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--path",
+            action="append",
+            default=[],
+            help="Fichero destino (en lugar de las réplicas configuradas). Se puede repetir.",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=0,
+            help="Repite la copia cada N segundos hasta interrumpirlo (por defecto, una vez).",
+        )
+        parser.add_argument(
+            "--pages",
+            type=int,
+            default=DEFAULT_PAGES,
+            help=f"Páginas copiadas por paso; entre pasos pueden escribir otros (por defecto {DEFAULT_PAGES}).",
+        )
+
+    def handle(self, *args, **kwargs):
+        targets = kwargs.get("path") or [
+            str(settings.DATABASES[alias]["NAME"]) for alias in settings.DATABASE_REPLICAS
+        ]
+        interval = kwargs.get("interval") or 0
+        pages = kwargs.get("pages") or DEFAULT_PAGES
+
+        if not targets:
+            self.stdout.write(
+                self.style.ERROR("❌ No hay réplicas configuradas (DB_REPLICAS) ni --path.")
+            )
+            return
+        if pages <= 0:
+            self.stdout.write(self.style.ERROR("❌ El número de páginas debe ser mayor que 0."))
+            return
+
+        try:
+            while True:
+                self.replicate(targets, pages)
+                if interval <= 0:
+                    return
+                time.sleep(interval)
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.WARNING("⚠️ Replicación detenida."))
+
+    def replicate(self, targets, pages):
+        connection = connections[PRIMARY]
+        connection.ensure_connection()
+        start = time.perf_counter()
+        for target in targets:
+            destination = sqlite3.connect(target)
+            try:
+                connection.connection.backup(destination, pages=pages)
+            finally:
+                destination.close()
+        elapsed = time.perf_counter() - start
+
+        # Lo cacheado mientras las réplicas iban por detrás se descarta
+        for name in ("cards", "users", "teams"):
+            bump_model_version(name)
+        self.stdout.write(
+            self.style.SUCCESS(f"✅ {len(targets)} réplica(s) actualizadas ({elapsed:.2f} s)")
+        )
@@ -0,0 +1,170 @@
+import os
+import time
+from multiprocessing import Pool
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Max
+
+from api.cache import bump_model_version
+from api.models import Card, Team, User
+from api.seeding import CardPools, generate_card_chunk, generate_teams, generate_users
+
+DEFAULT_CARDS = 10000
+DEFAULT_USERS = 100
+DEFAULT_TEAMS = 50
+DEFAULT_BATCH_SIZE = 5000
+
+
+class Command(BaseCommand):
+    help = (
+        "Genera cartas, usuarios y equipos sintéticos a gran escala: estadísticas "
+        "realistas por posición, emails únicos y plantillas legales de 23 a 25 cartas. "
+        "Mismo --seed = mismos datos; las cartas se generan en varios procesos."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--cards",
+            type=int,
+            default=DEFAULT_CARDS,
+            help=f"Cartas a generar (por defecto {DEFAULT_CARDS}).",
+        )
+        parser.add_argument(
+            "--users",
+            type=int,
+            default=DEFAULT_USERS,
+            help=f"Usuarios a generar (por defecto {DEFAULT_USERS}).",
+        )
+        parser.add_argument(
+            "--teams",
+            type=int,
+            default=DEFAULT_TEAMS,
+            help=f"Equipos, asignados a los primeros usuarios generados (por defecto {DEFAULT_TEAMS}).",
+        )
+        parser.add_argument("--seed", type=int, default=0, help="Semilla (por defecto 0).")
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=DEFAULT_BATCH_SIZE,
+            help=f"Filas generadas e insertadas por bloque (por defecto {DEFAULT_BATCH_SIZE}).",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=os.cpu_count() or 1,
+            help="Procesos que generan cartas (por defecto, uno por CPU; 1 = sin procesos).",
+        )
+
+    def handle(self, *args, **kwargs):
+        cards = kwargs.get("cards", DEFAULT_CARDS)
+        users = kwargs.get("users", DEFAULT_USERS)
+        teams = kwargs.get("teams", DEFAULT_TEAMS)
+        seed = kwargs.get("seed") or 0
+        batch_size = kwargs.get("batch_size") or DEFAULT_BATCH_SIZE
+        workers = kwargs.get("workers") or 1
+
+        if min(cards, users, teams) < 0:
+            self.stdout.write(self.style.ERROR("❌ Las cantidades no pueden ser negativas."))
+            return
+        if batch_size <= 0 or workers <= 0:
+            self.stdout.write(
+                self.style.ERROR("❌ --batch-size y --workers deben ser mayores que 0.")
+            )
+            return
+        if teams > users:
+            self.stdout.write(
+                self.style.ERROR("❌ Cada equipo necesita un usuario: --teams no puede superar --users.")
+            )
+            return
+
+        start = time.perf_counter()
+        if cards:
+            self.seed_cards(cards, seed, batch_size, workers)
+            bump_model_version("cards")
+
+        team_ids = []
+        if teams:
+            pools = CardPools(
+                Card.objects.filter(active=True)
+                .values_list("id", "position", "overall_rating", "pace")
+                .iterator(chunk_size=batch_size)
+            )
+            missing = pools.missing()
+            if missing:
+                self.stdout.write(
+                    self.style.ERROR(
+                        f"❌ No hay cartas activas suficientes para formar equipos ({', '.join(missing)})."
+                    )
+                )
+                return
+            team_ids = self.seed_teams(pools, teams, seed, batch_size)
+            bump_model_version("teams")
+
+        if users:
+            self.seed_users(users, team_ids, seed, batch_size)
+            bump_model_version("users")
+
+        elapsed = time.perf_counter() - start
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"✅ {cards} cartas, {users} usuarios y {teams} equipos generados ({elapsed:.2f} s)"
+            )
+        )
+
+    def seed_cards(self, total, seed, batch_size, workers):
+        chunks = [
+            (seed, chunk, min(batch_size, total - offset))
+            for chunk, offset in enumerate(range(0, total, batch_size))
+        ]
+        start = time.perf_counter()
+        if workers == 1 or len(chunks) == 1:
+            self.insert_cards(map(generate_card_chunk, chunks), start)
+            return
+        # Los procesos solo generan; SQLite tiene un único escritor, así que
+        # los bloques se insertan aquí en orden mientras se generan los siguientes
+        with Pool(min(workers, len(chunks)), initializer=django.setup) as pool:
+            self.insert_cards(pool.imap(generate_card_chunk, chunks), start)
+
+    def insert_cards(self, chunks, start):
+        inserted = 0
+        for rows in chunks:
+            with transaction.atomic():
+                Card.objects.bulk_create([Card(**row) for row in rows], batch_size=len(rows))
+            inserted += len(rows)
+            rate = inserted / (time.perf_counter() - start)
+            self.stdout.write(f"📦 {inserted} cartas ({rate:,.0f} cartas/s)")
+
+    def seed_teams(self, pools, count, seed, batch_size):
+        generated = generate_teams(seed, pools, count)
+        first = (Team.objects.aggregate(last=Max("id"))["last"] or 0) + 1
+        through = Team.cards.through
+        team_ids = []
+        with transaction.atomic():
+            created = Team.objects.bulk_create(
+                [
+                    Team(name=f"Equipo {first + i}", **aggregates)
+                    for i, (_, aggregates) in enumerate(generated)
+                ],
+                batch_size=batch_size,
+            )
+            links = [
+                through(team_id=team.pk, card_id=card_id)
+                for team, (card_ids, _) in zip(created, generated)
+                for card_id in card_ids
+            ]
+            through.objects.bulk_create(links, batch_size=batch_size)
+            team_ids = [team.pk for team in created]
+        return team_ids
+
+    def seed_users(self, total, team_ids, seed, batch_size):
+        first = (User.objects.aggregate(last=Max("id"))["last"] or 0) + 1
+        for offset in range(0, total, batch_size):
+            rows = generate_users(seed, first + offset, min(batch_size, total - offset))
+            users = [
+                User(**row, team_id=team_ids[offset + i] if offset + i < len(team_ids) else None)
+                for i, row in enumerate(rows)
+            ]
+            with transaction.atomic():
+                User.objects.bulk_create(users, batch_size=len(users))
@@ -0,0 +1,374 @@
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+# Métricas en formato de texto de Prometheus (GET /metrics/)
+#
+# Con METRICS_ENABLED cada proceso guarda sus valores en un fichero propio,
+# METRICS_DIR/<pid>.db, mapeado en memoria: sumar a un contador es escribir 8
+# bytes bajo un lock, sin llamadas al sistema. Al pedir /metrics/ se leen y se
+# suman los ficheros de todos los procesos, así da igual qué worker responda,
+# y también cuentan los comandos (load_cards) que ya terminaron. Por eso los
+# ficheros no se borran al salir: METRICS_DIR se vacía al desplegar.
+#
+# Formato del fichero: cabecera de 8 bytes (bytes usados) y entradas
+#   [longitud de la clave: 4 bytes][clave utf-8 + relleno a 8][valor: double]
+# La entrada se escribe antes de actualizar la cabecera: quien lea a la vez
+# nunca ve una entrada a medias.
+
+INITIAL_SIZE = 64 * 1024
+HEADER = struct.Struct("<Q")
+KEY_LENGTH = struct.Struct("<I")
+VALUE = struct.Struct("<d")
+
+# Segundos por petición: de 5 ms a 10 s
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+BATCH_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+UNMATCHED_VIEW = "unmatched"  # peticiones que no resuelven a ninguna ruta
+
+
+def entry_size(key_length):
+    """Bytes de una entrada: la clave se rellena para alinear el valor a 8."""
+    return KEY_LENGTH.size + key_length + (-(KEY_LENGTH.size + key_length) % 8) + VALUE.size
+
+
+def read_entries(data, used):
+    """(clave, posición del valor, valor) de las entradas de un fichero."""
+    position = HEADER.size
+    while position < used:
+        (length,) = KEY_LENGTH.unpack_from(data, position)
+        key = bytes(data[position + KEY_LENGTH.size : position + KEY_LENGTH.size + length])
+        offset = position + entry_size(length) - VALUE.size
+        yield key.decode("utf-8"), offset, VALUE.unpack_from(data, offset)[0]
+        position = offset + VALUE.size
+
+
+class ProcessFile:
+    """Valores de un proceso en un fichero mapeado en memoria (thread-safe)."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.pid = os.getpid()
+        self._lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # Si el pid se reutiliza se sigue sumando sobre lo que ya había
+        self._file = open(self.path, "a+b")
+        size = os.fstat(self._file.fileno()).st_size
+        if size < INITIAL_SIZE:
+            self._file.truncate(INITIAL_SIZE)
+            size = INITIAL_SIZE
+        self._map = mmap.mmap(self._file.fileno(), size)
+        self._used = HEADER.unpack_from(self._map, 0)[0] or HEADER.size
+        self._offsets = {key: offset for key, offset, _ in read_entries(self._map, self._used)}
+
+    def inc(self, key, amount=1.0):
+        with self._lock:
+            offset = self._offsets.get(key)
+            if offset is None:
+                offset = self._add(key)
+            (value,) = VALUE.unpack_from(self._map, offset)
+            VALUE.pack_into(self._map, offset, value + amount)
+
+    def _add(self, key):
+        encoded = key.encode("utf-8")
+        size = entry_size(len(encoded))
+        if self._used + size > len(self._map):
+            self._grow(self._used + size)
+        KEY_LENGTH.pack_into(self._map, self._used, len(encoded))
+        start = self._used + KEY_LENGTH.size
+        self._map[start : start + len(encoded)] = encoded
+        offset = self._used + size - VALUE.size
+        VALUE.pack_into(self._map, offset, 0.0)
+        self._used += size
+        HEADER.pack_into(self._map, 0, self._used)
+        self._offsets[key] = offset
+        return offset
+
+    def _grow(self, needed):
+        size = len(self._map)
+        while size < needed:
+            size *= 2
+        self._map.close()
+        self._file.truncate(size)
+        self._map = mmap.mmap(self._file.fileno(), size)
+
+    def close(self):
+        with self._lock:
+            self._map.close()
+            self._file.close()
+
+
+def metrics_dir():
+    return Path(settings.METRICS_DIR)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def store():
+    """
+    Fichero de este proceso, o None si las métricas están desactivadas. Se
+    abre de nuevo tras un fork: el hijo no escribe en el fichero del padre.
+    """
+    global _store
+    if not getattr(settings, "METRICS_ENABLED", False):
+        return None
+    path = metrics_dir() / f"{os.getpid()}.db"
+    current = _store
+    if current is None or current.pid != os.getpid() or current.path != path:
+        with _store_lock:
+            current = _store
+            if current is None or current.pid != os.getpid() or current.path != path:
+                current = _store = ProcessFile(path)
+    return current
+
+
+def reset_metrics():
+    """Borra los ficheros de METRICS_DIR (todos los procesos)."""
+    global _store
+    with _store_lock:
+        if _store is not None and _store.pid == os.getpid():
+            _store.close()
+        _store = None
+    for path in metrics_dir().glob("*.db"):
+        path.unlink(missing_ok=True)
+
+
+def format_value(value):
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def escape(value):
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def sample_key(name, labels):
+    return json.dumps([name, labels], separators=(",", ":"))
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        registry[name] = self
+
+    def label_values(self, labels):
+        return [[label, str(labels[label])] for label in self.labels]
+
+    def samples(self, values):
+        """Líneas de la exposición a partir de {(muestra, etiquetas): valor}."""
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        values = store()
+        if values is not None:
+            values.inc(sample_key(self.name, self.label_values(labels)), amount)
+
+    def samples(self, values):
+        for (name, labels), value in sorted(values.items()):
+            if name == self.name:
+                yield name, labels, value
+
+
+class Histogram(Metric):
+    """
+    Cada observación suma en un solo cubo (el primero con ``le`` mayor o
+    igual); los acumulados que pide Prometheus se calculan al exponer.
+    """
+
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(float(bucket) for bucket in buckets)
+        self.bounds = [format_value(bucket) for bucket in self.buckets] + ["+Inf"]
+
+    def observe(self, value, **labels):
+        values = store()
+        if values is None:
+            return
+        label_values = self.label_values(labels)
+        le = self.bounds[bisect_left(self.buckets, value)]
+        values.inc(sample_key(f"{self.name}_bucket", label_values + [["le", le]]))
+        values.inc(sample_key(f"{self.name}_count", label_values))
+        values.inc(sample_key(f"{self.name}_sum", label_values), value)
+
+    def samples(self, values):
+        series = {}
+        for (name, labels), value in values.items():
+            if name == f"{self.name}_bucket":
+                *labels, (_, le) = labels
+                series.setdefault(tuple(labels), {})[le] = value
+            elif name in (f"{self.name}_count", f"{self.name}_sum"):
+                series.setdefault(labels, {})
+        for labels in sorted(series):
+            cumulative = 0.0
+            for le in self.bounds:
+                cumulative += series[labels].get(le, 0.0)
+                yield f"{self.name}_bucket", labels + (("le", le),), cumulative
+            yield f"{self.name}_count", labels, values.get((f"{self.name}_count", labels), 0.0)
+            yield f"{self.name}_sum", labels, values.get((f"{self.name}_sum", labels), 0.0)
+
+
+registry = {}
+
+REQUESTS = Counter(
+    "fifa_http_requests_total",
+    "Peticiones HTTP por ruta (nombre en api/urls.py), método y código de estado.",
+    ("view", "method", "status"),
+)
+REQUEST_DURATION = Histogram(
+    "fifa_http_request_duration_seconds",
+    "Duración de las peticiones HTTP por ruta y método.",
+    ("view", "method"),
+    LATENCY_BUCKETS,
+)
+REQUEST_QUERIES = Histogram(
+    "fifa_http_request_queries",
+    "Consultas SQL por petición, por ruta y método.",
+    ("view", "method"),
+    QUERY_BUCKETS,
+)
+CACHE_REQUESTS = Counter(
+    "fifa_cache_requests_total",
+    "Lecturas de la caché de respuestas por resultado (hit/miss).",
+    ("cache", "result"),
+)
+LOAD_CARDS_CARDS = Counter(
+    "fifa_load_cards_cards_total",
+    "Cartas insertadas por el comando load_cards.",
+)
+LOAD_CARDS_SECONDS = Counter(
+    "fifa_load_cards_seconds_total",
+    "Segundos insertando lotes en load_cards (cartas/s = cards_total / seconds_total).",
+)
+LOAD_CARDS_BATCH = Histogram(
+    "fifa_load_cards_batch_seconds",
+    "Duración de cada lote insertado por load_cards.",
+    buckets=BATCH_BUCKETS,
+)
+
+
+def collect():
+    """Suma los valores de todos los ficheros de METRICS_DIR."""
+    totals = {}
+    for path in sorted(metrics_dir().glob("*.db")):
+        try:
+            data = path.read_bytes()
+        except FileNotFoundError:
+            continue
+        if len(data) < HEADER.size:
+            continue
+        used = min(HEADER.unpack_from(data, 0)[0], len(data))
+        for key, _, value in read_entries(data, used):
+            name, labels = json.loads(key)
+            sample = (name, tuple(tuple(label) for label in labels))
+            totals[sample] = totals.get(sample, 0.0) + value
+    return totals
+
+
+def exposition():
+    """Texto de /metrics/ (formato de exposición 0.0.4 de Prometheus)."""
+    values = collect()
+    lines = []
+    for metric in registry.values():
+        lines.append(f"# HELP {metric.name} {metric.documentation}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        for name, labels, value in metric.samples(values):
+            if labels:
+                pairs = ",".join(f'{label}="{escape(v)}"' for label, v in labels)
+                name = f"{name}{{{pairs}}}"
+            lines.append(f"{name} {format_value(value)}")
+    return "\n".join(lines) + "\n"
+
+
+# Consultas de la petición en curso (objeto mutable: lo que se suma en los
+# hilos de sync_to_async se ve aquí)
+_queries = ContextVar("metrics_queries", default=None)
+
+
+def count_query(execute, sql, params, many, context):
+    counter = _queries.get()
+    if counter is not None:
+        counter[0] += 1
+    return execute(sql, params, many, context)
+
+
+def install_query_counter(connection, **kwargs):
+    if count_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(count_query)
+
+
+def view_name(request):
+    match = getattr(request, "resolver_match", None)
+    return match.url_name if match is not None and match.url_name else UNMATCHED_VIEW
+
+
+class MetricsMiddleware:
+    """
+    Middleware opcional (METRICS_ENABLED): peticiones, latencia y consultas
+    por ruta. Va al principio de MIDDLEWARE para medir la petición entera.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, "METRICS_ENABLED", False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        connection_created.connect(install_query_counter, dispatch_uid="api.metrics")
+        for connection in connections.all(initialized_only=True):
+            install_query_counter(connection)
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = _queries.set([0])
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+            self.record(request, response, start)
+            return response
+        finally:
+            _queries.reset(token)
+
+    async def __acall__(self, request):
+        token = _queries.set([0])
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+            self.record(request, response, start)
+            return response
+        finally:
+            _queries.reset(token)
+
+    def record(self, request, response, start):
+        elapsed = time.perf_counter() - start
+        view = view_name(request)
+        REQUESTS.inc(view=view, method=request.method, status=response.status_code)
+        REQUEST_DURATION.observe(elapsed, view=view, method=request.method)
+        REQUEST_QUERIES.observe(_queries.get()[0], view=view, method=request.method)
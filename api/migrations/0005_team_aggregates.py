@@ -0,0 +1,78 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:11
+
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import Coalesce
+
+# Copia de api.squad.POSITION_GROUPS: las migraciones no deben depender del código actual
+POSITION_GROUPS = {
+    'gk_count': ('POR',),
+    'def_count': ('DFC', 'LI', 'LD'),
+    'mid_count': ('MC', 'MCD', 'MCO', 'MI', 'MD'),
+    'fwd_count': ('EI', 'ED', 'DC', 'SD'),
+}
+
+
+def fill_team_aggregates(apps, schema_editor):
+    Team = apps.get_model('api', 'Team')
+    active = Q(cards__active=True)
+    annotations = {
+        'calc_card_count': Count('cards', filter=active),
+        'calc_rating_total': Coalesce(Sum('cards__overall_rating', filter=active), 0),
+        'calc_pace_total': Coalesce(Sum('cards__pace', filter=active), 0),
+    }
+    for field, positions in POSITION_GROUPS.items():
+        annotations[f'calc_{field}'] = Count('cards', filter=active & Q(cards__position__in=positions))
+
+    fields = [name[len('calc_'):] for name in annotations]
+    teams = list(Team.objects.annotate(**annotations))
+    for team in teams:
+        for field in fields:
+            setattr(team, field, getattr(team, f'calc_{field}'))
+    Team.objects.bulk_update(teams, fields, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='team',
+            name='card_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='team',
+            name='def_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='team',
+            name='fwd_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='team',
+            name='gk_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='team',
+            name='mid_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='team',
+            name='pace_total',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='team',
+            name='rating_total',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(fill_team_aggregates, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,92 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:41
+
+import django.db.models.manager
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_team_aggregates'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CardArchive',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('card_id', models.BigIntegerField(unique=True)),
+                ('name', models.CharField(max_length=100)),
+                ('country', models.CharField(max_length=50)),
+                ('club', models.CharField(max_length=100)),
+                ('league', models.CharField(max_length=100)),
+                ('position', models.CharField(choices=[('POR', 'Portero'), ('LD', 'Lateral Derecho'), ('DFC', 'Defensa Central'), ('LI', 'Lateral Izquierdo'), ('MCD', 'Medio Centro Defensivo'), ('MC', 'Medio Centro'), ('MCO', 'Medio Centro Ofensivo'), ('MI', 'Medio Izquierdo'), ('MD', 'Medio Derecho'), ('SD', 'Segundo Delantero'), ('EI', 'Extremo Izquierdo'), ('ED', 'Extremo Derecho'), ('DC', 'Delantero Centro')])),
+                ('pace', models.IntegerField()),
+                ('shooting', models.IntegerField()),
+                ('passing', models.IntegerField()),
+                ('dribbling', models.IntegerField()),
+                ('defending', models.IntegerField()),
+                ('physical', models.IntegerField()),
+                ('diving', models.IntegerField()),
+                ('reflexes', models.IntegerField()),
+                ('handling', models.IntegerField()),
+                ('positioning', models.IntegerField()),
+                ('kicking', models.IntegerField()),
+                ('speed', models.IntegerField()),
+                ('overall_rating', models.IntegerField(default=0)),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+        ),
+        migrations.AlterModelOptions(
+            name='card',
+            options={'default_manager_name': 'all_objects'},
+        ),
+        migrations.AlterModelManagers(
+            name='card',
+            managers=[
+                ('all_objects', django.db.models.manager.Manager()),
+            ],
+        ),
+        migrations.RemoveIndex(
+            model_name='card',
+            name='card_rating_id_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='card',
+            name='card_position_rating_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='card',
+            name='card_league_rating_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='card',
+            name='card_club_rating_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='card',
+            name='card_country_rating_idx',
+        ),
+        migrations.AddIndex(
+            model_name='card',
+            index=models.Index(condition=models.Q(('active', True)), fields=['overall_rating', 'id'], name='card_active_rating_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='card',
+            index=models.Index(condition=models.Q(('active', True)), fields=['position', 'overall_rating'], name='card_active_position_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='card',
+            index=models.Index(condition=models.Q(('active', True)), fields=['league', 'overall_rating'], name='card_active_league_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='card',
+            index=models.Index(condition=models.Q(('active', True)), fields=['club', 'overall_rating'], name='card_active_club_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='card',
+            index=models.Index(condition=models.Q(('active', True)), fields=['country', 'overall_rating'], name='card_active_country_idx'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:58
+
+import time
+
+from django.db import migrations, models
+
+
+def create_versions(apps, schema_editor):
+    DataVersion = apps.get_model("api", "DataVersion")
+    for name in ("cards", "users", "teams"):
+        DataVersion.objects.get_or_create(name=name, defaults={"version": time.time_ns()})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_card_active_manager_and_archive'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DataVersion',
+            fields=[
+                ('name', models.CharField(max_length=20, primary_key=True, serialize=False)),
+                ('version', models.BigIntegerField()),
+            ],
+        ),
+        migrations.RunPython(create_versions, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_data_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PercentileSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('computed_at', models.DateTimeField()),
+                ('version', models.BigIntegerField()),
+                ('counts', models.BinaryField()),
+                ('refreshing_since', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+    ]
@@ -1,8 +1,25 @@
 from django.db import models
 
+from .ratings import compute_ratings, stats_matrix
+
 # Modelos del proyecto
 
 
+class CardQuerySet(models.QuerySet):
+    def active(self):
+        return self.filter(active=True)
+
+
+class ActiveCardManager(models.Manager.from_queryset(CardQuerySet)):
+    """
+    ``Card.objects``: solo cartas activas. Las borradas (active=False) no
+    salen en los listados y las consultas usan los índices parciales de Card.
+    """
+
+    def get_queryset(self):
+        return super().get_queryset().filter(active=True)
+
+
 class Card(models.Model):
     POSICIONES = [
         ("POR", "Portero"),
@@ -45,158 +62,209 @@ class Card(models.Model):
     active = models.BooleanField(default=True)
     overall_rating = models.IntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    objects = ActiveCardManager()
+    # Todas las cartas, también las borradas: detalle, escrituras masivas y
+    # comandos. Es el manager por defecto de Django, así las relaciones
+    # (team.cards, card.teams) y bulk_update siguen viendo todas las filas
+    all_objects = CardQuerySet.as_manager()
+
+    class Meta:
+        default_manager_name = "all_objects"
+        # Índices parciales (WHERE active): solo contienen las cartas activas,
+        # así no crecen con las borradas. Los usa cualquier consulta de
+        # Card.objects o con filter(active=True)
+        indexes = [
+            # Orden del listado paginado por cursor (overall_rating, id)
+            models.Index(
+                fields=["overall_rating", "id"],
+                condition=models.Q(active=True),
+                name="card_active_rating_id_idx",
+            ),
+            # Filtros habituales del listado, ordenados por media
+            models.Index(
+                fields=["position", "overall_rating"],
+                condition=models.Q(active=True),
+                name="card_active_position_idx",
+            ),
+            models.Index(
+                fields=["league", "overall_rating"],
+                condition=models.Q(active=True),
+                name="card_active_league_idx",
+            ),
+            models.Index(
+                fields=["club", "overall_rating"],
+                condition=models.Q(active=True),
+                name="card_active_club_idx",
+            ),
+            models.Index(
+                fields=["country", "overall_rating"],
+                condition=models.Q(active=True),
+                name="card_active_country_idx",
+            ),
+        ]
 
     def __str__(self):
         return f"{self.name} ({self.position})"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        # Valores tal y como se leyeron: al guardar se compara con ellos para
+        # actualizar los agregados de los equipos (ver api/aggregates.py)
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
     def calculate_overall_rating(self):
         """
         Calcula la media general del jugador en función de su posición
         utilizando fórmulas específicas y realistas basadas en FIFA 16.
+        Las fórmulas están en la tabla de pesos de ``api.ratings``.
         """
+        return int(compute_ratings(stats_matrix([self]), [self.position])[0])
 
-        pos = self.position.upper()
-
-        # Portero - usa todos los atributos de portero
-        if pos in ["GK", "POR"]:
-            return round(
-                0.25 * self.diving +
-                0.25 * self.reflexes +
-                0.20 * self.handling +
-                0.15 * self.positioning +
-                0.10 * self.kicking +
-                0.05 * self.speed
-            )
-
-        # Defensa Central - prioriza defending y physical
-        elif pos in ["CB", "DFC"]:
-            return round(
-                0.35 * self.defending +
-                0.25 * self.physical +
-                0.15 * self.pace +
-                0.10 * self.passing +
-                0.08 * self.dribbling +
-                0.07 * self.shooting
-            )
-
-        # Lateral Derecho / Izquierdo - balance entre ataque y defensa
-        elif pos in ["RB", "LB", "LD", "LI"]:
-            return round(
-                0.25 * self.pace +
-                0.20 * self.defending +
-                0.18 * self.physical +
-                0.15 * self.dribbling +
-                0.12 * self.passing +
-                0.10 * self.shooting
-            )
-
-        # Mediocentro Defensivo - defensa y distribución
-        elif pos in ["CDM", "MCD"]:
-            return round(
-                0.25 * self.defending +
-                0.20 * self.physical +
-                0.18 * self.passing +
-                0.15 * self.dribbling +
-                0.12 * self.pace +
-                0.10 * self.shooting
-            )
-
-        # Mediocentro - juego completo
-        elif pos in ["CM", "MC"]:
-            return round(
-                0.22 * self.passing +
-                0.20 * self.dribbling +
-                0.18 * self.defending +
-                0.15 * self.physical +
-                0.13 * self.shooting +
-                0.12 * self.pace
-            )
-
-        # Medio Derecho / Izquierdo - velocidad y técnica
-        elif pos in ["RM", "LM", "MD", "MI"]:
-            return round(
-                0.25 * self.pace +
-                0.22 * self.dribbling +
-                0.20 * self.passing +
-                0.15 * self.shooting +
-                0.10 * self.physical +
-                0.08 * self.defending
-            )
+    def save(self, *args, **kwargs):
+        self.overall_rating = self.calculate_overall_rating()
+        super().save(*args, **kwargs)
 
-        # Mediocentro Ofensivo - creación de juego
-        elif pos in ["CAM", "MCO"]:
-            return round(
-                0.25 * self.dribbling +
-                0.22 * self.passing +
-                0.20 * self.shooting +
-                0.15 * self.pace +
-                0.10 * self.physical +
-                0.08 * self.defending
-            )
 
-        # Extremo Derecho / Izquierdo - velocidad y regate
-        elif pos in ["RW", "LW", "ED", "EI"]:
-            return round(
-                0.30 * self.pace +
-                0.25 * self.dribbling +
-                0.18 * self.shooting +
-                0.15 * self.passing +
-                0.12 * self.physical
-            )
+class CardArchive(models.Model):
+    """
+    Cartas borradas hace tiempo, sacadas de api_card con el comando
+    archive_cards para que la tabla de cartas solo tenga las que se usan.
+    """
 
-        # Segundo Delantero - técnica y definición
-        elif pos in ["CF", "SD"]:
-            return round(
-                0.25 * self.dribbling +
-                0.22 * self.shooting +
-                0.20 * self.passing +
-                0.15 * self.pace +
-                0.10 * self.physical +
-                0.08 * self.defending
-            )
+    card_id = models.BigIntegerField(unique=True)  # id que tenía en Card
+    name = models.CharField(max_length=100)
+    country = models.CharField(max_length=50)
+    club = models.CharField(max_length=100)
+    league = models.CharField(max_length=100)
+    position = models.CharField(choices=Card.POSICIONES)
 
-        # Delantero Centro - definición y físico
-        elif pos in ["ST", "DC"]:
-            return round(
-                0.30 * self.shooting +
-                0.20 * self.physical +
-                0.18 * self.dribbling +
-                0.15 * self.pace +
-                0.12 * self.passing +
-                0.05 * self.defending
-            )
+    pace = models.IntegerField()
+    shooting = models.IntegerField()
+    passing = models.IntegerField()
+    dribbling = models.IntegerField()
+    defending = models.IntegerField()
+    physical = models.IntegerField()
+    diving = models.IntegerField()
+    reflexes = models.IntegerField()
+    handling = models.IntegerField()
+    positioning = models.IntegerField()
+    kicking = models.IntegerField()
+    speed = models.IntegerField()
 
-        # Por defecto: promedio de stats básicas
-        stats = [
-            self.pace,
-            self.shooting,
-            self.passing,
-            self.dribbling,
-            self.defending,
-            self.physical,
-        ]
-        return round(sum(stats) / len(stats))
+    overall_rating = models.IntegerField(default=0)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()  # última modificación (el borrado)
+    archived_at = models.DateTimeField(auto_now_add=True, db_index=True)
 
-    def save(self, *args, **kwargs):
-        self.overall_rating = self.calculate_overall_rating()
-        super().save(*args, **kwargs)
+    def __str__(self):
+        return f"{self.name} ({self.position}, archivada)"
 
 
 class Team(models.Model):
     name = models.CharField(max_length=100)
     cards = models.ManyToManyField(Card, blank=True, related_name="teams")
     created_at = models.DateTimeField(auto_now_add=True)
+    # También se actualiza al cambiar sus cartas (ver api/signals.py)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    # Agregados de las cartas activas, mantenidos por api/aggregates.py
+    card_count = models.IntegerField(default=0)
+    rating_total = models.IntegerField(default=0)
+    pace_total = models.IntegerField(default=0)
+    gk_count = models.IntegerField(default=0)
+    def_count = models.IntegerField(default=0)
+    mid_count = models.IntegerField(default=0)
+    fwd_count = models.IntegerField(default=0)
+
+    AGGREGATE_FIELDS = (
+        "card_count",
+        "rating_total",
+        "pace_total",
+        "gk_count",
+        "def_count",
+        "mid_count",
+        "fwd_count",
+    )
 
     def __str__(self):
         return self.name
 
+    @property
+    def average_rating(self):
+        if not self.card_count:
+            return 0
+        return round(self.rating_total / self.card_count, 2)
+
+    def save(self, *args, **kwargs):
+        # Los agregados se actualizan en la base de datos con F(); guardar la
+        # instancia en memoria los pisaría con valores que pueden estar desfasados
+        if not self._state.adding and kwargs.get("update_fields") is None:
+            kwargs["update_fields"] = [
+                field.name
+                for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.AGGREGATE_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
+
+class UserQuerySet(models.QuerySet):
+    def with_team(self):
+        """
+        Carga el equipo de cada usuario (JOIN) y sus cartas activas en una sola
+        consulta adicional, sea cual sea el número de usuarios. Las cartas quedan
+        en ``team.active_cards``, que es lo que usa TeamSerializer.
+        """
+        return self.select_related("team").prefetch_related(
+            models.Prefetch(
+                "team__cards",
+                queryset=Card.objects.filter(active=True),
+                to_attr="active_cards",
+            )
+        )
+
 
 class User(models.Model):
     name = models.CharField(max_length=100)
     email = models.EmailField(unique=True)
     password = models.CharField(max_length=100)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
     team = models.OneToOneField(Team, on_delete=models.SET_NULL, null=True, blank=True)
 
+    objects = UserQuerySet.as_manager()
+
     def __str__(self):
         return self.name
+
+
+class DataVersion(models.Model):
+    """
+    Contador de versión de un conjunto de datos ("cards", "users", "teams").
+    Está en la base de datos para que lo compartan todos los procesos del
+    servidor y los comandos (ver api/cache.py).
+    """
+
+    name = models.CharField(max_length=20, primary_key=True)
+    version = models.BigIntegerField()
+
+    def __str__(self):
+        return f"{self.name}: {self.version}"
+
+
+class PercentileSnapshot(models.Model):
+    """
+    Tabla de percentiles por posición (api/percentiles.py) en una sola fila,
+    para que la compartan todos los procesos y el comando refresh_percentiles.
+    """
+
+    computed_at = models.DateTimeField()
+    version = models.BigIntegerField()  # versión del catálogo al calcularla
+    counts = models.BinaryField()  # int32 (posición, campo, valor)
+    refreshing_since = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Percentiles ({self.computed_at:%Y-%m-%d %H:%M:%S})"
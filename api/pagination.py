@@ -0,0 +1,238 @@
+import base64
+import binascii
+import datetime
+import json
+from collections import OrderedDict
+
+from django.core.exceptions import ValidationError
+from django.db import models
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+from .filters import DEFAULT_ORDERING, card_ordering
+
+# Paginación por clave (keyset / cursor)
+#
+# En lugar de OFFSET (que obliga a recorrer todas las filas anteriores) cada
+# página continúa a partir de los valores de la última fila de la anterior:
+#   WHERE (rating, id) < (último_rating, último_id) ORDER BY rating DESC, id DESC
+# Con un índice sobre las columnas de orden la página N cuesta lo mismo que la
+# primera, y no se hace ningún COUNT(*).
+
+
+def _cursor_default(value):
+    # Fechas con precisión completa: truncarlas rompería el orden entre páginas
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} no se puede usar en un cursor")
+
+
+def encode_cursor(values, reverse=False):
+    """Cursor opaco (base64) con los valores de la fila frontera."""
+    payload = json.dumps(
+        {"v": list(values), "r": reverse}, separators=(",", ":"), default=_cursor_default
+    )
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor, types):
+    """
+    Devuelve (valores, reverse) o lanza ValueError si el cursor no es válido,
+    también si algún valor no es del tipo de su columna (``types``).
+    """
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        values, reverse = payload["v"], bool(payload.get("r", False))
+    except (binascii.Error, UnicodeError, ValueError, TypeError, KeyError):
+        raise ValueError("Cursor inválido")
+    if not isinstance(values, list) or len(values) != len(types):
+        raise ValueError("Cursor inválido")
+    for value, expected in zip(values, types):
+        # bool es subclase de int: true/false no son un valor de columna
+        if isinstance(value, bool) or not isinstance(value, expected):
+            raise ValueError("Cursor inválido")
+    return values, reverse
+
+
+def parse_ordering(ordering):
+    """Convierte ("-overall_rating", "-id") en [("overall_rating", True), ("id", True)]."""
+    return [(field.lstrip("-"), field.startswith("-")) for field in ordering]
+
+
+def cursor_types(model, ordering):
+    """Tipo JSON de cada columna de orden: int para enteros, str para el resto."""
+    types = []
+    for field, _ in parse_ordering(ordering):
+        model_field = model._meta.get_field(field)
+        types.append(int if isinstance(model_field, models.IntegerField) else str)
+    return types
+
+
+def keyset_filter(ordering, values, reverse=False):
+    """
+    Condición que selecciona las filas situadas después de ``values`` según
+    ``ordering`` (o antes, si ``reverse``). La primera condición es un rango
+    sobre la primera columna para que la base de datos pueda usar el índice.
+    """
+    fields = parse_ordering(ordering)
+    condition = Q()
+    equal = Q()
+    for (field, descending), value in zip(fields, values):
+        lookup = "lt" if descending != reverse else "gt"
+        condition |= equal & Q(**{f"{field}__{lookup}": value})
+        equal &= Q(**{field: value})
+
+    first_field, first_descending = fields[0]
+    first_lookup = "lte" if first_descending != reverse else "gte"
+    return Q(**{f"{first_field}__{first_lookup}": values[0]}) & condition
+
+
+def keyset_order(ordering, reverse=False):
+    """Ordenación para la consulta; invertida al pedir la página anterior."""
+    if not reverse:
+        return list(ordering)
+    return [field[1:] if field.startswith("-") else f"-{field}" for field in ordering]
+
+
+def row_values(row, ordering):
+    """Valores de las columnas de orden de una fila (modelo o diccionario)."""
+    fields = [field for field, _ in parse_ordering(ordering)]
+    if isinstance(row, dict):
+        return [row[field] for field in fields]
+    return [getattr(row, field) for field in fields]
+
+
+class KeysetPagination(BasePagination):
+    """
+    Paginación por cursor sobre columnas indexadas. ``ordering`` debe acabar en
+    una columna única (normalmente ``id``) para que el orden sea estable.
+
+    La respuesta tiene el formato ``{"next": url, "previous": url, "results": [...]}``.
+    """
+
+    ordering = ("id",)
+    page_size = api_settings.PAGE_SIZE
+    page_size_query_param = "page_size"
+    max_page_size = 500
+    cursor_query_param = "cursor"
+    invalid_cursor_message = "Cursor inválido"
+
+    def get_ordering(self, request, queryset, view):
+        return self.ordering
+
+    def get_page_size(self, request):
+        page_size = self.page_size
+        if self.page_size_query_param in request.query_params:
+            try:
+                page_size = int(request.query_params[self.page_size_query_param])
+            except ValueError:
+                page_size = self.page_size
+            if page_size <= 0:
+                page_size = self.page_size
+        return min(page_size, self.max_page_size)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        queryset = self.page_queryset(queryset, request, view)
+        return self.finish_page(list(queryset))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """Igual que ``paginate_queryset`` pero con el ORM asíncrono."""
+        queryset = self.page_queryset(queryset, request, view)
+        return self.finish_page([row async for row in queryset])
+
+    def page_queryset(self, queryset, request, view=None):
+        """Consulta de la página pedida (todavía sin ejecutar)."""
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.current_ordering = self.get_ordering(request, queryset, view)
+
+        self.reverse = False
+        self.cursor_values = None
+        self.encoded_cursor = request.query_params.get(self.cursor_query_param)
+        if self.encoded_cursor:
+            try:
+                self.cursor_values, self.reverse = decode_cursor(
+                    self.encoded_cursor, cursor_types(queryset.model, self.current_ordering)
+                )
+                # Los valores se convierten al construir el filtro: una fecha
+                # mal formada falla aquí y no al ejecutar la consulta
+                queryset = queryset.filter(
+                    keyset_filter(self.current_ordering, self.cursor_values, self.reverse)
+                )
+            except (ValueError, TypeError, ValidationError):
+                raise NotFound(self.invalid_cursor_message)
+
+        queryset = queryset.order_by(*keyset_order(self.current_ordering, self.reverse))
+
+        # Se pide una fila de más para saber si hay otra página sin contar
+        return queryset[: self.page_size + 1]
+
+    def finish_page(self, rows):
+        encoded, reverse = self.encoded_cursor, self.reverse
+        has_more = len(rows) > self.page_size
+        rows = rows[: self.page_size]
+        if reverse:
+            rows.reverse()
+
+        if reverse:
+            self.has_next = bool(encoded)
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = bool(encoded)
+
+        self.first_values = row_values(rows[0], self.current_ordering) if rows else None
+        self.last_values = row_values(rows[-1], self.current_ordering) if rows else None
+        if not rows and encoded:
+            # Página vacía tras un cursor: se mantiene el enlace para volver
+            self.first_values = self.last_values = self.cursor_values
+        return rows
+
+    def get_next_link(self):
+        if not self.has_next or self.last_values is None:
+            return None
+        return self.build_link(encode_cursor(self.last_values))
+
+    def get_previous_link(self):
+        if not self.has_previous or self.first_values is None:
+            return None
+        return self.build_link(encode_cursor(self.first_values, reverse=True))
+
+    def build_link(self, cursor):
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def get_paginated_response(self, data):
+        return Response(
+            OrderedDict(
+                [
+                    ("next", self.get_next_link()),
+                    ("previous", self.get_previous_link()),
+                    ("results", data),
+                ]
+            )
+        )
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "previous": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
+
+
+class CardKeysetPagination(KeysetPagination):
+    # Por defecto las mejores cartas primero; id desempata entre cartas con la
+    # misma media. Se puede cambiar con ?ordering= (ver api/filters.py)
+    ordering = DEFAULT_ORDERING
+
+    def get_ordering(self, request, queryset, view):
+        return card_ordering(request.query_params)
@@ -0,0 +1,185 @@
+import threading
+from datetime import timedelta
+
+import numpy as np
+from django.conf import settings
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from .cache import catalogue_version
+from .models import Card, PercentileSnapshot
+from .ratings import STATS
+from .routers import PRIMARY
+
+# Percentiles por posición ("pace: 92, top 3% de los extremos")
+#
+# Las stats y la media son enteros de 0 a 99, así que la distribución
+# ordenada de cada (posición, campo) se guarda como un histograma de 100
+# casillas; con sus sumas acumuladas el percentil de un valor es una
+# consulta O(1), sin ordenar nada por petición.
+#
+# La tabla (13 posiciones × 13 campos × 100 valores, solo cartas activas) se
+# calcula con una consulta GROUP BY por campo y se guarda en la base de datos
+# (PercentileSnapshot, una sola fila), así todos los procesos usan la misma:
+#   - el comando refresh_percentiles la recalcula (para lanzarlo con cron)
+#   - si tiene más de PERCENTILES_MAX_AGE segundos y el catálogo ha cambiado,
+#     la recalcula la primera petición que la lee (un solo proceso, que marca
+#     la fila); el resto sigue usando la anterior mientras tanto
+# Cada proceso guarda una copia y solo vuelve a leer la tabla entera si cambia
+# su fecha de cálculo: por petición es una consulta por clave primaria.
+
+FIELDS = STATS + ("overall_rating",)
+POSITIONS = tuple(code for code, _ in Card.POSICIONES)
+MAX_VALUE = 99
+SHAPE = (len(POSITIONS), len(FIELDS), MAX_VALUE + 1)
+DEFAULT_MAX_AGE = 3600  # segundos
+REFRESH_TIMEOUT = 60  # segundos que otro proceso espera antes de recalcular también
+SNAPSHOT_ID = 1
+
+
+class PercentileTable:
+    def __init__(self, counts, computed_at, version):
+        self.counts = counts  # (posición, campo, valor) → número de cartas
+        self.computed_at = computed_at
+        self.version = version
+        # Cartas con un valor menor que cada valor (suma acumulada exclusiva)
+        self.below = np.cumsum(counts, axis=2) - counts
+        self.totals = counts.sum(axis=2)
+
+    @property
+    def stamp(self):
+        return self.computed_at.isoformat()
+
+    def lookup(self, position, field, value):
+        """
+        ``percentile``: % de cartas de la posición con un valor menor (los
+        empates cuentan la mitad). ``top``: % con un valor igual o mayor.
+        """
+        p, f = POSITIONS.index(position), FIELDS.index(field)
+        total = int(self.totals[p, f])
+        if not total:
+            return {"value": value, "percentile": None, "top": None, "cards": 0}
+        v = min(max(int(value), 0), MAX_VALUE)
+        below, equal = int(self.below[p, f, v]), int(self.counts[p, f, v])
+        return {
+            "value": value,
+            "percentile": round(100 * (below + equal / 2) / total, 1),
+            "top": round(100 * (total - below) / total, 1),
+            "cards": total,
+        }
+
+    def card(self, card):
+        """Percentiles de todos los campos de una carta frente a su posición."""
+        if card.position not in POSITIONS:
+            return {}
+        return {field: self.lookup(card.position, field, getattr(card, field)) for field in FIELDS}
+
+
+def compute_table():
+    """Histogramas de las cartas activas: una consulta GROUP BY por campo."""
+    # Versión antes de leer: si algo cambia durante el cálculo, se recalculará
+    version = catalogue_version()
+    computed_at = timezone.now()
+    counts = np.zeros(SHAPE, dtype=np.int64)
+    position_index = {position: i for i, position in enumerate(POSITIONS)}
+    for f, field in enumerate(FIELDS):
+        rows = Card.objects.values_list("position", field).annotate(n=Count("id")).order_by()
+        for position, value, n in rows:
+            p = position_index.get(position)
+            if p is not None and value is not None:
+                counts[p, f, min(max(value, 0), MAX_VALUE)] += n
+    return PercentileTable(counts, computed_at, version)
+
+
+def save_table(table):
+    """Guarda la tabla en la base de datos para todos los procesos."""
+    # Siempre en el primario, sin pasar por el router: guardarla durante una
+    # petición de lectura no la convierte en una petición que escribe
+    PercentileSnapshot.objects.using(PRIMARY).update_or_create(
+        pk=SNAPSHOT_ID,
+        defaults={
+            "computed_at": table.computed_at,
+            "version": table.version,
+            "counts": table.counts.astype(np.int32).tobytes(),
+            "refreshing_since": None,
+        },
+    )
+
+
+def refresh_percentiles():
+    """Recalcula la tabla y la publica para todos los procesos."""
+    table = compute_table()
+    save_table(table)
+    _local.table = table
+    return table
+
+
+class _Local:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.table = None
+
+
+_local = _Local()
+
+
+def reset_percentiles():
+    """Olvida la tabla: la guardada en la base de datos y la copia de este proceso."""
+    PercentileSnapshot.objects.using(PRIMARY).filter(pk=SNAPSHOT_ID).delete()
+    _local.table = None
+
+
+def load_table():
+    """Tabla guardada (o la copia de este proceso si es la misma), o None."""
+    snapshot = PercentileSnapshot.objects.filter(pk=SNAPSHOT_ID)
+    computed_at = snapshot.values_list("computed_at", flat=True).first()
+    if computed_at is None:
+        return None
+    table = _local.table
+    if table is not None and table.computed_at == computed_at:
+        return table
+    row = snapshot.values("computed_at", "version", "counts").first()
+    if row is None:
+        return None
+    counts = np.frombuffer(bytes(row["counts"]), dtype=np.int32)
+    if counts.size != np.prod(SHAPE):
+        # Guardada con otras posiciones o campos: se recalcula
+        return None
+    table = PercentileTable(counts.reshape(SHAPE).astype(np.int64), row["computed_at"], row["version"])
+    _local.table = table
+    return table
+
+
+def claim_refresh(table):
+    """Marca la fila para que solo un proceso la recalcule. True si lo ha conseguido."""
+    now = timezone.now()
+    return bool(
+        PercentileSnapshot.objects.using(PRIMARY)
+        .filter(pk=SNAPSHOT_ID, computed_at=table.computed_at)
+        .filter(
+            Q(refreshing_since__isnull=True)
+            | Q(refreshing_since__lt=now - timedelta(seconds=REFRESH_TIMEOUT))
+        )
+        .update(refreshing_since=now)
+    )
+
+
+def percentile_table():
+    """
+    Tabla vigente. Solo se recalcula si no hay ninguna o si es más vieja que
+    PERCENTILES_MAX_AGE y el catálogo ha cambiado desde entonces; en ese caso
+    la recalcula un solo proceso (claim_refresh) y los demás usan la anterior.
+    """
+    table = load_table()
+    if table is None:
+        with _local.lock:
+            table = load_table()
+            if table is None:
+                return refresh_percentiles()
+        return table
+
+    max_age = getattr(settings, "PERCENTILES_MAX_AGE", DEFAULT_MAX_AGE)
+    age = (timezone.now() - table.computed_at).total_seconds()
+    if age > max_age and table.version != catalogue_version() and claim_refresh(table):
+        return refresh_percentiles()
+    return table
@@ -0,0 +1,246 @@
+import cProfile
+import hmac
+import json
+import re
+import sys
+import threading
+import time
+import tracemalloc
+import uuid
+from collections import Counter
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured, MiddlewareNotUsed
+from django.db import connection
+from django.utils import timezone
+
+# Perfiles bajo demanda de peticiones concretas
+#
+# Con REQUEST_PROFILING activado, una petición con la cabecera
+#   X-Profile: <REQUEST_PROFILING_SECRET>
+# ejecuta su vista (y el renderizado de la respuesta) dentro de:
+#   - cProfile (determinista): fichero .prof, para pstats o snakeviz
+#   - un muestreador que cada REQUEST_PROFILING_INTERVAL segundos anota la pila
+#     del hilo de la petición: fichero .collapsed ("a;b;c N" por línea), el
+#     formato de flamegraph.pl y speedscope
+#   - tracemalloc: las líneas que más memoria reservan durante la vista
+# X-Profile-Mode elige "cprofile", "sampling" o ambos ("all", por defecto).
+# La respuesta lleva X-Profile-Id y los ficheros se descargan desde
+# /profiles/<id>/<tipo>/ con la misma cabecera. Desactivado, el middleware se
+# quita de la cadena al arrancar: las demás peticiones no pagan nada.
+
+SECRET_HEADER = "X-Profile"
+MODE_HEADER = "X-Profile-Mode"
+MODES = ("all", "cprofile", "sampling")
+DEFAULT_INTERVAL = 0.001  # segundos entre muestras
+DEFAULT_KEEP = 50  # perfiles guardados; se borran los más antiguos
+MEMORY_TOP = 30  # líneas del informe de tracemalloc
+
+# Tipo de fichero → extensión y content type
+FILES = {
+    "pstats": (".prof", "application/octet-stream"),
+    "collapsed": (".collapsed", "text/plain; charset=utf-8"),
+    "memory": (".memory.txt", "text/plain; charset=utf-8"),
+    "meta": (".json", "application/json"),
+}
+PROFILE_ROUTES = {"profile-list", "profile-download"}
+PROFILE_ID = re.compile(r"^[0-9]{8}T[0-9]{12}-[0-9a-f]{8}$")
+
+# Los perfiles se hacen de uno en uno: tracemalloc es global del proceso (una
+# petición lo pararía en mitad de otra y take_snapshot() fallaría) y desde
+# Python 3.12 tampoco pueden activarse dos cProfile a la vez. Las peticiones
+# sin X-Profile no esperan nunca
+_profile_lock = threading.Lock()
+
+
+def profiles_dir():
+    return Path(settings.REQUEST_PROFILING_DIR)
+
+
+def authorized(request):
+    """Si el perfilado está activado y la petición trae el secreto."""
+    secret = getattr(settings, "REQUEST_PROFILING_SECRET", "")
+    if not getattr(settings, "REQUEST_PROFILING", False) or not secret:
+        return False
+    return hmac.compare_digest(request.headers.get(SECRET_HEADER, ""), secret)
+
+
+def profile_path(profile_id, kind):
+    """Ruta de un fichero de perfil, o None si el id o el tipo no son válidos."""
+    if not PROFILE_ID.match(profile_id) or kind not in FILES:
+        return None
+    return profiles_dir() / f"{profile_id}{FILES[kind][0]}"
+
+
+def list_profiles():
+    """Metadatos de los perfiles guardados, del más reciente al más antiguo."""
+    profiles = []
+    for path in sorted(profiles_dir().glob("*.json"), reverse=True):
+        with open(path, "r", encoding="utf-8") as f:
+            profiles.append(json.load(f))
+    return profiles
+
+
+def prune_profiles(keep):
+    for path in sorted(profiles_dir().glob("*.json"), reverse=True)[keep:]:
+        profile_id = path.name[: -len(".json")]
+        for extension, _ in FILES.values():
+            (profiles_dir() / f"{profile_id}{extension}").unlink(missing_ok=True)
+
+
+def frame_label(code):
+    filename = code.co_filename
+    for marker in ("site-packages/", str(settings.BASE_DIR) + "/"):
+        if marker in filename:
+            filename = filename.split(marker, 1)[1]
+            break
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})".replace(";", ",")
+
+
+class StackSampler:
+    """Muestrea en otro hilo la pila de ``thread_id`` y cuenta cada pila distinta."""
+
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self.run, daemon=True)
+
+    def run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(frame_label(frame.f_code))
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def collapsed(self):
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+class RequestProfilerMiddleware:
+    """
+    Middleware opcional (REQUEST_PROFILING). Va al final de MIDDLEWARE: el
+    perfil empieza justo antes de la vista. Las vistas asíncronas no se
+    perfilan (el muestreador sigue a un solo hilo).
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, "REQUEST_PROFILING", False):
+            raise MiddlewareNotUsed
+        if not getattr(settings, "REQUEST_PROFILING_SECRET", ""):
+            raise ImproperlyConfigured("REQUEST_PROFILING necesita REQUEST_PROFILING_SECRET.")
+        self.get_response = get_response
+        self.interval = getattr(settings, "REQUEST_PROFILING_INTERVAL", DEFAULT_INTERVAL)
+        self.keep = getattr(settings, "REQUEST_PROFILING_KEEP", DEFAULT_KEEP)
+
+    def __call__(self, request):
+        return self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if SECRET_HEADER not in request.headers or iscoroutinefunction(view_func):
+            return None
+        if not authorized(request):
+            return None
+        # Descargar perfiles no genera perfiles nuevos
+        if request.resolver_match.url_name in PROFILE_ROUTES:
+            return None
+        mode = request.headers.get(MODE_HEADER, "all").lower()
+        if mode not in MODES:
+            mode = "all"
+        with _profile_lock:
+            return self.profile(request, mode, view_func, view_args, view_kwargs)
+
+    def profile(self, request, mode, view_func, view_args, view_kwargs):
+        # Con microsegundos: el orden alfabético es el cronológico
+        profile_id = f"{timezone.now():%Y%m%dT%H%M%S%f}-{uuid.uuid4().hex[:8]}"
+        profiler = cProfile.Profile() if mode in ("all", "cprofile") else None
+        sampler = (
+            StackSampler(threading.get_ident(), self.interval)
+            if mode in ("all", "sampling")
+            else None
+        )
+        queries = [0]
+
+        def count_query(execute, sql, params, many, context):
+            queries[0] += 1
+            return execute(sql, params, many, context)
+
+        started_tracing = not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+        before = tracemalloc.take_snapshot()
+        if sampler:
+            sampler.start()
+        start = time.perf_counter()
+        try:
+            with connection.execute_wrapper(count_query):
+                if profiler:
+                    profiler.enable()
+                try:
+                    response = view_func(request, *view_args, **view_kwargs)
+                    # El renderizado de DRF también entra en el perfil
+                    if callable(getattr(response, "render", None)) and not response.is_rendered:
+                        response = response.render()
+                finally:
+                    if profiler:
+                        profiler.disable()
+        finally:
+            elapsed = time.perf_counter() - start
+            if sampler:
+                sampler.stop()
+            after = tracemalloc.take_snapshot()
+            if started_tracing:
+                tracemalloc.stop()
+
+        meta = {
+            "id": profile_id,
+            "method": request.method,
+            "path": request.get_full_path(),
+            "status": response.status_code,
+            "mode": mode,
+            "duration_ms": round(elapsed * 1000, 3),
+            "queries": queries[0],
+            "files": [],
+        }
+        directory = profiles_dir()
+        directory.mkdir(parents=True, exist_ok=True)
+        if profiler:
+            profiler.dump_stats(profile_path(profile_id, "pstats"))
+            meta["files"].append("pstats")
+        if sampler:
+            profile_path(profile_id, "collapsed").write_text(sampler.collapsed(), encoding="utf-8")
+            meta["files"].append("collapsed")
+        profile_path(profile_id, "memory").write_text(
+            self.memory_report(before, after), encoding="utf-8"
+        )
+        meta["files"].append("memory")
+        profile_path(profile_id, "meta").write_text(json.dumps(meta, indent=2), encoding="utf-8")
+        prune_profiles(self.keep)
+
+        response["X-Profile-Id"] = profile_id
+        return response
+
+    def memory_report(self, before, after):
+        # Sin las reservas del propio tracemalloc ni de este módulo
+        filters = [
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),
+        ]
+        stats = after.filter_traces(filters).compare_to(before.filter_traces(filters), "lineno")
+        total = sum(stat.size_diff for stat in stats)
+        lines = [f"Memoria reservada durante la vista: {total / 1024:.1f} KiB", ""]
+        lines.extend(str(stat) for stat in stats[:MEMORY_TOP])
+        return "\n".join(lines) + "\n"
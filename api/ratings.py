@@ -0,0 +1,134 @@
+"""
+Motor de cálculo de medias (overall_rating) por lotes.
+
+La tabla posición → pesos se guarda como matrices de NumPy para calcular la
+media de N cartas con operaciones vectorizadas en lugar de una cadena de
+if/elif por carta. El resultado es idéntico al de la fórmula por carta.
+"""
+
+import numpy as np
+
+# Orden de las columnas de la matriz de estadísticas
+STATS = (
+    "pace",
+    "shooting",
+    "passing",
+    "dribbling",
+    "defending",
+    "physical",
+    "diving",
+    "reflexes",
+    "handling",
+    "positioning",
+    "kicking",
+    "speed",
+)
+
+# Fórmulas basadas en FIFA 16: códigos de posición → (stat, peso) en el orden
+# en que se suman. Se conserva el orden para que el resultado en coma flotante
+# sea idéntico al de la fórmula escrita a mano.
+FORMULAS = [
+    # Portero - usa todos los atributos de portero
+    (("GK", "POR"), [("diving", 0.25), ("reflexes", 0.25), ("handling", 0.20), ("positioning", 0.15), ("kicking", 0.10), ("speed", 0.05)]),
+    # Defensa Central - prioriza defending y physical
+    (("CB", "DFC"), [("defending", 0.35), ("physical", 0.25), ("pace", 0.15), ("passing", 0.10), ("dribbling", 0.08), ("shooting", 0.07)]),
+    # Lateral Derecho / Izquierdo - balance entre ataque y defensa
+    (("RB", "LB", "LD", "LI"), [("pace", 0.25), ("defending", 0.20), ("physical", 0.18), ("dribbling", 0.15), ("passing", 0.12), ("shooting", 0.10)]),
+    # Mediocentro Defensivo - defensa y distribución
+    (("CDM", "MCD"), [("defending", 0.25), ("physical", 0.20), ("passing", 0.18), ("dribbling", 0.15), ("pace", 0.12), ("shooting", 0.10)]),
+    # Mediocentro - juego completo
+    (("CM", "MC"), [("passing", 0.22), ("dribbling", 0.20), ("defending", 0.18), ("physical", 0.15), ("shooting", 0.13), ("pace", 0.12)]),
+    # Medio Derecho / Izquierdo - velocidad y técnica
+    (("RM", "LM", "MD", "MI"), [("pace", 0.25), ("dribbling", 0.22), ("passing", 0.20), ("shooting", 0.15), ("physical", 0.10), ("defending", 0.08)]),
+    # Mediocentro Ofensivo - creación de juego
+    (("CAM", "MCO"), [("dribbling", 0.25), ("passing", 0.22), ("shooting", 0.20), ("pace", 0.15), ("physical", 0.10), ("defending", 0.08)]),
+    # Extremo Derecho / Izquierdo - velocidad y regate
+    (("RW", "LW", "ED", "EI"), [("pace", 0.30), ("dribbling", 0.25), ("shooting", 0.18), ("passing", 0.15), ("physical", 0.12)]),
+    # Segundo Delantero - técnica y definición
+    (("CF", "SD"), [("dribbling", 0.25), ("shooting", 0.22), ("passing", 0.20), ("pace", 0.15), ("physical", 0.10), ("defending", 0.08)]),
+    # Delantero Centro - definición y físico
+    (("ST", "DC"), [("shooting", 0.30), ("physical", 0.20), ("dribbling", 0.18), ("pace", 0.15), ("passing", 0.12), ("defending", 0.05)]),
+]
+
+# Por defecto: promedio de las 6 stats básicas
+DEFAULT_FORMULA = [(stat, 1.0) for stat in STATS[:6]]
+
+
+def _build_tables():
+    """
+    Construye la tabla de pesos como matrices (fórmula, término): la columna
+    de la stat y su peso. Los términos que sobran tienen peso 0.0, que no
+    altera la suma.
+    """
+    formulas = [formula for _, formula in FORMULAS] + [DEFAULT_FORMULA]
+    terms = max(len(formula) for formula in formulas)
+
+    columns = np.zeros((len(formulas), terms), dtype=np.intp)
+    weights = np.zeros((len(formulas), terms), dtype=np.float64)
+    for row, formula in enumerate(formulas):
+        for term, (stat, weight) in enumerate(formula):
+            columns[row, term] = STATS.index(stat)
+            weights[row, term] = weight
+
+    divisors = np.ones(len(formulas), dtype=np.float64)
+    divisors[-1] = len(DEFAULT_FORMULA)
+
+    rows = {code: row for row, (codes, _) in enumerate(FORMULAS) for code in codes}
+    return columns, weights, divisors, rows
+
+
+COLUMNS, WEIGHTS, DIVISORS, POSITION_ROWS = _build_tables()
+DEFAULT_ROW = len(FORMULAS)
+
+
+def position_rows(positions):
+    """Índice de fila de la matriz de pesos para cada código de posición."""
+    return np.fromiter(
+        (POSITION_ROWS.get((pos or "").upper(), DEFAULT_ROW) for pos in positions),
+        dtype=np.intp,
+        count=len(positions),
+    )
+
+
+def compute_ratings(stats, positions):
+    """
+    Calcula la media de N cartas de una vez.
+
+    ``stats`` es una matriz (N, 12) con las columnas en el orden de ``STATS`` y
+    ``positions`` la lista de N códigos de posición. Devuelve un array de
+    enteros con la media de cada carta.
+    """
+    stats = np.asarray(stats, dtype=np.float64).reshape(-1, len(STATS))
+    rows = position_rows(positions)
+    columns = COLUMNS[rows]
+    weights = WEIGHTS[rows]
+    index = np.arange(len(stats))
+
+    # Un paso vectorizado por término, sumando en el mismo orden que la fórmula
+    totals = np.zeros(len(stats), dtype=np.float64)
+    for term in range(COLUMNS.shape[1]):
+        totals += weights[:, term] * stats[index, columns[:, term]]
+
+    return np.rint(totals / DIVISORS[rows]).astype(np.int64)
+
+
+def stats_matrix(cards):
+    """Matriz (N, 12) con las estadísticas de una lista de cartas."""
+    return np.array(
+        [[getattr(card, stat) or 0 for stat in STATS] for card in cards],
+        dtype=np.int64,
+    ).reshape(-1, len(STATS))
+
+
+def rate_cards(cards):
+    """
+    Asigna ``overall_rating`` a todas las cartas de la lista con un único
+    cálculo vectorizado. Devuelve la misma lista.
+    """
+    if not cards:
+        return cards
+
+    ratings = compute_ratings(stats_matrix(cards), [card.position for card in cards])
+    for card, rating in zip(cards, ratings.tolist()):
+        card.overall_rating = rating
+    return cards
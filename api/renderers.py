@@ -0,0 +1,39 @@
+import csv
+import io
+import json
+
+from rest_framework.renderers import BaseRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+# Renderers del export de cartas. El export devuelve una respuesta en streaming
+# que no pasa por ellos; solo sirven para la negociación de contenido
+# (?format=ndjson|csv o la cabecera Accept) y para renderizar los errores.
+
+
+class NDJSONRenderer(BaseRenderer):
+    media_type = "application/x-ndjson"
+    format = "ndjson"
+    charset = "utf-8"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        return (json.dumps(data, cls=JSONEncoder, ensure_ascii=False) + "\n").encode("utf-8")
+
+
+class CSVRenderer(BaseRenderer):
+    media_type = "text/csv"
+    format = "csv"
+    charset = "utf-8"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        # Los errores son diccionarios: una fila "campo,mensaje" por entrada
+        rows = data.items() if isinstance(data, dict) else [("detail", data)]
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(["field", "detail"])
+        for key, value in rows:
+            writer.writerow([key, value])
+        return buffer.getvalue().encode("utf-8")
@@ -0,0 +1,124 @@
+import random
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+# Enrutado de lecturas a réplicas
+#
+# Las lecturas de los modelos de la app api (cartas, usuarios, equipos) van a
+# una réplica de DATABASE_REPLICAS y todas las escrituras a "default". La
+# réplica se elige al azar una vez por petición (o hilo/tarea) y se usa en
+# todas sus lecturas: cada réplica va con su propio retraso, y mezclarlas
+# daría un ETag de una copia con el cuerpo de otra o páginas incoherentes.
+# Para que cada cliente vea sus propios cambios (read-your-writes):
+#   - en cuanto una petición escribe, el resto de sus lecturas van al primario
+#   - las peticiones que no son GET/HEAD/OPTIONS leen siempre del primario
+#   - tras escribir se envía una cookie que mantiene al cliente en el primario
+#     durante REPLICA_STICKY_SECONDS, el margen que tardan en copiarse los datos
+# Solo cuentan como escritura las de los datos de la app api: las de control
+# (versiones de caché, tabla de percentiles, sesiones...) pueden ocurrir en
+# cualquier GET y no deben fijar al cliente en el primario.
+# Las réplicas se mantienen con el comando replicate (ver README).
+
+PRIMARY = "default"
+STICKY_COOKIE = "db_primary"
+REPLICATED_APPS = {"api"}
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+# Modelos de control de la app api (model_name), ver arriba
+BOOKKEEPING_MODELS = {"dataversion", "percentilesnapshot"}
+
+
+class RoutingState:
+    """Estado de enrutado de la petición (o del hilo/tarea) en curso."""
+
+    def __init__(self, primary=False):
+        self.primary = primary
+        self.wrote = False
+        self.replica = None  # réplica elegida en la primera lectura
+
+
+# Se guarda un objeto mutable: así lo que marca el ORM dentro de
+# sync_to_async (que trabaja sobre una copia del contexto) también se ve fuera
+_state = ContextVar("db_routing_state", default=None)
+
+
+def routing_state():
+    state = _state.get()
+    if state is None:
+        state = RoutingState()
+        _state.set(state)
+    return state
+
+
+def replicas():
+    return list(getattr(settings, "DATABASE_REPLICAS", []))
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label not in REPLICATED_APPS:
+            return PRIMARY
+        available = replicas()
+        state = routing_state()
+        if not available or state.primary:
+            return PRIMARY
+        if state.replica not in available:
+            state.replica = random.choice(available)
+        return state.replica
+
+    def db_for_write(self, model, **hints):
+        meta = model._meta
+        if meta.app_label in REPLICATED_APPS and meta.model_name not in BOOKKEEPING_MODELS:
+            # A partir de aquí este contexto lee lo que acaba de escribir
+            state = routing_state()
+            state.primary = True
+            state.wrote = True
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Las réplicas son copias del primario: los objetos se pueden mezclar
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Las réplicas reciben el esquema con los datos (comando replicate)
+        return db == PRIMARY
+
+
+class ReplicaStickinessMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = self.begin(request)
+        try:
+            return self.finish(self.get_response(request))
+        finally:
+            _state.reset(token)
+
+    async def __acall__(self, request):
+        token = self.begin(request)
+        try:
+            return self.finish(await self.get_response(request))
+        finally:
+            _state.reset(token)
+
+    def begin(self, request):
+        sticky = request.method not in SAFE_METHODS or STICKY_COOKIE in request.COOKIES
+        return _state.set(RoutingState(primary=sticky))
+
+    def finish(self, response):
+        if _state.get().wrote:
+            seconds = getattr(settings, "REPLICA_STICKY_SECONDS", 5)
+            response.set_cookie(
+                STICKY_COOKIE, str(int(time.time()) + seconds), max_age=seconds, samesite="Lax"
+            )
+        return response
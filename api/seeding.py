@@ -0,0 +1,231 @@
+import json
+import unicodedata
+from collections import Counter
+from functools import lru_cache
+
+import numpy as np
+
+from .aggregates import GROUP_FIELDS
+from .ratings import FORMULAS, STATS, compute_ratings
+from .squad import GROUP_LIMITS, GROUP_OF_POSITION, POSITION_GROUPS, SQUAD_SIZE
+
+# Generador de datos sintéticos (comando seed)
+#
+# Las cartas se generan por bloques a partir de api/data/cards.json:
+#   - posición con la misma frecuencia que en el fichero
+#   - estadísticas con la media y la covarianza de las cartas reales de esa
+#     posición, así cada posición destaca en las stats que más pesan en su
+#     fórmula de api/ratings.py (un portero en diving/reflexes, un DC en shooting)
+#   - un "nivel" que baja las stats de la fórmula: el fichero solo tiene cartas
+#     de élite y un catálogo grande tiene sobre todo cartas normales
+#   - nombre, club/liga y país combinados de las cartas reales
+# Cada bloque usa su propio generador (seed, bloque), así el resultado es el
+# mismo con uno o varios procesos y en cualquier orden.
+
+DEFAULT_FILE = "api/data/cards.json"
+STAT_RANGE = (1, 99)
+LEVEL_DROP = 8.0  # media (exponencial) de lo que baja el nivel de una carta
+MIN_SHRINK_SAMPLES = 12  # con menos cartas la covarianza se acerca a la diagonal
+
+CARD_STREAM, USER_STREAM, TEAM_STREAM = 0, 1, 2
+
+
+def ascii_slug(text):
+    text = unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode()
+    return "".join(ch for ch in text.lower() if ch.isalnum())
+
+
+def formula_stats(position):
+    """Stats que cuentan en la fórmula de la posición."""
+    for codes, formula in FORMULAS:
+        if position in codes:
+            return {stat for stat, _ in formula}
+    return set(STATS[:6])
+
+
+class Profiles:
+    """Distribuciones por posición y valores de texto sacados de las cartas reales."""
+
+    def __init__(self, templates):
+        counts = Counter(item["position"] for item in templates)
+        self.positions = sorted(counts)
+        self.position_p = np.array([counts[p] for p in self.positions], dtype=np.float64)
+        self.position_p /= self.position_p.sum()
+
+        everything = self.matrix(templates)
+        self.mean, self.cov, self.key = {}, {}, {}
+        for position in self.positions:
+            rows = self.matrix([item for item in templates if item["position"] == position])
+            if len(rows) < 2:
+                rows = everything
+            cov = np.cov(rows, rowvar=False)
+            # Pocas cartas: se mezcla con la diagonal para que no salgan
+            # correlaciones exageradas (y la matriz siga siendo válida)
+            shrink = min(1.0, MIN_SHRINK_SAMPLES / len(rows)) / 2
+            self.mean[position] = rows.mean(axis=0)
+            self.cov[position] = (1 - shrink) * cov + shrink * np.diag(np.diag(cov))
+            self.key[position] = np.array([stat in formula_stats(position) for stat in STATS])
+
+        names = [item["name"].split() for item in templates if item["name"].split()]
+        self.first_names = sorted({parts[0] for parts in names})
+        self.last_names = sorted({parts[-1] for parts in names})
+        self.clubs = sorted({(item["club"], item["league"]) for item in templates})
+        self.countries = sorted({item["country"] for item in templates})
+
+    @staticmethod
+    def matrix(items):
+        return np.array([[item[stat] for stat in STATS] for item in items], dtype=np.float64)
+
+
+@lru_cache(maxsize=None)
+def load_profiles(path=DEFAULT_FILE):
+    with open(path, "r", encoding="utf-8") as f:
+        return Profiles(json.load(f))
+
+
+def generate_cards(seed, chunk, size, path=DEFAULT_FILE):
+    """
+    Bloque ``chunk`` de ``size`` cartas como diccionarios con los campos de
+    Card (``overall_rating`` incluido). Solo depende de (seed, chunk, size).
+    """
+    profiles = load_profiles(path)
+    rng = np.random.default_rng([seed, CARD_STREAM, chunk])
+
+    positions = rng.choice(len(profiles.positions), size=size, p=profiles.position_p)
+    stats = np.empty((size, len(STATS)), dtype=np.float64)
+    for index, position in enumerate(profiles.positions):
+        rows = np.flatnonzero(positions == index)
+        if not len(rows):
+            continue
+        sample = rng.multivariate_normal(profiles.mean[position], profiles.cov[position], len(rows))
+        drop = rng.exponential(LEVEL_DROP, size=len(rows))
+        sample[:, profiles.key[position]] -= drop[:, None]
+        stats[rows] = sample
+    stats = np.clip(np.rint(stats), *STAT_RANGE).astype(np.int64)
+
+    position_codes = [profiles.positions[i] for i in positions.tolist()]
+    ratings = compute_ratings(stats, position_codes).tolist()
+    first = rng.integers(len(profiles.first_names), size=size).tolist()
+    last = rng.integers(len(profiles.last_names), size=size).tolist()
+    clubs = rng.integers(len(profiles.clubs), size=size).tolist()
+    countries = rng.integers(len(profiles.countries), size=size).tolist()
+
+    cards = []
+    for i, values in enumerate(stats.tolist()):
+        club, league = profiles.clubs[clubs[i]]
+        cards.append(
+            {
+                "name": f"{profiles.first_names[first[i]]} {profiles.last_names[last[i]]}",
+                "country": profiles.countries[countries[i]],
+                "club": club,
+                "league": league,
+                "position": position_codes[i],
+                **dict(zip(STATS, values)),
+                "overall_rating": ratings[i],
+            }
+        )
+    return cards
+
+
+def generate_card_chunk(args):
+    """``generate_cards`` con un solo argumento, para ``Pool.imap``."""
+    return generate_cards(*args)
+
+
+def generate_users(seed, start, size, path=DEFAULT_FILE):
+    """
+    ``size`` usuarios (name, email, password). El email lleva el número
+    ``start + i``, así es único sin tener que recordar los ya generados.
+    """
+    profiles = load_profiles(path)
+    rng = np.random.default_rng([seed, USER_STREAM, start])
+    first = rng.integers(len(profiles.first_names), size=size).tolist()
+    last = rng.integers(len(profiles.last_names), size=size).tolist()
+    passwords = rng.integers(16**10, size=size).tolist()
+
+    users = []
+    for i in range(size):
+        first_name = profiles.first_names[first[i]]
+        last_name = profiles.last_names[last[i]]
+        users.append(
+            {
+                "name": f"{first_name} {last_name}",
+                "email": f"{ascii_slug(first_name)}.{ascii_slug(last_name)}.{start + i}@seed.example.com",
+                "password": f"{passwords[i]:010x}",
+            }
+        )
+    return users
+
+
+def sample_distinct(rng, population, k):
+    """``k`` índices distintos de ``range(population)`` sin recorrer la población."""
+    if k > population:
+        raise ValueError(f"No hay {k} elementos distintos entre {population}")
+    if k * 4 > population:
+        return rng.choice(population, size=k, replace=False)
+    chosen = np.unique(rng.integers(population, size=k))
+    while len(chosen) < k:
+        extra = rng.integers(population, size=k - len(chosen))
+        chosen = np.unique(np.concatenate([chosen, extra]))
+    return rng.permutation(chosen)
+
+
+def group_sizes(rng):
+    """Cartas por grupo de una plantilla legal de 23 a 25 cartas."""
+    sizes = {group: minimum for group, (minimum, _) in GROUP_LIMITS.items()}
+    target = int(rng.integers(SQUAD_SIZE[0], SQUAD_SIZE[1] + 1))
+    while sum(sizes.values()) < target:
+        free = [group for group in POSITION_GROUPS if sizes[group] < GROUP_LIMITS[group][1]]
+        sizes[free[int(rng.integers(len(free)))]] += 1
+    return sizes
+
+
+class CardPools:
+    """
+    Cartas activas agrupadas por grupo de posiciones (ids, medias y ritmo
+    como arrays), para elegir las de cada equipo sin más consultas.
+    """
+
+    def __init__(self, rows):
+        columns = {group: ([], [], []) for group in POSITION_GROUPS}
+        for card_id, position, rating, pace in rows:
+            group = GROUP_OF_POSITION.get(position)
+            if group is not None:
+                ids, ratings, paces = columns[group]
+                ids.append(card_id)
+                ratings.append(rating)
+                paces.append(pace)
+        self.ids, self.ratings, self.paces = {}, {}, {}
+        for group, (ids, ratings, paces) in columns.items():
+            self.ids[group] = np.array(ids, dtype=np.int64)
+            self.ratings[group] = np.array(ratings, dtype=np.int64)
+            self.paces[group] = np.array(paces, dtype=np.int64)
+
+    def missing(self):
+        """Grupos sin cartas suficientes para el máximo de una plantilla."""
+        return [
+            group
+            for group, (_, maximum) in GROUP_LIMITS.items()
+            if len(self.ids[group]) < maximum
+        ]
+
+
+def generate_teams(seed, pools, count):
+    """
+    ``count`` plantillas legales: (ids de cartas, agregados de Team). Las
+    cartas se repiten entre equipos (varios usuarios pueden tener la misma).
+    """
+    rng = np.random.default_rng([seed, TEAM_STREAM])
+    teams = []
+    for _ in range(count):
+        card_ids = []
+        aggregates = Counter()
+        for group, size in group_sizes(rng).items():
+            chosen = sample_distinct(rng, len(pools.ids[group]), size)
+            card_ids.extend(pools.ids[group][chosen].tolist())
+            aggregates["card_count"] += size
+            aggregates["rating_total"] += int(pools.ratings[group][chosen].sum())
+            aggregates["pace_total"] += int(pools.paces[group][chosen].sum())
+            aggregates[GROUP_FIELDS[group]] += size
+        teams.append((card_ids, aggregates))
+    return teams
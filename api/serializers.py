@@ -1,7 +1,97 @@
+from django.db import transaction
+from django.utils import timezone
 from rest_framework import serializers
+from .fields import BulkPrimaryKeyRelatedField
 from .models import Card, Team, User
+from .ratings import rate_cards
+from .signals import cards_changed
+from .timing import TimedRepresentationMixin
 
-class CardSerializer(serializers.ModelSerializer):
+
+def card_pk(value):
+    """Id de carta de una petición masiva como entero, o None si no es válido."""
+    if isinstance(value, bool):
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class CardListSerializer(serializers.ListSerializer):
+    """
+    Serializer de listas de cartas (CardSerializer(many=True)) para las rutas
+    masivas. A diferencia de ListSerializer.is_valid(), ``partition`` no falla
+    con el primer lote inválido: separa los elementos válidos de los que tienen
+    errores para que el resto del lote se pueda guardar.
+    """
+
+    def partition(self, items, instances=None):
+        """
+        Valida cada elemento con el serializer hijo. Devuelve
+        ``(válidos, errores)``: ``válidos`` es una lista de
+        ``(índice, instancia, datos)`` y ``errores`` de ``{"index", "errors"}``.
+        Con ``instances`` (dict id → carta) cada elemento debe traer su ``id``.
+        """
+        valid, errors = [], []
+        for index, item in enumerate(items):
+            instance = None
+            try:
+                if not isinstance(item, dict):
+                    raise serializers.ValidationError(
+                        {"non_field_errors": ["Cada elemento debe ser un objeto."]}
+                    )
+                if instances is not None:
+                    instance = instances.get(card_pk(item.get("id")))
+                    if instance is None:
+                        raise serializers.ValidationError(
+                            {"id": ["No existe ninguna carta con ese id."]}
+                        )
+                valid.append((index, instance, self.child.run_validation(item)))
+            except serializers.ValidationError as exc:
+                errors.append({"index": index, "errors": exc.detail})
+        return valid, errors
+
+    def create(self, validated_data):
+        # bulk_create no llama a save(): las medias se calculan en bloque antes
+        cards = rate_cards([Card(**data) for data in validated_data])
+        if not cards:
+            # Nada que insertar: sin señal, la caché del catálogo sigue valiendo
+            return cards
+        with transaction.atomic():
+            Card.objects.bulk_create(cards)
+
+        cards_changed.send(
+            sender=Card, card_ids=[card.pk for card in cards], created=True
+        )
+        return cards
+
+    def update(self, instances, validated_data):
+        """Actualización parcial de ``instances`` (alineada con ``validated_data``)."""
+        fields = set()
+        for card, data in zip(instances, validated_data):
+            for field, value in data.items():
+                setattr(card, field, value)
+            fields.update(data)
+        if not instances:
+            # Nada que guardar: sin señal, la caché del catálogo sigue valiendo
+            return instances
+
+        # bulk_update no aplica auto_now: updated_at se pone a mano para que
+        # los validadores de GET condicional vean el cambio
+        now = timezone.now()
+        for card in rate_cards(instances):
+            card.updated_at = now
+        with transaction.atomic():
+            Card.all_objects.bulk_update(
+                instances, sorted(fields) + ["overall_rating", "updated_at"]
+            )
+
+        cards_changed.send(sender=Card, card_ids=[card.pk for card in instances])
+        return instances
+
+
+class CardSerializer(TimedRepresentationMixin, serializers.ModelSerializer):
     class Meta:
         # Indico el modelo
         model = Card
@@ -34,6 +124,9 @@ class CardSerializer(serializers.ModelSerializer):
         # Estos campos se mandan en el GET pero no se pueden recibir en el POST/PUT/PATCH
         read_only_fields = ["id", "overall_rating", "created_at"]
 
+        # CardSerializer(many=True) admite altas y cambios masivos
+        list_serializer_class = CardListSerializer
+
     def validate(self, data):
         """Ensure stats are within a reasonable range."""
         stats = [
@@ -59,29 +152,53 @@ class CardSerializer(serializers.ModelSerializer):
         return data
 
 
-class TeamSerializer(serializers.ModelSerializer):
+class TeamSerializer(TimedRepresentationMixin, serializers.ModelSerializer):
     # Solo lectura de las cartas (se mostrarán solo las activas)
     cards = serializers.SerializerMethodField()
-    card_ids = serializers.PrimaryKeyRelatedField(
+    # Todas las cartas se resuelven con una sola consulta (ver api/fields.py)
+    card_ids = BulkPrimaryKeyRelatedField(
         many=True,
-        queryset=Card.objects.all(),
+        queryset=Card.all_objects.all(),
         write_only=True,
         required=False,
         source="cards",
     )
 
+    # Resumen leído de los agregados desnormalizados (sin recorrer las cartas)
+    stats = serializers.SerializerMethodField()
+
     class Meta:
         model = Team
-        fields = ["id", "name", "created_at", "cards", "card_ids"]
+        fields = ["id", "name", "created_at", "cards", "card_ids", "stats"]
         read_only_fields = ["id", "created_at"]
 
     def get_cards(self, obj):
         """
-        Devuelve solo las cartas activas (active=True)
+        Devuelve solo las cartas activas (active=True). Si la vista ya las ha
+        precargado (User.objects.with_team()) no se hace ninguna consulta.
         """
-        active_cards = obj.cards.filter(active=True)
+        active_cards = getattr(obj, "active_cards", None)
+        if active_cards is None:
+            active_cards = obj.cards.filter(active=True)
         return CardSerializer(active_cards, many=True).data
 
+    def get_stats(self, obj):
+        return {
+            "card_count": obj.card_count,
+            "average_rating": obj.average_rating,
+            "pace_total": obj.pace_total,
+            "goalkeepers": obj.gk_count,
+            "defenders": obj.def_count,
+            "midfielders": obj.mid_count,
+            "forwards": obj.fwd_count,
+        }
+
+    def create(self, validated_data):
+        instance = super().create(validated_data)
+        # Los agregados se han actualizado en la base de datos al añadir las cartas
+        instance.refresh_from_db(fields=Team.AGGREGATE_FIELDS)
+        return instance
+
     def update(self, instance, validated_data):
         # Update del equipo y sus cartas
         cards = validated_data.pop("cards", None)
@@ -89,9 +206,10 @@ class TeamSerializer(serializers.ModelSerializer):
         instance.save()
         if cards is not None:
             instance.cards.set(cards)
+            instance.refresh_from_db(fields=Team.AGGREGATE_FIELDS)
         return instance
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(TimedRepresentationMixin, serializers.ModelSerializer):
     # Indicamos el serializer del equipo del usuario
     team = TeamSerializer(read_only=True)
     team_id = serializers.PrimaryKeyRelatedField(
@@ -102,3 +220,16 @@ class UserSerializer(serializers.ModelSerializer):
         model = User
         fields = ["id", "name", "email", "created_at", "team", "team_id"]
         read_only_fields = ["id", "created_at"]
+
+
+class SquadBuildSerializer(serializers.Serializer):
+    """Restricciones opcionales del generador de plantillas (api/squad.py)."""
+
+    max_per_club = serializers.IntegerField(min_value=1, required=False)
+    max_per_league = serializers.IntegerField(min_value=1, required=False)
+    required_cards = serializers.ListField(
+        child=serializers.IntegerField(), required=False, default=list
+    )
+    excluded_cards = serializers.ListField(
+        child=serializers.IntegerField(), required=False, default=list
+    )
@@ -0,0 +1,145 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import Signal, receiver
+from django.utils import timezone
+
+from .aggregates import (
+    TRACKED_CARD_FIELDS,
+    card_contribution_change,
+    cards_delta,
+    delta_updates,
+    refresh_team_aggregates,
+    team_ids_for_cards,
+)
+from .cache import bump_catalogue_version, bump_model_version
+from .leaderboard import leaderboard
+from .models import Card, Team, User
+from .similarity import similarity_index
+
+# Las escrituras masivas (bulk_create, bulk_update, queryset.update) no lanzan
+# post_save. Quien las haga debe enviar esta señal con los ids afectados
+# (o card_ids=None si pueden ser todos), y created=True si son cartas nuevas:
+#     cards_changed.send(sender=Card, card_ids=[...])
+cards_changed = Signal()
+
+
+@receiver(post_save, sender=Card)
+@receiver(post_delete, sender=Card)
+def card_saved(sender, instance, **kwargs):
+    bump_catalogue_version()
+
+
+@receiver(post_save, sender=Card)
+def card_saved_aggregates(sender, instance, created, **kwargs):
+    """Aplica a los equipos de la carta la diferencia de media, posición, ritmo o estado."""
+    if not created:
+        delta = card_contribution_change(instance)
+        if delta is None:
+            # Sin los valores originales se recalculan sus equipos
+            team_ids = team_ids_for_cards([instance.pk])
+            if team_ids and refresh_team_aggregates(team_ids):
+                bump_model_version("teams")
+        elif any(delta.values()):
+            updates = delta_updates(delta)
+            if Team.objects.filter(cards=instance).update(updated_at=timezone.now(), **updates):
+                bump_model_version("teams")
+
+    instance._loaded_values = {field: getattr(instance, field) for field in TRACKED_CARD_FIELDS}
+
+
+@receiver(pre_delete, sender=Card)
+def card_deleting(sender, instance, **kwargs):
+    # El borrado en cascada de Team.cards no lanza m2m_changed
+    instance._deleted_team_ids = team_ids_for_cards([instance.pk])
+
+
+@receiver(post_delete, sender=Card)
+def card_deleted_aggregates(sender, instance, **kwargs):
+    team_ids = getattr(instance, "_deleted_team_ids", None)
+    if team_ids and refresh_team_aggregates(team_ids):
+        bump_model_version("teams")
+
+
+@receiver(post_delete, sender=Card)
+def card_deleted_similarity(sender, instance, **kwargs):
+    similarity_index.card_deleted(instance.pk)
+
+
+@receiver(cards_changed)
+def cards_bulk_changed(sender, card_ids=None, created=False, **kwargs):
+    bump_catalogue_version()
+    if created:
+        # Las cartas nuevas todavía no están en ningún equipo
+        return
+
+    # Las escrituras masivas no pasan por save(): se recalculan los equipos afectados
+    team_ids = None if card_ids is None else team_ids_for_cards(card_ids)
+    if (team_ids is None or team_ids) and refresh_team_aggregates(team_ids):
+        bump_model_version("teams")
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def user_saved(sender, instance, **kwargs):
+    bump_model_version("users")
+
+
+@receiver(post_save, sender=Team)
+@receiver(post_delete, sender=Team)
+def team_saved(sender, instance, **kwargs):
+    bump_model_version("teams")
+
+
+@receiver(post_delete, sender=Team)
+def team_deleted(sender, instance, **kwargs):
+    leaderboard.team_deleted(instance.pk)
+
+
+@receiver(m2m_changed, sender=Team.cards.through)
+def team_cards_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Al cambiar las cartas de un equipo se actualizan su updated_at y sus
+    agregados (sumando o restando lo que aportan las cartas) en un solo UPDATE.
+    """
+    if action == "pre_clear":
+        if reverse:
+            # card.teams.clear(): en post_clear ya no se sabe qué equipos tenía
+            instance._cleared_team_ids = list(instance.teams.values_list("pk", flat=True))
+        return
+    if action == "pre_remove":
+        # pk_set trae todos los ids pedidos, también los que no estaban
+        # relacionados: solo cuentan las filas que se van a borrar de verdad
+        if reverse:
+            pairs = sender.objects.filter(card_id=instance.pk, team_id__in=pk_set or [])
+            instance._removed_pks = set(pairs.values_list("team_id", flat=True))
+        else:
+            pairs = sender.objects.filter(team_id=instance.pk, card_id__in=pk_set or [])
+            instance._removed_pks = set(pairs.values_list("card_id", flat=True))
+        return
+    if action == "post_remove":
+        pk_set = getattr(instance, "_removed_pks", pk_set)
+        if not pk_set:
+            return
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+
+    sign = 1 if action == "post_add" else -1
+    if not reverse:
+        team_ids = [instance.pk]
+        delta = cards_delta(pk_set or [], sign) if action != "post_clear" else None
+    else:
+        if action == "post_clear":
+            team_ids = getattr(instance, "_cleared_team_ids", [])
+        else:
+            team_ids = list(pk_set or [])
+        delta = cards_delta([instance.pk], sign)
+
+    if not team_ids:
+        return
+
+    if delta is None:
+        # team.cards.clear(): el equipo se queda sin cartas
+        updates = {field: 0 for field in Team.AGGREGATE_FIELDS}
+    else:
+        updates = delta_updates(delta)
+    Team.objects.filter(pk__in=team_ids).update(updated_at=timezone.now(), **updates)
+    bump_model_version("teams")
@@ -0,0 +1,279 @@
+import threading
+import time
+from datetime import timedelta
+
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
+
+from .cache import model_version
+from .models import Card
+from .ratings import STATS
+from .squad import GROUP_OF_POSITION, POSITION_GROUPS
+
+# Búsqueda de cartas parecidas ("jugadores como esta carta")
+#
+# Cada proceso guarda en memoria las 12 stats de las cartas activas,
+# normalizadas (media 0 y desviación 1 por stat, así pace y kicking pesan lo
+# mismo), en un bloque por grupo de posiciones. La distancia es la euclídea
+# sobre las stats normalizadas.
+#
+# No se usa un KD-tree: con 12 dimensiones apenas poda ramas (tendría que
+# visitar casi todas las hojas para los 20 vecinos exactos) y no admite
+# cambios sin reconstruirlo. Se recorre el bloque entero con NumPy:
+#   |x - q|² = |x|² - 2·x·q + |q|²
+# con |x|² precalculado, x·q es un producto matriz-vector y los k mejores se
+# sacan con argpartition, sin ordenar. Las stats se guardan por columnas
+# (12 × n), que es lo que hace rápido el producto: ~8 ms para 1M de cartas
+# sin filtros en una CPU, ~2,5 ms dentro de un grupo.
+#
+# El índice se sincroniza al consultar si ha cambiado la versión "cards" de
+# api/cache.py (en la base de datos: la sube cualquier proceso o comando),
+# igual que el ranking (api/leaderboard.py): se leen las cartas con
+# updated_at reciente y se cambian sus filas en el sitio; las borradas o
+# desactivadas quedan con |x|² = inf y nunca salen. Cada
+# SIMILARITY_FULL_REBUILD_INTERVAL segundos se reconstruye entero (y se
+# recalculan medias y desviaciones) aunque la versión no haya cambiado.
+
+DEFAULT_K = 20
+MAX_K = 100
+DEFAULT_SYNC_MARGIN = 5  # segundos
+DEFAULT_FULL_REBUILD_INTERVAL = 3600  # segundos
+INITIAL_CAPACITY = 1024
+GROUPS = tuple(POSITION_GROUPS)
+FIELDS = ("id", "active", "position", "league", *STATS)
+
+
+class Block:
+    """Cartas de un grupo de posiciones. Las filas borradas no se reutilizan."""
+
+    def __init__(self, capacity=INITIAL_CAPACITY):
+        self.size = 0
+        self.stats = np.zeros((len(STATS), capacity), dtype=np.float32)
+        self.norms = np.full(capacity, np.inf, dtype=np.float32)
+        self.ids = np.zeros(capacity, dtype=np.int64)
+        self.leagues = np.full(capacity, -1, dtype=np.int32)
+
+    @classmethod
+    def from_arrays(cls, ids, vectors, leagues):
+        """Bloque cargado de una vez (reconstrucción)."""
+        block = cls(max(INITIAL_CAPACITY, len(ids)))
+        block.size = len(ids)
+        block.stats[:, : block.size] = vectors.T
+        block.norms[: block.size] = (vectors * vectors).sum(axis=1)
+        block.ids[: block.size] = ids
+        block.leagues[: block.size] = leagues
+        return block
+
+    def append(self, card_id, vector, league):
+        if self.size == len(self.ids):
+            self.grow()
+        row = self.size
+        self.size += 1
+        self.ids[row] = card_id
+        self.set(row, vector, league)
+        return row
+
+    def set(self, row, vector, league):
+        self.stats[:, row] = vector
+        self.leagues[row] = league
+        self.norms[row] = vector @ vector
+
+    def remove(self, row):
+        self.norms[row] = np.inf
+        self.leagues[row] = -1
+
+    def grow(self):
+        capacity = len(self.ids) * 2
+        stats = np.zeros((len(STATS), capacity), dtype=np.float32)
+        stats[:, : self.size] = self.stats[:, : self.size]
+        norms = np.full(capacity, np.inf, dtype=np.float32)
+        norms[: self.size] = self.norms[: self.size]
+        ids = np.zeros(capacity, dtype=np.int64)
+        ids[: self.size] = self.ids[: self.size]
+        leagues = np.full(capacity, -1, dtype=np.int32)
+        leagues[: self.size] = self.leagues[: self.size]
+        self.stats, self.norms, self.ids, self.leagues = stats, norms, ids, leagues
+
+    def search(self, query, k, league=None):
+        """Los ``k`` más cercanos: (distancias al cuadrado, ids)."""
+        size = self.size
+        stats, norms, ids = self.stats[:, :size], self.norms[:size], self.ids[:size]
+        if league is not None:
+            rows = np.flatnonzero(self.leagues[:size] == league)
+            stats, norms, ids = stats[:, rows], norms[rows], ids[rows]
+        if not len(ids):
+            return norms, ids
+        distances = norms - (2 * query) @ stats
+        best = np.argpartition(distances, k)[:k] if len(distances) > k else np.arange(len(ids))
+        best = best[np.isfinite(distances[best])]
+        # La fórmula con |x|² pierde precisión en float32 (cartas iguales no
+        # dan 0): la distancia de los elegidos se calcula de nuevo, directa
+        difference = stats[:, best] - query[:, None]
+        return (difference * difference).sum(axis=0), ids[best]
+
+
+class SimilarityIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.blocks = {group: Block() for group in GROUPS}
+        # Por id de carta: su grupo (índice en GROUPS, -1 si no está) y su fila
+        self.group_of = np.full(INITIAL_CAPACITY, -1, dtype=np.int8)
+        self.row_of = np.zeros(INITIAL_CAPACITY, dtype=np.int32)
+        self.league_codes = {}
+        self.mean = np.zeros(len(STATS), dtype=np.float32)
+        self.std = np.ones(len(STATS), dtype=np.float32)
+        self.count = 0
+        self.version = None
+        self.synced_at = None
+        self.rebuilt_at = 0.0
+
+    def __len__(self):
+        return self.count
+
+    # Mantenimiento
+
+    def normalize(self, stats):
+        return ((np.asarray(stats, dtype=np.float32) - self.mean) / self.std).astype(np.float32)
+
+    def league_code(self, league):
+        return self.league_codes.setdefault(league, len(self.league_codes))
+
+    def _ensure_id(self, card_id):
+        if card_id >= len(self.group_of):
+            capacity = max(card_id + 1, len(self.group_of) * 2)
+            group_of = np.full(capacity, -1, dtype=np.int8)
+            group_of[: len(self.group_of)] = self.group_of
+            row_of = np.zeros(capacity, dtype=np.int32)
+            row_of[: len(self.row_of)] = self.row_of
+            self.group_of, self.row_of = group_of, row_of
+
+    def _remove(self, card_id):
+        if card_id >= len(self.group_of) or self.group_of[card_id] < 0:
+            return
+        self.blocks[GROUPS[self.group_of[card_id]]].remove(self.row_of[card_id])
+        self.group_of[card_id] = -1
+        self.count -= 1
+
+    def _set(self, card_id, active, position, league, stats):
+        group = GROUP_OF_POSITION.get(position)
+        if not active or group is None:
+            self._remove(card_id)
+            return
+        self._ensure_id(card_id)
+        vector = self.normalize(stats)
+        code = self.league_code(league)
+        index = GROUPS.index(group)
+        if self.group_of[card_id] == index:
+            self.blocks[group].set(self.row_of[card_id], vector, code)
+            return
+        # Carta nueva o que cambia de grupo de posiciones
+        self._remove(card_id)
+        self.row_of[card_id] = self.blocks[group].append(card_id, vector, code)
+        self.group_of[card_id] = index
+        self.count += 1
+
+    def rebuild(self):
+        rows = list(Card.objects.values_list(*FIELDS).order_by("id"))
+        self.reset()
+        if rows:
+            stats = np.array([row[4:] for row in rows], dtype=np.float32)
+            self.mean = stats.mean(axis=0)
+            std = stats.std(axis=0)
+            self.std = np.where(std > 0, std, 1.0).astype(np.float32)
+            vectors = self.normalize(stats)
+            ids = np.array([row[0] for row in rows], dtype=np.int64)
+            leagues = np.array([self.league_code(row[3]) for row in rows], dtype=np.int32)
+            group_index = {group: index for index, group in enumerate(GROUPS)}
+            groups = np.array(
+                [group_index.get(GROUP_OF_POSITION.get(row[2]), -1) for row in rows], dtype=np.int8
+            )
+            self._ensure_id(int(ids[-1]))
+            for index, group in enumerate(GROUPS):
+                selected = np.flatnonzero(groups == index)
+                self.blocks[group] = Block.from_arrays(
+                    ids[selected], vectors[selected], leagues[selected]
+                )
+                self.group_of[ids[selected]] = index
+                self.row_of[ids[selected]] = np.arange(len(selected))
+                self.count += len(selected)
+        self.rebuilt_at = time.monotonic()
+
+    def expired(self):
+        interval = getattr(
+            settings, "SIMILARITY_FULL_REBUILD_INTERVAL", DEFAULT_FULL_REBUILD_INTERVAL
+        )
+        return time.monotonic() - self.rebuilt_at > interval
+
+    def sync(self):
+        """Pone el índice al día si la versión del catálogo ha cambiado o ha caducado."""
+        version = model_version("cards")
+        if version == self.version and not self.expired():
+            return
+
+        with self._lock:
+            if version == self.version and not self.expired():
+                return
+            # Se toma la hora antes de consultar: lo que cambie durante la
+            # consulta se vuelve a leer en la siguiente sincronización
+            now = timezone.now()
+            if self.synced_at is None or self.expired():
+                self.rebuild()
+            else:
+                margin = timedelta(
+                    seconds=getattr(settings, "SIMILARITY_SYNC_MARGIN", DEFAULT_SYNC_MARGIN)
+                )
+                changed = Card.all_objects.filter(updated_at__gte=self.synced_at - margin)
+                for card_id, active, position, league, *stats in changed.values_list(*FIELDS):
+                    self._set(card_id, active, position, league, stats)
+            self.synced_at = now
+            self.version = version
+
+    def card_deleted(self, card_id):
+        """Borrado en este proceso: se quita ya, sin esperar a la reconstrucción."""
+        self.cards_gone([card_id])
+
+    def cards_gone(self, card_ids):
+        """Quita cartas que ya no están activas (borradas o desactivadas)."""
+        with self._lock:
+            for card_id in card_ids:
+                self._remove(card_id)
+
+    # Consultas
+
+    def similar(self, card, k=DEFAULT_K, group=None, league=None):
+        """
+        Las ``k`` cartas activas más parecidas a ``card`` (sin contarla), como
+        (id, distancia) de menor a mayor distancia. ``group`` y ``league``
+        limitan la búsqueda a un grupo de posiciones o a una liga.
+        """
+        self.sync()
+        with self._lock:
+            if league is not None and league not in self.league_codes:
+                return []
+            code = None if league is None else self.league_codes[league]
+            query = self.normalize([getattr(card, stat) for stat in STATS])
+            distances, ids = [], []
+            for name in [group] if group else GROUPS:
+                # Uno más por si sale la propia carta
+                block_distances, block_ids = self.blocks[name].search(query, k + 1, code)
+                distances.append(block_distances)
+                ids.append(block_ids)
+
+        distances = np.concatenate(distances)
+        ids = np.concatenate(ids)
+        # De menor a mayor distancia; a igual distancia, por id
+        order = np.lexsort((ids, distances))
+        results = []
+        for index in order:
+            if ids[index] != card.pk:
+                results.append((int(ids[index]), float(np.sqrt(max(distances[index], 0.0)))))
+            if len(results) == k:
+                break
+        return results
+
+
+similarity_index = SimilarityIndex()
@@ -0,0 +1,183 @@
+import heapq
+from collections import Counter
+
+from rest_framework.exceptions import ValidationError
+
+from .models import Card
+from .pagination import keyset_filter, row_values
+
+# Generador automático de plantillas
+#
+# Construye la plantilla legal (mismas reglas que UserTeamView) con la mayor
+# suma de overall_rating. Cada grupo de posiciones se lee ya ordenado por media
+# desde la base de datos (índice (position, overall_rating)) y por páginas, así
+# que solo se leen las cartas que pueden entrar, no todo el catálogo:
+#   1. Se cubren los mínimos de cada grupo con sus mejores cartas.
+#   2. Los huecos libres se llenan mezclando los grupos (heap) por media,
+#      respetando los máximos de cada grupo.
+# Sin topes por club/liga el resultado es óptimo: los grupos son disjuntos y
+# cada carta suma lo mismo esté donde esté. Con topes es una aproximación
+# voraz (el problema exacto deja de ser separable por grupos).
+
+POSITION_GROUPS = {
+    "GK": ("POR",),
+    "DEF": ("DFC", "LI", "LD"),
+    "MID": ("MC", "MCD", "MCO", "MI", "MD"),
+    "FWD": ("EI", "ED", "DC", "SD"),
+}
+GROUP_LIMITS = {"GK": (2, 3), "DEF": (8, 10), "MID": (6, 9), "FWD": (5, 6)}
+GROUP_NAMES = {"GK": "porteros", "DEF": "defensas", "MID": "centrocampistas", "FWD": "delanteros"}
+SQUAD_SIZE = (23, 25)
+
+GROUP_OF_POSITION = {
+    position: group for group, positions in POSITION_GROUPS.items() for position in positions
+}
+
+SQUAD_ORDERING = ("-overall_rating", "-id")
+STREAM_PAGE_SIZE = 64
+
+
+def group_stream(group, excluded=(), page_size=STREAM_PAGE_SIZE):
+    """Cartas activas de un grupo de mayor a menor media, leídas por páginas."""
+    queryset = (
+        Card.objects.filter(active=True, position__in=POSITION_GROUPS[group])
+        .exclude(pk__in=excluded)
+        .order_by(*SQUAD_ORDERING)
+    )
+    last = None
+    while True:
+        page = queryset
+        if last is not None:
+            page = page.filter(keyset_filter(SQUAD_ORDERING, last))
+        rows = list(page[:page_size])
+        yield from rows
+        if len(rows) < page_size:
+            return
+        last = row_values(rows[-1], SQUAD_ORDERING)
+
+
+class SquadBuilder:
+    """
+    Uso: ``SquadBuilder(max_per_club=3, required=[1, 2]).build()`` devuelve la
+    lista de cartas. Lanza ValidationError si no hay plantilla legal posible.
+    """
+
+    def __init__(self, max_per_club=None, max_per_league=None, required=(), excluded=()):
+        self.max_per_club = max_per_club
+        self.max_per_league = max_per_league
+        self.required = list(dict.fromkeys(required))
+        self.excluded = set(excluded)
+
+        self.selected = []
+        self.selected_ids = set()
+        self.group_counts = Counter()
+        self.club_counts = Counter()
+        self.league_counts = Counter()
+
+    def fits(self, card):
+        """Si la carta cabe sin pasarse del máximo de su grupo ni de los topes."""
+        if card.pk in self.selected_ids:
+            return False
+        # Posiciones fuera de los grupos (p. ej. "GK" de un JSON externo): no entran
+        group = GROUP_OF_POSITION.get(card.position)
+        if group is None:
+            return False
+        if self.group_counts[group] >= GROUP_LIMITS[group][1]:
+            return False
+        if self.max_per_club is not None and self.club_counts[card.club] >= self.max_per_club:
+            return False
+        if self.max_per_league is not None and self.league_counts[card.league] >= self.max_per_league:
+            return False
+        return True
+
+    def add(self, card):
+        self.selected.append(card)
+        self.selected_ids.add(card.pk)
+        self.group_counts[GROUP_OF_POSITION[card.position]] += 1
+        self.club_counts[card.club] += 1
+        self.league_counts[card.league] += 1
+
+    def add_required(self):
+        # Los errores usan el nombre del campo de SquadBuildSerializer
+        if self.excluded.intersection(self.required):
+            raise ValidationError({"required_cards": "Una carta no puede ser obligatoria y excluida."})
+
+        cards = Card.objects.filter(active=True).in_bulk(self.required)
+        missing = [pk for pk in self.required if pk not in cards]
+        if missing:
+            raise ValidationError(
+                {"required_cards": f"Cartas inexistentes o desactivadas: {', '.join(map(str, missing))}"}
+            )
+        unknown = [pk for pk in self.required if cards[pk].position not in GROUP_OF_POSITION]
+        if unknown:
+            raise ValidationError(
+                {"required_cards": f"Cartas con una posición desconocida: {', '.join(map(str, unknown))}"}
+            )
+        if len(cards) > SQUAD_SIZE[1]:
+            raise ValidationError({"required_cards": f"Como máximo {SQUAD_SIZE[1]} cartas obligatorias."})
+
+        for pk in self.required:
+            card = cards[pk]
+            if not self.fits(card):
+                group = GROUP_OF_POSITION[card.position]
+                raise ValidationError(
+                    {
+                        "required_cards": f"Las cartas obligatorias superan el máximo de "
+                        f"{GROUP_NAMES[group]} o los topes por club/liga."
+                    }
+                )
+            self.add(card)
+
+    def next_fitting(self, stream):
+        """Siguiente carta del stream que cabe en la plantilla, o None."""
+        for card in stream:
+            if self.fits(card):
+                return card
+        return None
+
+    def build(self):
+        self.add_required()
+        skip = self.excluded | self.selected_ids
+        streams = {group: group_stream(group, skip) for group in POSITION_GROUPS}
+
+        # 1. Mínimos de cada grupo
+        for group, (minimum, _) in GROUP_LIMITS.items():
+            while self.group_counts[group] < minimum:
+                card = self.next_fitting(streams[group])
+                if card is None:
+                    raise ValidationError(
+                        {"detail": f"No hay suficientes {GROUP_NAMES[group]} disponibles."}
+                    )
+                self.add(card)
+
+        # 2. Huecos libres: la mejor carta de cualquier grupo que aún quepa
+        heap = []
+        for group, stream in streams.items():
+            if self.group_counts[group] >= GROUP_LIMITS[group][1]:
+                continue
+            card = self.next_fitting(stream)
+            if card is not None:
+                heapq.heappush(heap, (-card.overall_rating, -card.pk, group, card))
+
+        while heap and len(self.selected) < SQUAD_SIZE[1]:
+            _, _, group, card = heapq.heappop(heap)
+            # Se vuelve a comprobar: los topes pueden haber cambiado desde que entró al heap
+            if self.fits(card):
+                self.add(card)
+            if self.group_counts[group] < GROUP_LIMITS[group][1]:
+                card = self.next_fitting(streams[group])
+                if card is not None:
+                    heapq.heappush(heap, (-card.overall_rating, -card.pk, group, card))
+
+        if len(self.selected) < SQUAD_SIZE[0]:
+            raise ValidationError(
+                {"detail": f"No hay cartas suficientes para una plantilla de {SQUAD_SIZE[0]}."}
+            )
+        return self.selected
+
+    def summary(self):
+        return {
+            "total_rating": sum(card.overall_rating for card in self.selected),
+            "size": len(self.selected),
+            "groups": {group: self.group_counts[group] for group in POSITION_GROUPS},
+        }
@@ -165,3 +165,167 @@ class UserModelTestCase(TestCase):
         print(
             "✅ test_create_retrieve_user: PASS - Usuario creado y recuperado correctamente"
         )
+
+
+# Tests del campo card_ids de TeamSerializer
+class TeamSerializerCardIdsTestCase(TestCase):
+    def setUp(self):
+        self.cards = [
+            Card.objects.create(
+                name=f"Jugador {i}",
+                country="Spain",
+                club="Club",
+                league="Liga",
+                position="MC",
+                pace=70, shooting=70, passing=70, dribbling=70, defending=70,
+                physical=70, diving=10, reflexes=10, handling=10,
+                positioning=10, kicking=10, speed=70,
+            )
+            for i in range(25)
+        ]
+
+    def test_card_ids_resolved_in_one_query(self):
+        from api.serializers import TeamSerializer
+
+        ids = [card.id for card in reversed(self.cards)]
+
+        # 1️⃣ 25 ids → una sola consulta
+        serializer = TeamSerializer(data={"name": "Dream FC", "card_ids": ids})
+        with self.assertNumQueries(1):
+            self.assertTrue(serializer.is_valid())
+
+        # 2️⃣ Las cartas vuelven en el orden de la petición (con repeticiones)
+        self.assertEqual([c.id for c in serializer.validated_data["cards"]], ids)
+        serializer = TeamSerializer(data={"name": "X", "card_ids": [ids[0], ids[0]]})
+        self.assertTrue(serializer.is_valid())
+        self.assertEqual(len(serializer.validated_data["cards"]), 2)
+        print(
+            "✅ test_card_ids_resolved_in_one_query: PASS - card_ids se resuelve con una consulta"
+        )
+
+    def test_card_ids_error_messages(self):
+        from api.serializers import TeamSerializer
+
+        # 1️⃣ Id inexistente: mismo mensaje que PrimaryKeyRelatedField
+        serializer = TeamSerializer(data={"name": "X", "card_ids": [self.cards[0].id, 9999]})
+        self.assertFalse(serializer.is_valid())
+        self.assertEqual(
+            serializer.errors["card_ids"], ['Invalid pk "9999" - object does not exist.']
+        )
+
+        # 2️⃣ Tipo incorrecto
+        serializer = TeamSerializer(data={"name": "X", "card_ids": ["abc"]})
+        self.assertFalse(serializer.is_valid())
+        self.assertEqual(
+            serializer.errors["card_ids"], ["Incorrect type. Expected pk value, received str."]
+        )
+
+        # 3️⃣ No es una lista
+        serializer = TeamSerializer(data={"name": "X", "card_ids": 5})
+        self.assertFalse(serializer.is_valid())
+        self.assertIn("Expected a list of items", str(serializer.errors["card_ids"][0]))
+        print(
+            "✅ test_card_ids_error_messages: PASS - Mensajes de error de card_ids sin cambios"
+        )
+
+
+# Tests de los agregados desnormalizados de Team
+class TeamAggregatesTestCase(TestCase):
+    def setUp(self):
+        from api.ratings import STATS
+
+        self.cards = [
+            Card.objects.create(
+                name=f"Jugador {i}",
+                country="Spain",
+                club="Club",
+                league="Liga",
+                position=position,
+                **{stat: 40 + (i * 7 + j) % 50 for j, stat in enumerate(STATS)},
+            )
+            for i, position in enumerate(["POR", "DFC", "LD", "MC", "MCO", "DC", "EI", "POR"])
+        ]
+        self.team = Team.objects.create(name="Agregados FC")
+        self.other = Team.objects.create(name="Otro FC")
+
+    def assert_consistent(self):
+        from api.aggregates import AGGREGATE_FIELDS, computed_aggregates
+
+        for team in computed_aggregates(Team.objects.all()):
+            for field in AGGREGATE_FIELDS:
+                self.assertEqual(getattr(team, field), getattr(team, f"calc_{field}"), field)
+
+    def test_aggregates_follow_team_cards(self):
+        # 1️⃣ Altas y bajas por los dos lados de la relación
+        self.team.cards.add(*self.cards[:6])
+        self.cards[6].teams.add(self.team, self.other)
+        self.team.cards.remove(self.cards[0])
+        self.assert_consistent()
+
+        team = Team.objects.get(pk=self.team.pk)
+        self.assertEqual(team.card_count, 6)
+        self.assertEqual(team.gk_count, 0)
+        self.assertEqual(team.fwd_count, 2)
+
+        # 2️⃣ Cambios de la carta: media, posición y desactivación
+        card = Card.objects.get(pk=self.cards[1].pk)
+        card.position = "DC"
+        card.pace = 99
+        card.save()
+        card = Card.objects.get(pk=self.cards[6].pk)
+        card.active = False
+        card.save()
+        self.assert_consistent()
+        self.assertEqual(Team.objects.get(pk=self.other.pk).card_count, 0)
+
+        # 3️⃣ clear() por los dos lados y borrado de una carta
+        self.cards[2].teams.clear()
+        self.cards[3].delete()
+        self.assert_consistent()
+        self.team.cards.clear()
+        self.assert_consistent()
+        print("✅ test_aggregates_follow_team_cards: PASS - Agregados del equipo al día")
+
+    def test_removing_non_members_keeps_aggregates(self):
+        self.team.cards.add(self.cards[0])
+        expected = Team.objects.get(pk=self.team.pk)
+
+        # 1️⃣ Quitar cartas que no están en el equipo no resta nada
+        self.team.cards.remove(self.cards[1], self.cards[2])
+        self.cards[3].teams.remove(self.team)
+        team = Team.objects.get(pk=self.team.pk)
+        self.assertEqual(team.card_count, 1)
+        self.assertEqual(team.rating_total, expected.rating_total)
+        self.assert_consistent()
+
+        # 2️⃣ Mezcla de miembros y no miembros: solo se restan los miembros
+        self.team.cards.add(self.cards[4])
+        self.team.cards.remove(self.cards[4], self.cards[5])
+        self.cards[0].teams.remove(self.team, self.other)
+        team = Team.objects.get(pk=self.team.pk)
+        self.assertEqual((team.card_count, team.rating_total), (0, 0))
+        self.assert_consistent()
+        print(
+            "✅ test_removing_non_members_keeps_aggregates: PASS - Quitar no miembros no descuadra los agregados"
+        )
+
+    def test_aggregates_survive_bulk_writes_and_stale_saves(self):
+        from api.serializers import CardSerializer
+
+        self.team.cards.add(*self.cards)
+        stale = Team.objects.get(pk=self.team.pk)
+
+        # 1️⃣ Cambios masivos (bulk_update) → se recalculan los equipos afectados
+        serializer = CardSerializer(many=True, partial=True)
+        serializer.update(self.cards[:2], [{"shooting": 99}, {"position": "MC"}])
+        self.assert_consistent()
+
+        # 2️⃣ Guardar una instancia vieja no pisa los agregados
+        self.team.cards.remove(self.cards[-1])
+        stale.name = "Nuevo nombre"
+        stale.save()
+        self.assert_consistent()
+        self.assertEqual(Team.objects.get(pk=self.team.pk).name, "Nuevo nombre")
+        print(
+            "✅ test_aggregates_survive_bulk_writes_and_stale_saves: PASS - Agregados coherentes tras escrituras masivas"
+        )
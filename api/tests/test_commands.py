@@ -1,7 +1,12 @@
 import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
 from contextlib import redirect_stdout
 from django.core.management import call_command
-from django.test import TestCase
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
 from api.models import *
 
 
@@ -38,3 +43,248 @@ class CardCommandsTests(TestCase):
         print(
             "✅ test_load_cards_command_creates_cards: PASS - Comando load_cards creó 600 cartas correctamente"
         )
+
+    def test_load_cards_command_batches_and_limit(self):
+        # Cargamos en lotes pequeños para forzar varias transacciones
+        f = io.StringIO()
+        with redirect_stdout(f):
+            call_command("load_cards", limit=250, batch_size=100, stdout=f)
+
+        # 1️⃣ Se cargan exactamente las cartas pedidas
+        self.assertEqual(Card.objects.count(), 250)
+
+        # 2️⃣ La media se calcula aunque bulk_create no llame a save()
+        for card in Card.objects.all()[:20]:
+            self.assertEqual(card.overall_rating, card.calculate_overall_rating())
+
+        # 3️⃣ Un límite mayor que el fichero ya no es un error
+        with redirect_stdout(f):
+            call_command("load_cards", limit=10_000, stdout=f)
+        self.assertEqual(Card.objects.count(), 850)
+        self.assertIn("cartas/s", f.getvalue())
+        print(
+            "✅ test_load_cards_command_batches_and_limit: PASS - Carga por lotes y sin tope de 600 correcta"
+        )
+
+    def test_recompute_ratings_command(self):
+        f = io.StringIO()
+        with redirect_stdout(f):
+            call_command("load_cards", limit=120, stdout=f)
+
+        # Estropeamos algunas medias sin pasar por save()
+        broken = list(Card.objects.order_by("id").values_list("id", flat=True)[:30])
+        Card.objects.filter(id__in=broken).update(overall_rating=0)
+
+        with redirect_stdout(f):
+            call_command("recompute_ratings", batch_size=50, stdout=f)
+
+        # 1️⃣ Solo se reescriben las medias que cambian
+        self.assertIn("30 medias actualizadas", f.getvalue())
+
+        # 2️⃣ Todas las medias vuelven a ser las calculadas
+        for card in Card.objects.all():
+            self.assertEqual(card.overall_rating, card.calculate_overall_rating())
+        print(
+            "✅ test_recompute_ratings_command: PASS - Recalculo de medias por lotes correcto"
+        )
+
+    def test_rebuild_team_aggregates_command(self):
+        f = io.StringIO()
+        with redirect_stdout(f):
+            call_command("load_cards", limit=60, stdout=f)
+        team = Team.objects.create(name="Equipo")
+        team.cards.add(*Card.objects.all()[:25])
+
+        # Estropeamos los agregados sin pasar por las señales
+        Team.objects.filter(pk=team.pk).update(card_count=0, rating_total=1)
+
+        # 1️⃣ --check solo informa
+        with redirect_stdout(f):
+            call_command("rebuild_team_aggregates", check=True, stdout=f)
+        self.assertIn("1 con agregados desfasados", f.getvalue())
+        self.assertEqual(Team.objects.get(pk=team.pk).card_count, 0)
+
+        # 2️⃣ Sin --check los corrige
+        with redirect_stdout(f):
+            call_command("rebuild_team_aggregates", stdout=f)
+        team = Team.objects.get(pk=team.pk)
+        self.assertEqual(team.card_count, 25)
+        self.assertEqual(team.rating_total, sum(c.overall_rating for c in team.cards.all()))
+        print(
+            "✅ test_rebuild_team_aggregates_command: PASS - Reconstrucción de agregados correcta"
+        )
+
+
+    def test_seed_command(self):
+        from collections import Counter
+
+        from api.aggregates import refresh_team_aggregates
+        from api.squad import GROUP_LIMITS, GROUP_OF_POSITION, SQUAD_SIZE
+
+        f = io.StringIO()
+        call_command(
+            "seed", cards=900, users=40, teams=10, batch_size=256, workers=2, stdout=f
+        )
+
+        # 1️⃣ Cantidades pedidas, en bloques de --batch-size
+        self.assertEqual(Card.objects.count(), 900)
+        self.assertEqual(User.objects.count(), 40)
+        self.assertEqual(User.objects.filter(team__isnull=False).count(), 10)
+        self.assertIn("📦 256 cartas", f.getvalue())
+
+        # 2️⃣ Equipos legales y con los agregados correctos
+        for team in Team.objects.prefetch_related("cards"):
+            groups = Counter(GROUP_OF_POSITION[card.position] for card in team.cards.all())
+            self.assertTrue(SQUAD_SIZE[0] <= team.cards.count() <= SQUAD_SIZE[1])
+            for group, (minimum, maximum) in GROUP_LIMITS.items():
+                self.assertTrue(minimum <= groups[group] <= maximum)
+        self.assertEqual(refresh_team_aggregates(dry_run=True), 0)
+
+        # 3️⃣ Mismo seed = mismas cartas, con un proceso o con varios
+        first = list(Card.objects.order_by("id").values_list("name", "position", "overall_rating"))
+        Card.objects.all().delete()
+        call_command("seed", cards=900, users=0, teams=0, batch_size=256, workers=1, stdout=f)
+        again = list(Card.objects.order_by("id").values_list("name", "position", "overall_rating"))
+        self.assertEqual(first, again)
+
+        # 4️⃣ Más equipos que usuarios → error
+        call_command("seed", cards=0, users=1, teams=2, stdout=f)
+        self.assertIn("--teams no puede superar --users", f.getvalue())
+        print("✅ test_seed_command: PASS - Generación de cartas, usuarios y equipos correcta")
+
+    def test_archive_cards_command(self):
+        from datetime import timedelta
+
+        from django.utils import timezone
+
+        f = io.StringIO()
+        with redirect_stdout(f):
+            call_command("load_cards", limit=40)
+        ids = list(Card.objects.order_by("id").values_list("id", flat=True))
+        team = Team.objects.create(name="Con borradas")
+        team.cards.add(ids[0])
+
+        # Borradas hace 60 días: 10, una de ellas en un equipo; borradas hoy: 5
+        old = timezone.now() - timedelta(days=60)
+        Card.all_objects.filter(id__in=ids[:10]).update(active=False, updated_at=old)
+        Card.all_objects.filter(id__in=ids[10:15]).update(active=False)
+        expected = Card.all_objects.get(id=ids[5])
+
+        # 1️⃣ El manager por defecto solo ve las activas
+        self.assertEqual(Card.objects.count(), 25)
+        self.assertEqual(Card.all_objects.count(), 40)
+
+        # 2️⃣ --dry-run no toca nada
+        call_command("archive_cards", days=30, dry_run=True, stdout=f)
+        self.assertIn("9 cartas se archivarían", f.getvalue())
+        self.assertEqual(CardArchive.objects.count(), 0)
+
+        # 3️⃣ Se archivan las 9 antiguas que no están en equipos, en lotes
+        call_command("archive_cards", days=30, batch_size=4, stdout=f)
+        self.assertEqual(CardArchive.objects.count(), 9)
+        self.assertEqual(Card.all_objects.count(), 31)
+        self.assertTrue(Card.all_objects.filter(id=ids[0]).exists())
+        inactive = Card.all_objects.filter(active=False).values_list("id", flat=True)
+        self.assertEqual(set(inactive), {ids[0], *ids[10:15]})
+
+        # 4️⃣ La copia conserva los datos y las fechas de la carta
+        archived = CardArchive.objects.get(card_id=ids[5])
+        self.assertEqual(archived.name, expected.name)
+        self.assertEqual(archived.overall_rating, expected.overall_rating)
+        self.assertEqual(archived.created_at, expected.created_at)
+        self.assertEqual(archived.updated_at, old)
+        print("✅ test_archive_cards_command: PASS - Cartas borradas archivadas fuera de la tabla de cartas")
+
+
+    def test_refresh_percentiles_command(self):
+        from api.percentiles import load_table, reset_percentiles
+
+        f = io.StringIO()
+        with redirect_stdout(f):
+            call_command("load_cards", limit=50)
+        reset_percentiles()
+
+        # 1️⃣ Calcula la tabla con las cartas activas y la guarda en la base de datos
+        call_command("refresh_percentiles", stdout=f)
+        self.assertIn("✅ Percentiles recalculados: 50 cartas activas", f.getvalue())
+        table = load_table()
+        self.assertEqual(int(table.totals[:, 0].sum()), 50)
+
+        # 2️⃣ Al volver a lanzarlo recoge los cambios
+        Card.objects.filter(id__in=Card.objects.order_by("id").values("id")[:10]).update(active=False)
+        call_command("refresh_percentiles", stdout=f)
+        self.assertIn("✅ Percentiles recalculados: 40 cartas activas", f.getvalue())
+        self.assertIsNot(load_table(), table)
+        print("✅ test_refresh_percentiles_command: PASS - Percentiles recalculados y publicados")
+
+
+class ReplicateCommandTests(TransactionTestCase):
+    # Sin transacción alrededor del test: la copia solo ve datos confirmados
+
+    def test_replicate_command_copies_primary(self):
+        import sqlite3
+
+        f = io.StringIO()
+        with redirect_stdout(f):
+            call_command("load_cards", limit=30, stdout=f)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "replica.sqlite3")
+
+            # 1️⃣ La réplica tiene el esquema y los datos del primario
+            call_command("replicate", path=[path], stdout=f)
+            replica = sqlite3.connect(path)
+            try:
+                count = replica.execute("SELECT COUNT(*) FROM api_card").fetchone()[0]
+            finally:
+                replica.close()
+            self.assertEqual(count, 30)
+            self.assertIn("1 réplica(s) actualizadas", f.getvalue())
+
+        # 2️⃣ Sin réplicas configuradas ni --path, error
+        call_command("replicate", stdout=f)
+        self.assertIn("No hay réplicas configuradas", f.getvalue())
+        print("✅ test_replicate_command_copies_primary: PASS - Copia del primario a la réplica correcta")
+
+
+class DatabaseProfileTests(SimpleTestCase):
+    # Los perfiles se leen al importar settings: se comprueban en otro proceso
+    def run_settings(self, **environ):
+        code = (
+            "import django, json; django.setup();"
+            "from django.db import connection;"
+            "c = connection.cursor();"
+            "print(json.dumps({p: c.execute('PRAGMA ' + p).fetchone()[0] for p in"
+            " ('journal_mode', 'synchronous', 'mmap_size', 'busy_timeout')}"
+            " | {'conn_max_age': connection.settings_dict['CONN_MAX_AGE']}))"
+        )
+        with tempfile.TemporaryDirectory() as tmp:
+            env = dict(
+                os.environ,
+                DJANGO_SETTINGS_MODULE="fifaproject.settings",
+                DB_NAME=os.path.join(tmp, "db.sqlite3"),
+                **environ,
+            )
+            return subprocess.run(
+                [sys.executable, "-c", code], env=env, capture_output=True, text=True
+            )
+
+    def test_production_profile_pragmas(self):
+        result = self.run_settings(DB_PROFILE="production", DB_BUSY_TIMEOUT="1234")
+
+        # 1️⃣ WAL, pragmas y conexiones persistentes; cada valor se puede cambiar
+        pragmas = json.loads(result.stdout)
+        self.assertEqual(pragmas["journal_mode"], "wal")
+        self.assertEqual(pragmas["synchronous"], 1)  # NORMAL
+        self.assertEqual(pragmas["mmap_size"], 268435456)
+        self.assertEqual(pragmas["busy_timeout"], 1234)
+        self.assertEqual(pragmas["conn_max_age"], 600)
+
+        # 2️⃣ Perfil por defecto: el comportamiento de Django
+        pragmas = json.loads(self.run_settings(DB_PROFILE="development").stdout)
+        self.assertEqual(pragmas["journal_mode"], "delete")
+        self.assertEqual(pragmas["conn_max_age"], 0)
+
+        # 3️⃣ Perfil desconocido → error al arrancar
+        self.assertNotEqual(self.run_settings(DB_PROFILE="nope").returncode, 0)
+        print("✅ test_production_profile_pragmas: PASS - Perfiles de base de datos correctos")
@@ -1,11 +1,16 @@
 from contextlib import redirect_stdout
+import csv
 import io
+import json
+import tempfile
 from django.core.management import call_command
+from django.test import override_settings
 from rest_framework.test import APITestCase
 from rest_framework import status
 from django.urls import reverse
 from api.models import *
 from api.serializers import *
+from api.cache import card_cache_stats, catalogue_version
 
 
 class UserEndpointsTestCase(APITestCase):
@@ -49,14 +54,15 @@ class UserEndpointsTestCase(APITestCase):
         # 1️⃣ Comprobamos que devuelve un 200 OK
         self.assertEqual(response.status_code, status.HTTP_200_OK)
 
-        # 2️⃣ Comprobamos que se listan todos los usuarios
-        users = User.objects.all()
+        # 2️⃣ Comprobamos que se listan todos los usuarios (paginados por id)
+        users = User.objects.order_by("id")
         serializer = UserSerializer(
             users, many=True
         )  # Pasamos a dict todos los usuarios de la BD
         self.assertEqual(
-            response.data, serializer.data
+            response.data["results"], serializer.data
         )  # Comprobamos los usuarios del setUp
+        self.assertIsNone(response.data["next"])
         print(
             "✅ test_list_users: PASS - Listado de usuarios funcionando correctamente"
         )
@@ -305,13 +311,13 @@ class CardEndpointsTestCase(APITestCase):
         # 1️⃣ Comprobamos que devuelve un 200 OK
         self.assertEqual(response.status_code, status.HTTP_200_OK)
 
-        # 2️⃣ Comprobamos que se listan todos los cartas
-        cards = Card.objects.all()
+        # 2️⃣ Comprobamos que se listan todos los cartas (mejor media primero)
+        cards = Card.objects.order_by("-overall_rating", "-id")
         serializer = CardSerializer(
             cards, many=True
         )  # Pasamos a dict todos los cartas de la BD
         self.assertEqual(
-            response.data, serializer.data
+            response.data["results"], serializer.data
         )  # Comprobamos los cartas del setUp
         print("✅ test_list_cards: PASS - Listado de cartas funcionando correctamente")
 
@@ -396,7 +402,1115 @@ class CardEndpointsTestCase(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
 
         # 2️⃣ Comprobamos que la carta se eliminó (soft delete) de la BD
-        self.assertFalse(Card.objects.get(id=self.card1.id).active)
+        self.assertFalse(Card.all_objects.get(id=self.card1.id).active)
+        self.assertFalse(Card.objects.filter(id=self.card1.id).exists())
         print(
             "✅ test_destroy_card: PASS - Eliminación lógica de carta funcionando correctamente"
         )
+
+    def test_list_hides_deleted_cards(self):
+        self.client.delete(reverse("card-retrieve-update-destroy", args=[self.card1.id]))
+        url = reverse("card-list-create")
+
+        # 1️⃣ El listado solo devuelve las cartas activas
+        ids = [card["id"] for card in self.client.get(url).data["results"]]
+        self.assertEqual(ids, [self.card2.id])
+
+        # 2️⃣ Las borradas se piden explícitamente con ?active=false
+        ids = [card["id"] for card in self.client.get(f"{url}?active=false").data["results"]]
+        self.assertEqual(ids, [self.card1.id])
+
+        # 3️⃣ El detalle sigue disponible, con active=False
+        response = self.client.get(reverse("card-retrieve-update-destroy", args=[self.card1.id]))
+        self.assertFalse(response.data["active"])
+        print("✅ test_list_hides_deleted_cards: PASS - Listado solo con cartas activas")
+
+
+class PaginationEndpointsTestCase(APITestCase):
+    def setUp(self):
+        f = io.StringIO()
+        with redirect_stdout(f):
+            call_command("load_cards", limit=95)
+
+    def test_cards_cursor_pagination(self):
+        url = reverse("card-list-create")
+        expected = list(
+            Card.objects.order_by("-overall_rating", "-id").values_list("id", flat=True)
+        )
+
+        # 1️⃣ Recorremos todas las páginas siguiendo los enlaces "next"
+        seen = []
+        next_url = f"{url}?page_size=20"
+        pages = []
+        while next_url:
+            response = self.client.get(next_url, format="json")
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            pages.append(response.data)
+            seen.extend(card["id"] for card in response.data["results"])
+            next_url = response.data["next"]
+
+        # 2️⃣ Cada carta aparece una sola vez y en orden (media desc, id desc)
+        self.assertEqual(seen, expected)
+        self.assertEqual(len(pages), 5)
+        self.assertIsNone(pages[0]["previous"])
+
+        # 3️⃣ El enlace "previous" devuelve la página anterior
+        response = self.client.get(pages[2]["previous"], format="json")
+        self.assertEqual(response.data["results"], pages[1]["results"])
+
+        # 4️⃣ Un cursor manipulado da 404
+        response = self.client.get(f"{url}?cursor=basura", format="json")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        print(
+            "✅ test_cards_cursor_pagination: PASS - Paginación por cursor de cartas correcta"
+        )
+
+    def test_tampered_cursor_values(self):
+        import base64
+        import json
+
+        url = reverse("card-list-create")
+
+        def cursor(values):
+            payload = json.dumps({"v": values, "r": False}).encode("utf-8")
+            return base64.urlsafe_b64encode(payload).decode("ascii")
+
+        # 1️⃣ Valores que no son del tipo de su columna: 404, no 500
+        for values in (["abc", 5], [{"a": 1}, 5], [None, 5], [[1], 5], [True, 5], [80, "5"]):
+            response = self.client.get(f"{url}?cursor={cursor(values)}", format="json")
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND, values)
+
+        # 2️⃣ Una fecha que no se puede interpretar también da 404
+        response = self.client.get(
+            f"{url}?ordering=created_at&cursor={cursor(['ayer', 5])}", format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        # 3️⃣ Un cursor bien formado sigue funcionando
+        response = self.client.get(f"{url}?cursor={cursor([80, 10**9])}", format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.client.get(f"{url}?ordering=name&cursor={cursor(['M', 0])}", format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        print("✅ test_tampered_cursor_values: PASS - Cursores con valores manipulados dan 404")
+
+    def test_cursor_pages_do_not_count(self):
+        url = reverse("card-list-create")
+        first = self.client.get(f"{url}?page_size=10", format="json")
+
+        # Cada página es una sola consulta (sin COUNT(*)), también las siguientes,
+        # más la lectura de la versión del catálogo
+        with self.assertNumQueries(2):
+            response = self.client.get(first.data["next"], format="json")
+        self.assertEqual(len(response.data["results"]), 10)
+        print(
+            "✅ test_cursor_pages_do_not_count: PASS - Las páginas no hacen COUNT(*)"
+        )
+
+    def test_cards_filtering_and_sorting(self):
+        url = reverse("card-list-create")
+
+        # 1️⃣ Igualdad por posición + rango de media
+        response = self.client.get(
+            f"{url}?position=DC&overall_rating_min=80&page_size=500", format="json"
+        )
+        expected = Card.objects.filter(position="DC", overall_rating__gte=80)
+        self.assertEqual(
+            {card["id"] for card in response.data["results"]},
+            set(expected.values_list("id", flat=True)),
+        )
+
+        # 2️⃣ Rangos sobre cualquier stat
+        response = self.client.get(f"{url}?pace_min=85&pace_max=90", format="json")
+        self.assertTrue(
+            all(85 <= card["pace"] <= 90 for card in response.data["results"])
+        )
+
+        # 3️⃣ Ordenación ascendente por stat, paginada sin repetir cartas
+        seen = []
+        next_url = f"{url}?ordering=pace&page_size=30"
+        while next_url:
+            response = self.client.get(next_url, format="json")
+            seen.extend((c["pace"], c["id"]) for c in response.data["results"])
+            next_url = response.data["next"]
+        self.assertEqual(seen, sorted(Card.objects.values_list("pace", "id")))
+
+        # 4️⃣ Parámetros no válidos dan 400
+        response = self.client.get(f"{url}?ordering=password", format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        for ordering in ("--pace", "---id", "-"):
+            response = self.client.get(f"{url}?ordering={ordering}", format="json")
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, ordering)
+        response = self.client.get(f"{url}?pace_min=mucho", format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        print(
+            "✅ test_cards_filtering_and_sorting: PASS - Filtros y ordenación de cartas correctos"
+        )
+
+
+class QueryCountTestCase(APITestCase):
+    # Las vistas de usuarios y equipos hacen un número fijo de consultas
+
+    def setUp(self):
+        f = io.StringIO()
+        with redirect_stdout(f):
+            call_command("load_cards", limit=60)
+        self.cards = list(Card.objects.order_by("id"))
+
+    def create_users_with_teams(self, n):
+        for i in range(n):
+            team = Team.objects.create(name=f"Equipo {i}")
+            team.cards.set(self.cards[i : i + 25])
+            User.objects.create(name=f"User {i}", email=f"user{i}@example.com", team=team)
+        # Una carta desactivada no debe aparecer en los equipos
+        self.cards[0].active = False
+        self.cards[0].save()
+
+    def test_user_list_query_count_is_constant(self):
+        url = reverse("user-list-create")
+
+        # 1️⃣ Con 3 usuarios: usuarios+equipos (JOIN) y cartas activas (prefetch),
+        # más las versiones y los 3 MAX(updated_at) del validador ETag / Last-Modified
+        self.create_users_with_teams(3)
+        with self.assertNumQueries(6):
+            response = self.client.get(url, format="json")
+        self.assertEqual(len(response.data["results"]), 3)
+
+        # 2️⃣ Con el triple de usuarios siguen siendo las mismas consultas
+        User.objects.all().delete()
+        Team.objects.all().delete()
+        self.create_users_with_teams(9)
+        with self.assertNumQueries(6):
+            response = self.client.get(url, format="json")
+        self.assertEqual(len(response.data["results"]), 9)
+
+        # 3️⃣ Solo se devuelven las cartas activas
+        first_team = response.data["results"][0]["team"]
+        self.assertNotIn(self.cards[0].id, [c["id"] for c in first_team["cards"]])
+        self.assertEqual(len(first_team["cards"]), 24)
+        print(
+            "✅ test_user_list_query_count_is_constant: PASS - Listado de usuarios sin N+1"
+        )
+
+    def test_user_detail_and_team_query_count(self):
+        self.create_users_with_teams(2)
+        user = User.objects.first()
+
+        # Validador (1 agregado) + usuario con equipo + cartas activas
+        with self.assertNumQueries(3):
+            response = self.client.get(
+                reverse("user-retrieve-update-destroy", args=[user.id]), format="json"
+            )
+        self.assertEqual(len(response.data["team"]["cards"]), 24)
+
+        with self.assertNumQueries(3):
+            response = self.client.get(
+                reverse("user-team-view", args=[user.id]), format="json"
+            )
+        self.assertEqual(len(response.data["cards"]), 24)
+        print(
+            "✅ test_user_detail_and_team_query_count: PASS - Detalle y equipo con consultas fijas"
+        )
+
+
+class CardCacheTestCase(APITestCase):
+    def setUp(self):
+        f = io.StringIO()
+        with redirect_stdout(f):
+            call_command("load_cards", limit=30)
+        card_cache_stats.reset()
+
+    def check_cache_cycle(self):
+        list_url = reverse("card-list-create")
+        card = Card.objects.order_by("id").first()
+        detail_url = reverse("card-retrieve-update-destroy", args=[card.id])
+
+        # 1️⃣ Primera petición: fallo; segunda: acierto, solo se lee la versión
+        self.assertEqual(self.client.get(list_url)["X-Cache"], "MISS")
+        with self.assertNumQueries(1):
+            response = self.client.get(list_url)
+        self.assertEqual(response["X-Cache"], "HIT")
+
+        # 2️⃣ Los parámetros forman parte de la clave
+        self.assertEqual(self.client.get(f"{list_url}?page_size=5")["X-Cache"], "MISS")
+        self.assertEqual(self.client.get(detail_url)["X-Cache"], "MISS")
+        self.assertEqual(self.client.get(detail_url)["X-Cache"], "HIT")
+
+        # 3️⃣ Un PATCH invalida el catálogo y se ve el cambio
+        self.client.patch(detail_url, {"name": "Renombrada"}, format="json")
+        response = self.client.get(detail_url)
+        self.assertEqual(response["X-Cache"], "MISS")
+        self.assertEqual(response.data["name"], "Renombrada")
+
+        # 4️⃣ El borrado lógico también invalida
+        self.client.delete(detail_url)
+        response = self.client.get(detail_url)
+        self.assertEqual(response["X-Cache"], "MISS")
+        self.assertFalse(response.data["active"])
+
+        # 5️⃣ Y las cargas masivas (bulk_create)
+        self.client.get(list_url)
+        f = io.StringIO()
+        with redirect_stdout(f):
+            call_command("load_cards", limit=5)
+        self.assertEqual(self.client.get(list_url)["X-Cache"], "MISS")
+
+        # 6️⃣ Los contadores reflejan aciertos y fallos
+        stats = self.client.get(reverse("card-cache-stats")).data
+        self.assertEqual((stats["hits"], stats["misses"]), (2, 7))
+
+    def test_card_cache_locmem(self):
+        self.check_cache_cycle()
+        print("✅ test_card_cache_locmem: PASS - Caché de cartas con LocMemCache correcta")
+
+    def test_card_cache_file_based(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            caches_setting = {
+                "default": {
+                    "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+                    "LOCATION": tmp,
+                }
+            }
+            with override_settings(CACHES=caches_setting):
+                self.check_cache_cycle()
+        print(
+            "✅ test_card_cache_file_based: PASS - Caché de cartas con FileBasedCache correcta"
+        )
+
+
+class ConditionalGetTestCase(APITestCase):
+    def setUp(self):
+        f = io.StringIO()
+        with redirect_stdout(f):
+            call_command("load_cards", limit=60)
+        self.cards = list(Card.objects.order_by("id"))
+        self.user = User.objects.create(name="Messi", email="messi@example.com")
+        self.team = Team.objects.create(name="Dream FC")
+        self.team.cards.set(self.cards[:25])
+        self.user.team = self.team
+        self.user.save()
+
+    def test_cards_etag_and_last_modified(self):
+        url = reverse("card-list-create")
+        response = self.client.get(url)
+        etag = response["ETag"]
+        self.assertIn("Last-Modified", response)
+
+        # 1️⃣ Mismo ETag → 304 sin cuerpo; solo se lee la versión del catálogo
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response.content, b"")
+
+        # 2️⃣ Otra URL (filtros) → otro ETag
+        other = self.client.get(f"{url}?position=DC")
+        self.assertNotEqual(other["ETag"], etag)
+
+        # 3️⃣ Tras modificar una carta el ETag cambia
+        card_url = reverse("card-retrieve-update-destroy", args=[self.cards[40].id])
+        self.client.patch(card_url, {"pace": 10}, format="json")
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        # 4️⃣ If-Modified-Since en el detalle
+        response = self.client.get(card_url)
+        response = self.client.get(card_url, HTTP_IF_MODIFIED_SINCE=response["Last-Modified"])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        print(
+            "✅ test_cards_etag_and_last_modified: PASS - GET condicional de cartas correcto"
+        )
+
+    def test_team_etag_follows_cards(self):
+        url = reverse("user-team-view", args=[self.user.id])
+        etag = self.client.get(url)["ETag"]
+
+        # 1️⃣ Sin cambios → 304 antes de serializar (solo el agregado)
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        # 2️⃣ Cambiar las cartas (M2M) actualiza el updated_at del equipo
+        before = Team.objects.get(pk=self.team.pk).updated_at
+        self.team.cards.remove(self.cards[0])
+        self.assertGreater(Team.objects.get(pk=self.team.pk).updated_at, before)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        etag = response["ETag"]
+
+        # 3️⃣ Desactivar una carta del equipo también cambia el ETag
+        card = self.cards[1]
+        card.active = False
+        card.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        # 4️⃣ El listado de usuarios cambia al borrar un usuario
+        list_url = reverse("user-list-create")
+        other = User.objects.create(name="Otro", email="otro@example.com")
+        etag = self.client.get(list_url)["ETag"]
+        other.delete()
+        response = self.client.get(list_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        print(
+            "✅ test_team_etag_follows_cards: PASS - GET condicional de equipos y usuarios correcto"
+        )
+
+    def test_etag_sees_writes_from_other_processes(self):
+        from django.db.models import F
+
+        cards_url = reverse("card-list-create")
+        users_url = reverse("user-list-create")
+        cards_etag = self.client.get(cards_url)["ETag"]
+        users_etag = self.client.get(users_url)["ETag"]
+
+        # Otro worker (o un comando) escribe sin pasar por este proceso: solo
+        # comparten la base de datos, donde sube la versión
+        def write_elsewhere(name):
+            DataVersion.objects.filter(name=name).update(version=F("version") + 1)
+
+        # 1️⃣ Cartas: el ETag del listado cambia y no se responde 304
+        Card.objects.filter(pk=self.cards[40].pk).update(pace=1)
+        write_elsewhere("cards")
+        response = self.client.get(cards_url, HTTP_IF_NONE_MATCH=cards_etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["X-Cache"], "MISS")
+
+        # 2️⃣ Usuarios: lo mismo con la versión de usuarios
+        User.objects.filter(pk=self.user.pk).update(name="Leo")
+        write_elsewhere("users")
+        response = self.client.get(users_url, HTTP_IF_NONE_MATCH=users_etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["results"][0]["name"], "Leo")
+        print(
+            "✅ test_etag_sees_writes_from_other_processes: PASS - Validadores compartidos entre procesos"
+        )
+
+    def test_last_modified_sees_deletes(self):
+        from datetime import timedelta
+
+        from django.utils import timezone
+
+        other = User.objects.create(name="Otro", email="otro@example.com")
+        gone = self.cards[-1]
+
+        # Todo se escribió ayer salvo la carta y el usuario que se van a borrar,
+        # hace una hora: son los que dan MAX(updated_at)
+        yesterday = timezone.now() - timedelta(days=1)
+        for model in (Card.all_objects, User.objects, Team.objects):
+            model.update(updated_at=yesterday)
+        Card.all_objects.filter(pk=gone.pk).update(updated_at=yesterday + timedelta(hours=23))
+        User.objects.filter(pk=other.pk).update(updated_at=yesterday + timedelta(hours=23))
+        DataVersion.objects.update(version=int(yesterday.timestamp() * 1e9))
+
+        # 1️⃣ Borrar el último usuario modificado: el listado no responde 304
+        users_url = reverse("user-list-create")
+        last_modified = self.client.get(users_url)["Last-Modified"]
+        other.delete()
+        response = self.client.get(users_url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        # 2️⃣ Borrar la última carta modificada baja MAX(updated_at), pero la fecha sube
+        cards_url = reverse("card-list-create")
+        last_modified = self.client.get(cards_url)["Last-Modified"]
+        Card.all_objects.filter(pk=gone.pk).delete()
+        response = self.client.get(cards_url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn(gone.pk, [card["id"] for card in response.data["results"]])
+
+        # 3️⃣ Sin cambios sigue respondiendo 304
+        last_modified = response["Last-Modified"]
+        response = self.client.get(cards_url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        print("✅ test_last_modified_sees_deletes: PASS - Last-Modified cambia al borrar")
+
+
+class CardExportTestCase(APITestCase):
+    def setUp(self):
+        f = io.StringIO()
+        with redirect_stdout(f):
+            call_command("load_cards", limit=150)
+
+    def test_export_ndjson(self):
+        response = self.client.get(reverse("card-export"))
+
+        # 1️⃣ Respuesta en streaming en NDJSON por defecto
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        self.assertTrue(response["Content-Type"].startswith("application/x-ndjson"))
+
+        # 2️⃣ Una línea por carta, con los mismos datos que el serializer
+        lines = b"".join(response.streaming_content).decode("utf-8").splitlines()
+        self.assertEqual(len(lines), 150)
+        first = json.loads(lines[0])
+        card = Card.objects.order_by("id").first()
+        self.assertEqual(first, json.loads(json.dumps(CardSerializer(card).data)))
+        print("✅ test_export_ndjson: PASS - Export NDJSON en streaming correcto")
+
+    def test_export_csv_with_filters(self):
+        response = self.client.get(f"{reverse('card-export')}?format=csv&position=POR")
+        self.assertTrue(response["Content-Type"].startswith("text/csv"))
+
+        rows = list(csv.reader(b"".join(response.streaming_content).decode("utf-8").splitlines()))
+        # 1️⃣ Cabecera + una fila por portero
+        self.assertEqual(rows[0][:3], ["id", "name", "country"])
+        self.assertEqual(len(rows) - 1, Card.objects.filter(position="POR").count())
+        self.assertTrue(all(row[5] == "POR" for row in rows[1:]))
+
+        # 2️⃣ También con la cabecera Accept
+        response = self.client.get(reverse("card-export"), HTTP_ACCEPT="text/csv")
+        self.assertTrue(response["Content-Type"].startswith("text/csv"))
+        print("✅ test_export_csv_with_filters: PASS - Export CSV con filtros correcto")
+
+
+class CardBulkEndpointsTestCase(APITestCase):
+    def setUp(self):
+        self.url = reverse("card-bulk")
+        self.card_data = {
+            "name": "Neymar da Silva Santos Júnior",
+            "country": "Brazil",
+            "club": "FC Barcelona",
+            "league": "Spain Primera Division",
+            "position": "EI",
+            "pace": 90,
+            "shooting": 80,
+            "passing": 72,
+            "dribbling": 92,
+            "defending": 30,
+            "physical": 57,
+            "diving": 9,
+            "reflexes": 11,
+            "handling": 9,
+            "positioning": 15,
+            "kicking": 15,
+            "speed": 90,
+        }
+
+    def test_bulk_create(self):
+        # 40 cartas caben en un INSERT (SQLite admite hasta 999 parámetros)
+        items = [dict(self.card_data, name=f"Jugador {i}") for i in range(40)]
+        with self.assertNumQueries(4):  # SAVEPOINT + INSERT + RELEASE + versión
+            response = self.client.post(self.url, items, format="json")
+
+        # 1️⃣ Todas creadas con un único INSERT y con su media calculada
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(response.data["results"]), 40)
+        self.assertEqual(Card.objects.count(), 40)
+        expected = Card(**self.card_data).calculate_overall_rating()
+        self.assertTrue(all(c.overall_rating == expected for c in Card.objects.all()))
+
+        # 2️⃣ Los elementos inválidos no abortan el lote
+        items = [self.card_data, dict(self.card_data, pace=150), "x"]
+        response = self.client.post(self.url, items, format="json")
+        self.assertEqual(response.status_code, status.HTTP_207_MULTI_STATUS)
+        self.assertEqual(len(response.data["results"]), 1)
+        self.assertEqual([e["index"] for e in response.data["errors"]], [1, 2])
+        self.assertIn("pace", response.data["errors"][0]["errors"])
+        self.assertEqual(Card.objects.count(), 41)
+
+        # 3️⃣ Body que no es una lista
+        response = self.client.post(self.url, self.card_data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        # 4️⃣ Un lote sin ningún elemento válido no invalida la caché del catálogo
+        version = catalogue_version()
+        response = self.client.post(self.url, [dict(self.card_data, pace=150)], format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.patch(self.url, [{"id": 999999, "pace": 10}], format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(catalogue_version(), version)
+        print("✅ test_bulk_create: PASS - Alta masiva de cartas correcta")
+
+    def test_bulk_update(self):
+        cards = [Card.objects.create(**self.card_data) for _ in range(3)]
+        before = Card.objects.get(pk=cards[0].pk).updated_at
+
+        items = [
+            {"id": cards[0].pk, "position": "POR", "diving": 90},
+            {"id": cards[1].pk, "shooting": 99},
+            {"id": 999999, "pace": 10},
+            {"id": cards[2].pk, "pace": -1},
+        ]
+        response = self.client.patch(self.url, items, format="json")
+
+        # 1️⃣ Se guardan los válidos y se informa de los inválidos
+        self.assertEqual(response.status_code, status.HTTP_207_MULTI_STATUS)
+        self.assertEqual([e["index"] for e in response.data["errors"]], [2, 3])
+
+        # 2️⃣ Media recalculada y updated_at actualizado
+        card = Card.objects.get(pk=cards[0].pk)
+        self.assertEqual(card.position, "POR")
+        self.assertEqual(card.overall_rating, card.calculate_overall_rating())
+        self.assertGreater(card.updated_at, before)
+        self.assertEqual(Card.objects.get(pk=cards[1].pk).shooting, 99)
+        self.assertEqual(Card.objects.get(pk=cards[2].pk).pace, 90)
+        print("✅ test_bulk_update: PASS - Actualización masiva de cartas correcta")
+
+    def test_bulk_deactivate(self):
+        cards = [Card.objects.create(**self.card_data) for _ in range(3)]
+        team = Team.objects.create(name="Equipo")
+        team.cards.add(cards[2])
+
+        ids = [cards[0].pk, cards[1].pk, cards[2].pk, 999999]
+        response = self.client.delete(self.url, ids, format="json")
+
+        # 1️⃣ Se desactivan las que no están en ningún equipo
+        self.assertEqual(response.status_code, status.HTTP_207_MULTI_STATUS)
+        self.assertEqual(response.data["results"], [cards[0].pk, cards[1].pk])
+        self.assertEqual([e["index"] for e in response.data["errors"]], [2, 3])
+        self.assertEqual(
+            list(Card.objects.filter(active=True).values_list("pk", flat=True)), [cards[2].pk]
+        )
+        print("✅ test_bulk_deactivate: PASS - Desactivación masiva de cartas correcta")
+
+
+class SquadBuildEndpointTestCase(APITestCase):
+    def setUp(self):
+        f = io.StringIO()
+        with redirect_stdout(f):
+            call_command("load_cards", limit=600)
+        self.user = User.objects.create(name="Test", email="squad@test.com", password="1234")
+
+    def test_build_squad_and_save_team(self):
+        response = self.client.post(
+            reverse("squad-build"), {"max_per_league": 10}, format="json"
+        )
+
+        # 1️⃣ Devuelve la plantilla y sus ids
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["size"], len(response.data["card_ids"]))
+        self.assertEqual(
+            response.data["total_rating"],
+            sum(card["overall_rating"] for card in response.data["cards"]),
+        )
+
+        # 2️⃣ Los ids se pueden usar directamente para crear el equipo
+        url = reverse("user-team-view", args=[self.user.id])
+        team = self.client.post(
+            url, {"name": "Auto", "card_ids": response.data["card_ids"]}, format="json"
+        )
+        self.assertEqual(team.status_code, status.HTTP_201_CREATED)
+
+        # 3️⃣ Restricciones inválidas → 400
+        response = self.client.post(reverse("squad-build"), {"max_per_club": 0}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        card_id = Card.objects.order_by("id").values_list("id", flat=True).first()
+        response = self.client.post(
+            reverse("squad-build"),
+            {"required_cards": [card_id], "excluded_cards": [card_id]},
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("required_cards", response.data)
+        print("✅ test_build_squad_and_save_team: PASS - Generador de plantillas via endpoint correcto")
+
+    def test_unknown_positions(self):
+        # Posiciones que no están en ningún grupo (p. ej. de un JSON externo)
+        best = list(Card.objects.order_by("-overall_rating").values_list("id", flat=True)[:3])
+        Card.objects.filter(pk__in=best).update(position="GK")
+
+        # 1️⃣ No entran en la plantilla, pero no la rompen
+        response = self.client.post(reverse("squad-build"), {}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(set(best) & set(response.data["card_ids"]))
+
+        # 2️⃣ Como obligatorias dan 400 con el nombre del campo
+        response = self.client.post(
+            reverse("squad-build"), {"required_cards": best[:1]}, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("required_cards", response.data)
+        print("✅ test_unknown_positions: PASS - Cartas con posiciones desconocidas ignoradas")
+
+
+class LeaderboardEndpointsTestCase(APITestCase):
+    def setUp(self):
+        from api.leaderboard import leaderboard
+
+        leaderboard.reset()
+        f = io.StringIO()
+        with redirect_stdout(f):
+            call_command("load_cards", limit=100)
+        cards = list(Card.objects.order_by("id"))
+        self.users = []
+        for i in range(3):
+            team = Team.objects.create(name=f"Equipo {i}")
+            team.cards.add(*cards[i * 10 : i * 10 + 5 + i * 2])
+            self.users.append(
+                User.objects.create(name=f"U{i}", email=f"u{i}@rank.com", password="x", team=team)
+            )
+
+    def test_leaderboard_and_user_rank(self):
+        response = self.client.get(reverse("leaderboard"), {"limit": 2})
+
+        # 1️⃣ Top-K ordenado por la suma de medias de las cartas activas
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["count"], 3)
+        expected = list(Team.objects.order_by("-rating_total", "id").values_list("id", flat=True))
+        self.assertEqual([r["team_id"] for r in response.data["results"]], expected[:2])
+
+        # 2️⃣ Puesto del equipo de un usuario
+        first = Team.objects.get(pk=expected[0])
+        user = User.objects.get(team=first)
+        response = self.client.get(reverse("user-rank", args=[user.pk]))
+        self.assertEqual(response.data["rank"], 1)
+        self.assertEqual(response.data["score"], first.rating_total)
+
+        # 3️⃣ Al cambiar las cartas el ranking se actualiza
+        first.cards.clear()
+        response = self.client.get(reverse("user-rank", args=[user.pk]))
+        self.assertEqual(response.data["rank"], 3)
+        self.assertEqual(response.data["score"], 0)
+
+        # 4️⃣ Usuario sin equipo o inexistente → 404
+        user.team = None
+        user.save()
+        first.delete()
+        self.assertEqual(self.client.get(reverse("user-rank", args=[user.pk])).status_code, 404)
+        self.assertEqual(self.client.get(reverse("user-rank", args=[9999])).status_code, 404)
+        self.assertEqual(self.client.get(reverse("leaderboard")).data["count"], 2)
+        print("✅ test_leaderboard_and_user_rank: PASS - Ranking de equipos correcto")
+
+
+class AsyncReadPathTestCase(APITestCase):
+    def setUp(self):
+        f = io.StringIO()
+        with redirect_stdout(f):
+            call_command("load_cards", limit=120)
+        cards = list(Card.objects.order_by("id")[:25])
+        team = Team.objects.create(name="Async FC")
+        team.cards.set(cards)
+        self.user = User.objects.create(name="A", email="a@async.com", password="x", team=team)
+
+    async def test_async_views_match_sync_views(self):
+        card = await Card.objects.afirst()
+        pairs = [
+            ("/cards/?page_size=20&position=POR", "/async/cards/?page_size=20&position=POR"),
+            ("/cards/?ordering=-pace&page_size=10", "/async/cards/?ordering=-pace&page_size=10"),
+            (f"/cards/{card.pk}/", f"/async/cards/{card.pk}/"),
+            ("/cards/999999/", "/async/cards/999999/"),
+            ("/cards/?ordering=nope", "/async/cards/?ordering=nope"),
+            (f"/users/{self.user.pk}/team/", f"/async/users/{self.user.pk}/team/"),
+            ("/users/999999/team/", "/async/users/999999/team/"),
+        ]
+        for sync_url, async_url in pairs:
+            expected = await self.async_client.get(sync_url)
+            response = await self.async_client.get(async_url)
+
+            # 1️⃣ Mismo código y mismo JSON que la vista síncrona
+            self.assertEqual(response.status_code, expected.status_code, async_url)
+            body, expected_body = response.json(), expected.json()
+            for data in (body, expected_body):
+                # Los enlaces de paginación llevan la ruta de cada vista
+                if isinstance(data, dict):
+                    data.pop("next", None)
+                    data.pop("previous", None)
+            self.assertEqual(body, expected_body, async_url)
+
+        # 2️⃣ Solo lectura
+        response = await self.async_client.post("/async/cards/", {})
+        self.assertEqual(response.status_code, 405)
+        print("✅ test_async_views_match_sync_views: PASS - Ruta asíncrona igual que la síncrona")
+
+
+class ServerTimingTestCase(APITestCase):
+    def setUp(self):
+        from api.timing import route_stats
+
+        f = io.StringIO()
+        with redirect_stdout(f):
+            call_command("load_cards", limit=60)
+        team = Team.objects.create(name="Timing FC")
+        team.cards.set(Card.objects.order_by("id")[:25])
+        self.user = User.objects.create(name="T", email="t@timing.com", password="x", team=team)
+        route_stats.reset()
+
+    def timing(self, response):
+        entries = {}
+        for entry in response["Server-Timing"].split(", "):
+            name, *params = entry.split(";")
+            entries[name] = dict(param.split("=", 1) for param in params)
+        return entries
+
+    def test_server_timing_header_and_route_stats(self):
+        from django.db import connection
+        from django.test import Client
+        from django.test.utils import CaptureQueriesContext
+
+        # 1️⃣ Desactivado por defecto: sin cabecera
+        self.assertNotIn("Server-Timing", Client().get("/users/"))
+
+        with override_settings(REQUEST_TIMING=True, REQUEST_TIMING_SAMPLE_RATE=1.0):
+            client = Client()
+            with CaptureQueriesContext(connection) as queries:
+                response = client.get("/users/")
+
+            # 2️⃣ Consultas, tiempo de BD, serializer, vista y total
+            timing = self.timing(response)
+            self.assertEqual(timing["db"]["desc"], f'"{len(queries)} consultas"')
+            self.assertGreater(float(timing["serializer"]["dur"]), 0)
+            self.assertGreaterEqual(float(timing["total"]["dur"]), float(timing["view"]["dur"]))
+
+            # 3️⃣ Las consultas de las vistas asíncronas (otro hilo) también cuentan
+            response = client.get(f"/async/users/{self.user.pk}/team/")
+            self.assertNotEqual(self.timing(response)["db"]["desc"], '"0 consultas"')
+
+            # 4️⃣ Acumulado por ruta
+            client.get(f"/users/{self.user.pk}/")
+            stats = client.get("/timing/stats/").json()
+            self.assertTrue(stats["enabled"])
+            self.assertEqual(stats["routes"]["GET /users/"]["requests"], 1)
+            self.assertEqual(stats["routes"]["GET /users/<int:pk>/"]["avg_queries"], 3.0)
+
+        # 5️⃣ Con muestreo 0 no se mide nada
+        with override_settings(REQUEST_TIMING=True, REQUEST_TIMING_SAMPLE_RATE=0.0):
+            self.assertNotIn("Server-Timing", Client().get("/users/"))
+        print(
+            "✅ test_server_timing_header_and_route_stats: PASS - Server-Timing y tiempos por ruta correctos"
+        )
+
+
+class RequestProfilingTestCase(APITestCase):
+    def setUp(self):
+        from api.squad import SquadBuilder
+
+        f = io.StringIO()
+        with redirect_stdout(f):
+            call_command("load_cards", limit=180)
+        self.card_ids = [card.pk for card in SquadBuilder().build()]
+        team = Team.objects.create(name="Perfil FC")
+        self.user = User.objects.create(name="P", email="p@profile.com", password="x", team=team)
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def test_profile_patch_and_download(self):
+        import pstats
+
+        from django.core.exceptions import ImproperlyConfigured
+        from django.test import Client
+
+        from api.profiling import RequestProfilerMiddleware
+
+        url = f"/users/{self.user.pk}/team/"
+        body = json.dumps({"card_ids": self.card_ids})
+        secret = {"HTTP_X_PROFILE": "s3cret"}
+
+        # 1️⃣ Desactivado: la cabecera no hace nada
+        response = Client().patch(url, body, content_type="application/json", **secret)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("X-Profile-Id", response)
+
+        profiling = dict(
+            REQUEST_PROFILING=True,
+            REQUEST_PROFILING_SECRET="s3cret",
+            REQUEST_PROFILING_DIR=self.tmp.name,
+            REQUEST_PROFILING_INTERVAL=0.0005,
+        )
+        with override_settings(**profiling):
+            client = Client()
+
+            # 2️⃣ Secreto incorrecto: petición normal
+            response = client.patch(
+                url, body, content_type="application/json", HTTP_X_PROFILE="nope"
+            )
+            self.assertNotIn("X-Profile-Id", response)
+
+            # 3️⃣ Con el secreto: pstats, pilas colapsadas y memoria
+            response = client.patch(url, body, content_type="application/json", **secret)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(response.json()["team"]["cards"]), len(self.card_ids))
+            profile_id = response["X-Profile-Id"]
+
+            stats = pstats.Stats(f"{self.tmp.name}/{profile_id}.prof")
+            self.assertTrue(any(func[2] == "patch" for func in stats.stats))
+            collapsed = client.get(f"/profiles/{profile_id}/collapsed/", **secret)
+            lines = b"".join(collapsed.streaming_content).decode().splitlines()
+            self.assertTrue(lines)
+            self.assertTrue(all(line.rsplit(" ", 1)[1].isdigit() for line in lines))
+            memory = client.get(f"/profiles/{profile_id}/memory/", **secret)
+            self.assertIn(b"KiB", b"".join(memory.streaming_content))
+
+            # 4️⃣ Listado con metadatos; sin secreto todo es 404
+            listing = client.get("/profiles/", **secret).json()["results"]
+            self.assertEqual(listing[0]["id"], profile_id)
+            self.assertGreater(listing[0]["queries"], 0)
+            self.assertEqual(client.get("/profiles/").status_code, 404)
+            self.assertEqual(client.get(f"/profiles/{profile_id}/pstats/").status_code, 404)
+            self.assertEqual(client.get("/profiles/../../etc/", **secret).status_code, 404)
+
+        # 5️⃣ Activado sin secreto: error de configuración al arrancar
+        with override_settings(REQUEST_PROFILING=True, REQUEST_PROFILING_SECRET=""):
+            with self.assertRaises(ImproperlyConfigured):
+                RequestProfilerMiddleware(lambda request: None)
+        print("✅ test_profile_patch_and_download: PASS - Perfil bajo demanda y descarga correctos")
+
+    def test_concurrent_profiles_do_not_overlap(self):
+        import threading
+        import time
+        import tracemalloc
+        from types import SimpleNamespace
+
+        from django.http import HttpResponse
+        from django.test import RequestFactory
+
+        from api.profiling import RequestProfilerMiddleware
+
+        intervals, statuses = [], []
+
+        def view(request):
+            # tracemalloc sigue activo durante toda la vista
+            start = time.perf_counter()
+            time.sleep(0.05)
+            self.assertTrue(tracemalloc.is_tracing())
+            intervals.append((start, time.perf_counter()))
+            return HttpResponse("ok")
+
+        profiling = dict(
+            REQUEST_PROFILING=True,
+            REQUEST_PROFILING_SECRET="s3cret",
+            REQUEST_PROFILING_DIR=self.tmp.name,
+        )
+        with override_settings(**profiling):
+            middleware = RequestProfilerMiddleware(lambda request: None)
+
+            def profiled_request():
+                request = RequestFactory().get("/cards/", HTTP_X_PROFILE="s3cret")
+                request.resolver_match = SimpleNamespace(url_name="card-list-create")
+                response = middleware.process_view(request, view, (), {})
+                statuses.append((response.status_code, "X-Profile-Id" in response))
+
+            # 1️⃣ Dos peticiones perfiladas a la vez (WSGI con hilos): ninguna falla
+            threads = [threading.Thread(target=profiled_request) for _ in range(2)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(statuses, [(200, True), (200, True)])
+        # 2️⃣ Se perfilan de una en una
+        first, second = sorted(intervals)
+        self.assertLessEqual(first[1], second[0])
+        self.assertFalse(tracemalloc.is_tracing())
+        print(
+            "✅ test_concurrent_profiles_do_not_overlap: PASS - Perfiles concurrentes sin RuntimeError"
+        )
+
+
+class MetricsEndpointTestCase(APITestCase):
+    def setUp(self):
+        from api.metrics import reset_metrics
+
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.settings_override = override_settings(METRICS_ENABLED=True, METRICS_DIR=self.tmp.name)
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+        self.addCleanup(reset_metrics)
+
+    def test_metrics_exposition(self):
+        from django.test import Client
+
+        # 1️⃣ load_cards suma cartas y tiempo de importación
+        f = io.StringIO()
+        with redirect_stdout(f):
+            call_command("load_cards", limit=120, batch_size=50)
+
+        # 2️⃣ Peticiones por ruta: fallo y acierto de la caché, un 404
+        client = Client()
+        self.assertEqual(client.get("/cards/").status_code, 200)
+        self.assertEqual(client.get("/cards/").status_code, 200)
+        self.assertEqual(client.get("/cards/999999/").status_code, 404)
+        self.assertEqual(client.get("/no-existe/").status_code, 404)
+
+        response = client.get("/metrics/")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response["Content-Type"].startswith("text/plain; version=0.0.4"))
+        text = response.content.decode()
+        self.assertIn("fifa_load_cards_cards_total 120\n", text)
+        self.assertIn('fifa_load_cards_batch_seconds_count 3\n', text)
+        self.assertIn(
+            'fifa_http_requests_total{view="card-list-create",method="GET",status="200"} 2\n', text
+        )
+        self.assertIn(
+            'fifa_http_requests_total{view="card-retrieve-update-destroy",method="GET",status="404"} 1\n',
+            text,
+        )
+        self.assertIn('fifa_http_requests_total{view="unmatched",method="GET",status="404"} 1\n', text)
+        self.assertIn(
+            'fifa_http_request_duration_seconds_count{view="card-list-create",method="GET"} 2\n', text
+        )
+        self.assertIn(
+            'fifa_http_request_duration_seconds_bucket{view="card-list-create",method="GET",le="+Inf"} 2\n',
+            text,
+        )
+        self.assertIn('fifa_cache_requests_total{cache="cards",result="hit"} 1\n', text)
+        # El detalle inexistente también es un fallo de la caché
+        self.assertIn('fifa_cache_requests_total{cache="cards",result="miss"} 2\n', text)
+        # La respuesta cacheada solo lee la versión del catálogo
+        self.assertIn(
+            'fifa_http_request_queries_bucket{view="card-list-create",method="GET",le="1"} 1\n', text
+        )
+
+        # 3️⃣ Desactivadas, /metrics/ no existe
+        with override_settings(METRICS_ENABLED=False):
+            self.assertEqual(Client().get("/metrics/").status_code, 404)
+        print("✅ test_metrics_exposition: PASS - Métricas de Prometheus por ruta, caché y load_cards")
+
+
+class CardSimilarTestCase(APITestCase):
+    def setUp(self):
+        from api.similarity import similarity_index
+
+        f = io.StringIO()
+        with redirect_stdout(f):
+            call_command("load_cards", limit=200)
+        # El índice es global del proceso: sin filas de otros tests
+        similarity_index.reset()
+        self.card = Card.objects.order_by("id").first()
+
+    def test_similar_cards(self):
+        from api.squad import POSITION_GROUPS
+
+        url = reverse("card-similar", args=[self.card.id])
+
+        # 1️⃣ Por defecto 20 cartas, de la más a la menos parecida, sin la propia
+        results = self.client.get(url).data["results"]
+        self.assertEqual(len(results), 20)
+        self.assertNotIn(self.card.id, [card["id"] for card in results])
+        distances = [card["distance"] for card in results]
+        self.assertEqual(distances, sorted(distances))
+
+        # 2️⃣ Limitado a un grupo de posiciones
+        response = self.client.get(url, {"group": "GK", "k": 5})
+        self.assertEqual(len(response.data["results"]), 5)
+        self.assertTrue(all(card["position"] in POSITION_GROUPS["GK"] for card in response.data["results"]))
+
+        # 3️⃣ Una carta borrada sigue sirviendo de referencia, pero no sale en los resultados
+        other = Card.objects.exclude(pk=self.card.pk).first()
+        self.client.delete(reverse("card-retrieve-update-destroy", args=[other.id]))
+        ids = [card["id"] for card in self.client.get(url, {"k": 100}).data["results"]]
+        self.assertNotIn(other.id, ids)
+        self.assertEqual(
+            self.client.get(reverse("card-similar", args=[other.id])).status_code, 200
+        )
+
+        # 4️⃣ Errores
+        self.assertEqual(self.client.get(url, {"k": 0}).status_code, 400)
+        self.assertEqual(self.client.get(url, {"group": "XX"}).status_code, 400)
+        self.assertEqual(
+            self.client.get(reverse("card-similar", args=[999999])).status_code, 404
+        )
+        print("✅ test_similar_cards: PASS - Cartas parecidas por stats")
+
+    def test_similar_queries_do_not_grow_with_k(self):
+        from api.similarity import similarity_index
+
+        url = reverse("card-similar", args=[self.card.id])
+        self.client.get(url, {"k": 5})  # construye el índice
+
+        # Carta de referencia, versión del catálogo y las parecidas en una consulta,
+        # sean 5 o 50; el orden y las distancias salen del índice
+        for k in (5, 50):
+            with self.assertNumQueries(3):
+                results = self.client.get(url, {"k": k}).data["results"]
+            self.assertEqual(len(results), k)
+        expected = [(card_id, round(d, 4)) for card_id, d in similarity_index.similar(self.card, 50)]
+        self.assertEqual([(card["id"], card["distance"]) for card in results], expected)
+        print("✅ test_similar_queries_do_not_grow_with_k: PASS - Consultas fijas para cualquier k")
+
+    def test_similar_sees_writes_from_other_processes(self):
+        from django.db.models import F
+
+        from api.ratings import STATS
+
+        url = reverse("card-similar", args=[self.card.id])
+        ids = [card["id"] for card in self.client.get(url, {"k": 10}).data["results"]]
+
+        # 1️⃣ Otro proceso desactiva una carta y sube la versión compartida
+        Card.objects.filter(pk=ids[0]).update(active=False)
+        DataVersion.objects.filter(name="cards").update(version=F("version") + 1)
+        results = self.client.get(url, {"k": 10}).data["results"]
+        self.assertEqual(len(results), 10)
+        self.assertNotIn(ids[0], [card["id"] for card in results])
+
+        # 2️⃣ Sin subir la versión: se descarta al no encontrarla y siguen saliendo k
+        Card.objects.filter(pk=ids[1]).update(active=False)
+        results = self.client.get(url, {"k": 10}).data["results"]
+        self.assertEqual(len(results), 10)
+        self.assertNotIn(ids[1], [card["id"] for card in results])
+
+        # 3️⃣ Un cambio de stats sin versión se ve al caducar el índice
+        twin = Card.objects.exclude(pk=self.card.pk).order_by("-id").first()
+        Card.objects.filter(pk=twin.pk).update(
+            **{stat: getattr(self.card, stat) for stat in STATS}
+        )
+        with override_settings(SIMILARITY_FULL_REBUILD_INTERVAL=0):
+            results = self.client.get(url, {"k": 1}).data["results"]
+        self.assertEqual((results[0]["id"], results[0]["distance"]), (twin.pk, 0.0))
+        print(
+            "✅ test_similar_sees_writes_from_other_processes: PASS - Índice al día con escrituras de otros procesos"
+        )
+
+
+class PercentilesEndpointsTestCase(APITestCase):
+    def setUp(self):
+        from api.percentiles import reset_percentiles
+
+        f = io.StringIO()
+        with redirect_stdout(f):
+            call_command("load_cards", limit=100)
+        # La tabla es global (base de datos y proceso): sin la de otros tests
+        reset_percentiles()
+        self.cards = list(Card.objects.order_by("id")[:5])
+        team = Team.objects.create(name="Percentiles")
+        team.cards.add(*self.cards)
+        self.user = User.objects.create(name="P", email="p@percentiles.com", password="x", team=team)
+
+    def test_card_and_team_percentiles(self):
+        from api.percentiles import FIELDS
+
+        card = self.cards[0]
+
+        # 1️⃣ Percentiles de una carta frente a su posición
+        response = self.client.get(reverse("card-percentiles", args=[card.id]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["position"], card.position)
+        self.assertEqual(set(response.data["percentiles"]), set(FIELDS))
+        pace = response.data["percentiles"]["pace"]
+        self.assertEqual(pace["value"], card.pace)
+        self.assertEqual(pace["cards"], Card.objects.filter(position=card.position).count())
+        self.assertTrue(0 <= pace["percentile"] <= 100 and 0 < pace["top"] <= 100)
+
+        # 2️⃣ Percentiles de todas las cartas del equipo de un usuario
+        response = self.client.get(reverse("user-team-percentiles", args=[self.user.id]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["team_id"], self.user.team_id)
+        self.assertEqual([c["id"] for c in response.data["cards"]], [c.id for c in self.cards])
+        self.assertEqual(response.data["cards"][0]["percentiles"]["pace"], pace)
+
+        # 3️⃣ Carta inexistente, usuario inexistente o sin equipo → 404
+        self.assertEqual(self.client.get(reverse("card-percentiles", args=[999999])).status_code, 404)
+        self.assertEqual(
+            self.client.get(reverse("user-team-percentiles", args=[999999])).status_code, 404
+        )
+        self.user.team = None
+        self.user.save()
+        self.assertEqual(
+            self.client.get(reverse("user-team-percentiles", args=[self.user.id])).status_code, 404
+        )
+        print("✅ test_card_and_team_percentiles: PASS - Percentiles de cartas y equipos")
+
+    def test_refresh_does_not_stick_to_primary(self):
+        from api.routers import STICKY_COOKIE
+
+        url = reverse("card-percentiles", args=[self.cards[0].id])
+
+        # 1️⃣ Calcular y guardar la tabla durante un GET no es una escritura del cliente
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn(STICKY_COOKIE, response.cookies)
+
+        # 2️⃣ Tampoco recalcularla al caducar (marca la fila y la vuelve a guardar)
+        self.cards[1].save()  # cambia el catálogo
+        with self.settings(PERCENTILES_MAX_AGE=0):
+            response = self.client.get(url)
+        self.assertNotIn(STICKY_COOKIE, response.cookies)
+        print("✅ test_refresh_does_not_stick_to_primary: PASS - Los percentiles no fijan el primario")
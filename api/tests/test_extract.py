@@ -0,0 +1,71 @@
+import csv
+import io
+import json
+import os
+import tempfile
+from contextlib import redirect_stdout
+
+from django.test import SimpleTestCase
+
+from utils.extract_cards_from_csv import export_json, export_ndjson
+
+
+class ExtractCardsStreamingTests(SimpleTestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.csv_path = os.path.join(self.tmp.name, "players.csv")
+
+        # CSV pequeño con nombres repetidos lejos unos de otros y una posición inválida
+        header = [
+            "long_name", "nationality_name", "club_name", "league_name",
+            "player_positions", "pace", "shooting", "passing", "dribbling",
+            "defending", "physic", "goalkeeping_diving", "movement_sprint_speed",
+        ]
+        positions = ["ST, LW", "GK", "CB", "CM", "XX", "RW"]
+        with open(self.csv_path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(header)
+            for i in range(300):
+                name = f"Jugador {i % 120}, \"{i % 7}\""
+                writer.writerow(
+                    [name, "Spain", "Club", "Liga", positions[i % len(positions)]]
+                    + [str((i * 11 + j) % 99) for j in range(8)]
+                )
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_stream_matches_json_mode(self):
+        json_path = os.path.join(self.tmp.name, "cards.json")
+        ndjson_path = os.path.join(self.tmp.name, "cards.ndjson")
+
+        f = io.StringIO()
+        with redirect_stdout(f):
+            export_json(self.csv_path, json_path, limit=10_000)
+
+        # Rangos de 500 bytes: los duplicados caen en rangos (y workers) distintos
+        exported, cnt = export_ndjson(
+            self.csv_path, ndjson_path, workers=2, chunk_bytes=500
+        )
+
+        with open(json_path, encoding="utf-8") as jf:
+            expected = json.load(jf)
+        with open(ndjson_path, encoding="utf-8") as nf:
+            streamed = [json.loads(line) for line in nf]
+
+        # 1️⃣ Mismas cartas, en el mismo orden y sin duplicados entre workers
+        self.assertEqual(streamed, expected)
+        self.assertEqual(exported, len(expected))
+        self.assertEqual(len({c["name"] for c in streamed}), len(streamed))
+
+        # 2️⃣ El recuento por posición cuadra
+        self.assertEqual(sum(cnt.values()), exported)
+
+        # 3️⃣ No quedan ficheros temporales
+        self.assertEqual(
+            sorted(os.listdir(self.tmp.name)),
+            ["cards.json", "cards.ndjson", "players.csv"],
+        )
+        print(
+            "✅ test_stream_matches_json_mode: PASS - Extracción en streaming igual que la original"
+        )
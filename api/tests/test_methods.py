@@ -1,5 +1,12 @@
 from django.test import TestCase
 from api.models import *
+import random
+
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from api.ratings import STATS, compute_ratings, rate_cards, stats_matrix
+from api.squad import GROUP_LIMITS, GROUP_OF_POSITION, POSITION_GROUPS, SQUAD_SIZE, SquadBuilder
 
 
 class CardCalculateOverallRatingTestCase(TestCase):
@@ -417,3 +424,587 @@ class CardCalculateOverallRatingTestCase(TestCase):
         print(
             "✅ test_calculate_overall_rating_returns_integer: PASS - OVR devuelve entero como se espera"
         )
+
+
+class RatingEngineTestCase(TestCase):
+    # Test del cálculo vectorizado de api.ratings
+
+    # Medias calculadas con las fórmulas originales, escritas a mano por posición
+    # en Card.calculate_overall_rating (stats en el orden de STATS)
+    EXPECTED = [
+        ("POR", (52, 18, 60, 45, 30, 78, 88, 91, 85, 89, 74, 50), 85),
+        ("GK", (52, 18, 60, 45, 30, 78, 88, 91, 85, 89, 74, 50), 85),
+        ("DFC", (72, 48, 68, 65, 90, 86, 10, 12, 9, 11, 14, 70), 79),
+        ("LI", (91, 66, 80, 84, 79, 77, 8, 10, 12, 9, 11, 93), 81),
+        ("MC", (68, 82, 91, 88, 70, 75, 11, 13, 10, 12, 15, 66), 80),
+        ("ED", (95, 86, 82, 93, 38, 70, 9, 11, 10, 8, 12, 96), 88),
+        ("DC", (82, 93, 78, 86, 40, 88, 12, 10, 11, 13, 9, 80), 85),
+        # Posición desconocida: promedio de las 6 stats básicas
+        ("XX", (70, 70, 70, 70, 70, 70, 1, 1, 1, 1, 1, 1), 70),
+    ]
+
+    def test_rate_cards_matches_single_card_formula(self):
+        cards = [Card(position=pos, **dict(zip(STATS, stats))) for pos, stats, _ in self.EXPECTED]
+        expected = [rating for _, _, rating in self.EXPECTED]
+
+        # 1️⃣ Carta a carta da las medias de las fórmulas originales
+        self.assertEqual([card.calculate_overall_rating() for card in cards], expected)
+
+        # 2️⃣ Un solo cálculo por lote da lo mismo
+        rate_cards(cards)
+        self.assertEqual([card.overall_rating for card in cards], expected)
+
+        # 3️⃣ El cálculo por matriz también acepta las stats directamente
+        ratings = compute_ratings(stats_matrix(cards), [c.position for c in cards])
+        self.assertEqual(ratings.tolist(), expected)
+        print(
+            "✅ test_rate_cards_matches_single_card_formula: PASS - Medias por lotes iguales a las fórmulas originales"
+        )
+
+
+class SquadBuilderTestCase(TestCase):
+    # Test del generador de plantillas de api.squad
+
+    def setUp(self):
+        rng = random.Random(7)
+        positions = [code for code, _ in Card.POSICIONES]
+        cards = [
+            Card(
+                name=f"Jugador {i}",
+                country="Spain",
+                club=f"Club {i % 6}",
+                league=f"Liga {i % 3}",
+                position=rng.choice(positions),
+                active=rng.random() > 0.1,
+                **{stat: rng.randint(20, 99) for stat in STATS},
+            )
+            for i in range(300)
+        ]
+        Card.objects.bulk_create(rate_cards(cards))
+
+    def best_total(self):
+        """Óptimo sin topes calculado aparte: mínimos de cada grupo y después los mejores."""
+        chosen, rest = [], []
+        for group, positions in POSITION_GROUPS.items():
+            ratings = sorted(
+                Card.objects.filter(active=True, position__in=positions).values_list(
+                    "overall_rating", flat=True
+                ),
+                reverse=True,
+            )
+            minimum, maximum = GROUP_LIMITS[group]
+            chosen += ratings[:minimum]
+            rest += ratings[minimum:maximum]
+        return sum(chosen) + sum(sorted(rest, reverse=True)[: SQUAD_SIZE[1] - len(chosen)])
+
+    def assert_legal(self, cards):
+        self.assertIn(len(cards), range(SQUAD_SIZE[0], SQUAD_SIZE[1] + 1))
+        self.assertEqual(len({card.pk for card in cards}), len(cards))
+        self.assertTrue(all(card.active for card in cards))
+        for group, (minimum, maximum) in GROUP_LIMITS.items():
+            count = sum(1 for card in cards if GROUP_OF_POSITION[card.position] == group)
+            self.assertIn(count, range(minimum, maximum + 1))
+
+    def test_build_optimal_squad(self):
+        builder = SquadBuilder()
+        cards = builder.build()
+
+        # 1️⃣ Plantilla legal de 25 cartas con la mejor media total posible
+        self.assert_legal(cards)
+        self.assertEqual(len(cards), SQUAD_SIZE[1])
+        self.assertEqual(builder.summary()["total_rating"], self.best_total())
+        print("✅ test_build_optimal_squad: PASS - Plantilla óptima generada correctamente")
+
+    def test_build_with_constraints(self):
+        required = list(
+            Card.objects.filter(active=True, position="POR")
+            .order_by("overall_rating")
+            .values_list("pk", flat=True)[:1]
+        )
+        excluded = list(
+            Card.objects.filter(active=True).order_by("-overall_rating").values_list("pk", flat=True)[:5]
+        )
+        cards = SquadBuilder(max_per_club=5, required=required, excluded=excluded).build()
+
+        # 1️⃣ Respeta obligatorias, excluidas y el tope por club
+        self.assert_legal(cards)
+        ids = {card.pk for card in cards}
+        self.assertTrue(set(required) <= ids)
+        self.assertFalse(ids & set(excluded))
+        clubs = [card.club for card in cards]
+        self.assertTrue(all(clubs.count(club) <= 5 for club in clubs))
+
+        # 2️⃣ Restricciones imposibles → ValidationError
+        with self.assertRaises(ValidationError):
+            SquadBuilder(max_per_club=1).build()
+        with self.assertRaises(ValidationError):
+            SquadBuilder(required=excluded[:1], excluded=excluded[:1]).build()
+        print("✅ test_build_with_constraints: PASS - Restricciones del generador respetadas")
+
+
+class LeaderboardTestCase(TestCase):
+    # Test del ranking en memoria de api.leaderboard
+
+    def setUp(self):
+        from api.leaderboard import Leaderboard
+
+        self.board = Leaderboard()
+        self.rng = random.Random(3)
+        self.teams = [
+            Team.objects.create(name=f"Equipo {i}") for i in range(40)
+        ]
+        self.set_scores()
+
+    def set_scores(self):
+        for team in self.teams:
+            Team.objects.filter(pk=team.pk).update(
+                rating_total=self.rng.randint(0, 20), updated_at=timezone.now()
+            )
+
+    def expected(self):
+        rows = sorted(Team.objects.values_list("rating_total", "id"), key=lambda r: (-r[0], r[1]))
+        return [
+            {"rank": 1 + sum(1 for s, _ in rows if s > score), "team_id": team_id, "score": score}
+            for score, team_id in rows
+        ]
+
+    def current(self):
+        return [
+            {k: entry[k] for k in ("rank", "team_id", "score")}
+            for entry in self.board.top(len(self.teams))
+        ]
+
+    def test_incremental_sync_matches_full_sort(self):
+        from api.cache import bump_model_version
+
+        # 1️⃣ Primera lectura: reconstrucción completa (con empates)
+        self.assertEqual(self.current(), self.expected())
+
+        # 2️⃣ Cambios posteriores: solo se leen los equipos modificados
+        for _ in range(3):
+            self.set_scores()
+            deleted = self.teams.pop()
+            # La señal post_delete avisa al ranking global; aquí se usa uno propio
+            self.board.team_deleted(deleted.pk)
+            deleted.delete()
+            bump_model_version("teams")
+            with self.assertNumQueries(3):  # versión + equipos cambiados + COUNT
+                board = self.current()
+            self.assertEqual(board, self.expected())
+
+        # 3️⃣ Sin cambios solo se lee la versión de los equipos
+        with self.assertNumQueries(2):
+            self.board.top(10)
+            self.board.team_entry(self.teams[0].pk)
+        print(
+            "✅ test_incremental_sync_matches_full_sort: PASS - Ranking incremental igual al orden completo"
+        )
+
+    def test_sees_writes_from_other_processes(self):
+        from django.db.models import F
+
+        self.assertEqual(self.current(), self.expected())
+
+        # 1️⃣ Otro proceso cambia los equipos y sube la versión compartida
+        self.set_scores()
+        DataVersion.objects.filter(name="teams").update(version=F("version") + 1)
+        self.assertEqual(self.current(), self.expected())
+
+        # 2️⃣ Una escritura que no sube la versión se ve al caducar la lista
+        Team.objects.filter(pk=self.teams[0].pk).update(rating_total=999)
+        self.assertNotEqual(self.current(), self.expected())
+        with self.settings(LEADERBOARD_FULL_REBUILD_INTERVAL=0):
+            self.assertEqual(self.current(), self.expected())
+        self.assertEqual(self.board.top(1)[0]["team_id"], self.teams[0].pk)
+        print(
+            "✅ test_sees_writes_from_other_processes: PASS - Ranking al día con escrituras de otros procesos"
+        )
+
+
+class BenchmarkHelpersTestCase(TestCase):
+    # Test de las utilidades comunes de los benchmarks (api.benchmarks)
+
+    def test_percentiles_and_runners(self):
+        from api.benchmarks import percentile, run_async, run_threaded, summarize
+
+        values = [i / 1000 for i in range(1, 101)]
+
+        # 1️⃣ Percentiles por nearest-rank
+        self.assertEqual(percentile(values, 50), 0.05)
+        self.assertEqual(percentile(values, 99), 0.099)
+        self.assertEqual(percentile([], 99), 0.0)
+        summary = summarize(values, elapsed=2.0, errors=1)
+        self.assertEqual(summary["rps"], 50.0)
+        self.assertEqual(summary["p99_ms"], 99.0)
+
+        # 2️⃣ Los dos ejecutores hacen exactamente las peticiones pedidas
+        latencies, _, errors = run_threaded(lambda state: True, 37, 4)
+        self.assertEqual((len(latencies), errors), (37, 0))
+
+        async def failing():
+            return False
+
+        latencies, _, errors = run_async(failing, 11, 3)
+        self.assertEqual((len(latencies), errors), (11, 11))
+        print("✅ test_percentiles_and_runners: PASS - Utilidades de benchmark correctas")
+
+    def test_bench_routes_and_regressions(self):
+        from api.benchmarks import compare_results
+        from api.management.commands.bench import SKIPPED_ROUTES, Command
+        from api.urls import urlpatterns
+
+        # 1️⃣ El benchmark mide todas las rutas de api/urls.py (salvo las excluidas a propósito)
+        fixtures = {"card_id": 1, "free_cards": [1], "user_id": 1, "template": {}}
+        routes = Command().routes(fixtures)
+        self.assertEqual(
+            {route["url"] for route in routes} | set(SKIPPED_ROUTES), {p.name for p in urlpatterns}
+        )
+
+        # 2️⃣ Regresiones: p95 peor que el umbral o más consultas SQL
+        def result(route, p95, queries):
+            return {"scale": 600, "route": route, "p95_ms": p95, "queries": queries}
+
+        baseline = [result("a", 10.0, 2), result("b", 10.0, 2), result("c", 0.1, 1)]
+        current = [result("a", 11.0, 2), result("b", 13.0, 3), result("c", 0.3, 1), result("d", 1, 9)]
+        regressions = compare_results(baseline, current, threshold=20)
+        self.assertEqual(
+            [(item["route"], item["metric"]) for item in regressions],
+            [("b", "p95_ms"), ("b", "queries")],
+        )
+        print("✅ test_bench_routes_and_regressions: PASS - Rutas del benchmark y regresiones correctas")
+
+
+class ReplicaRoutingTestCase(TestCase):
+    # Test del enrutado primario/réplicas de api.routers
+
+    def test_reads_go_to_replicas_until_a_write(self):
+        from django.contrib.sessions.models import Session
+        from django.http import HttpResponse
+        from django.test import RequestFactory, override_settings
+
+        from api.routers import STICKY_COOKIE, PrimaryReplicaRouter, ReplicaStickinessMiddleware
+
+        router = PrimaryReplicaRouter()
+        factory = RequestFactory()
+        seen = []
+
+        def view(request):
+            seen.append(router.db_for_read(Card))
+            # Todas las lecturas de la petición van a la misma réplica
+            for model in (User, Team, Card):
+                self.assertEqual(router.db_for_read(model), seen[-1])
+            if request.GET.get("bookkeeping"):
+                for model in (DataVersion, PercentileSnapshot, Session):
+                    self.assertEqual(router.db_for_write(model), "default")
+                seen.append(router.db_for_read(Card))
+            if request.GET.get("write"):
+                seen.append(router.db_for_write(Card))
+                seen.append(router.db_for_read(Card))
+            return HttpResponse()
+
+        middleware = ReplicaStickinessMiddleware(view)
+        with override_settings(DATABASE_REPLICAS=["replica_1", "replica_2"]):
+            # 1️⃣ Lecturas de la app api a réplicas; el resto siempre al primario
+            response = middleware(factory.get("/api/cards/"))
+            self.assertIn(seen.pop(), ("replica_1", "replica_2"))
+            self.assertNotIn(STICKY_COOKIE, response.cookies)
+            self.assertEqual(router.db_for_read(Session), "default")
+            # Cada petición elige su réplica: se reparten entre las dos
+            for _ in range(30):
+                middleware(factory.get("/api/cards/"))
+            self.assertEqual(set(seen), {"replica_1", "replica_2"})
+            seen.clear()
+
+            # 2️⃣ Tras escribir, la misma petición lee del primario y se envía la cookie
+            response = middleware(factory.get("/api/cards/", {"write": 1}))
+            self.assertIn(seen[0], ("replica_1", "replica_2"))
+            self.assertEqual(seen[1:], ["default", "default"])
+            self.assertIn(STICKY_COOKIE, response.cookies)
+            seen.clear()
+
+            # 3️⃣ Las escrituras de control (versiones, percentiles, sesión) no cuentan
+            response = middleware(factory.get("/api/cards/", {"bookkeeping": 1}))
+            self.assertEqual(seen[1], seen[0])
+            self.assertNotIn(STICKY_COOKIE, response.cookies)
+            seen.clear()
+
+            # 4️⃣ Con la cookie, o con métodos que escriben, se lee del primario
+            request = factory.get("/api/cards/")
+            request.COOKIES[STICKY_COOKIE] = "1"
+            middleware(request)
+            middleware(factory.post("/api/cards/"))
+            self.assertEqual(seen, ["default", "default"])
+            seen.clear()
+
+        # 5️⃣ Sin réplicas configuradas todo va al primario
+        middleware(factory.get("/api/cards/"))
+        self.assertEqual(seen, ["default"])
+        self.assertFalse(router.allow_migrate("replica_1", "api"))
+        print(
+            "✅ test_reads_go_to_replicas_until_a_write: PASS - Enrutado a réplicas con lectura de lo escrito"
+        )
+
+
+class SeedGeneratorTestCase(TestCase):
+    # Test del generador de datos sintéticos (api.seeding)
+
+    def test_cards_are_deterministic_and_realistic(self):
+        import numpy as np
+
+        from api.seeding import generate_cards, generate_users, sample_distinct
+
+        cards = generate_cards(7, 3, 2000)
+
+        # 1️⃣ Cada bloque solo depende de (seed, bloque)
+        self.assertEqual(cards, generate_cards(7, 3, 2000))
+        self.assertNotEqual(cards, generate_cards(7, 4, 2000))
+
+        # 2️⃣ La media es la de la fórmula y las stats están en rango
+        stats = [[card[stat] for stat in STATS] for card in cards]
+        ratings = compute_ratings(stats, [card["position"] for card in cards]).tolist()
+        self.assertEqual(ratings, [card["overall_rating"] for card in cards])
+        self.assertTrue(all(1 <= value <= 99 for row in stats for value in row))
+
+        # 3️⃣ Cada posición destaca en lo suyo: porteros en diving, el resto no
+        diving = {
+            is_gk: np.mean([c["diving"] for c in cards if (c["position"] == "POR") == is_gk])
+            for is_gk in (True, False)
+        }
+        self.assertGreater(diving[True], diving[False] + 40)
+
+        # 4️⃣ Emails únicos por número, sin recordar los generados
+        users = generate_users(7, 1, 500) + generate_users(7, 501, 500)
+        self.assertEqual(len({user["email"] for user in users}), 1000)
+
+        rng = np.random.default_rng(0)
+        self.assertEqual(len(set(sample_distinct(rng, 1_000_000, 25).tolist())), 25)
+        self.assertEqual(sorted(sample_distinct(rng, 10, 10).tolist()), list(range(10)))
+        print(
+            "✅ test_cards_are_deterministic_and_realistic: PASS - Generador de cartas determinista y realista"
+        )
+
+
+class MetricsStoreTestCase(TestCase):
+    # Test del registro de métricas multiproceso (api.metrics)
+
+    def test_counters_add_up_across_threads_and_processes(self):
+        import multiprocessing
+        import tempfile
+        import threading
+        from pathlib import Path
+
+        from django.test import override_settings
+
+        from api.metrics import CACHE_REQUESTS, LOAD_CARDS_BATCH, collect, exposition, reset_metrics
+
+        def hit(times):
+            for _ in range(times):
+                CACHE_REQUESTS.inc(cache="cards", result="hit")
+
+        with tempfile.TemporaryDirectory() as tmp:
+            # 0️⃣ Desactivadas no escriben nada
+            hit(1)
+            with override_settings(METRICS_DIR=tmp):
+                self.assertEqual(collect(), {})
+
+            with override_settings(METRICS_ENABLED=True, METRICS_DIR=tmp):
+                self.addCleanup(reset_metrics)
+                # 1️⃣ Varios hilos sobre el mismo fichero no pierden incrementos
+                threads = [threading.Thread(target=hit, args=(1000,)) for _ in range(8)]
+                for thread in threads:
+                    thread.start()
+                for thread in threads:
+                    thread.join()
+
+                # 2️⃣ Otro proceso escribe en su propio fichero y se suma al leer
+                process = multiprocessing.get_context("fork").Process(target=hit, args=(500,))
+                process.start()
+                process.join()
+                self.assertEqual(process.exitcode, 0)
+                self.assertEqual(len(list(Path(tmp).glob("*.db"))), 2)
+
+                # 3️⃣ Claves nuevas hacen crecer el fichero sin perder las anteriores
+                for i in range(3000):
+                    CACHE_REQUESTS.inc(cache=f"extra-{i}", result="miss")
+
+                # 4️⃣ Histogramas acumulados en la exposición
+                for seconds in (0.005, 0.2, 0.2, 30):
+                    LOAD_CARDS_BATCH.observe(seconds)
+                text = exposition()
+
+            self.assertIn('fifa_cache_requests_total{cache="cards",result="hit"} 8500\n', text)
+            self.assertIn('fifa_cache_requests_total{cache="extra-2999",result="miss"} 1\n', text)
+            self.assertIn("# TYPE fifa_load_cards_batch_seconds histogram\n", text)
+            self.assertIn('fifa_load_cards_batch_seconds_bucket{le="0.01"} 1\n', text)
+            self.assertIn('fifa_load_cards_batch_seconds_bucket{le="0.25"} 3\n', text)
+            self.assertIn('fifa_load_cards_batch_seconds_bucket{le="+Inf"} 4\n', text)
+            self.assertIn("fifa_load_cards_batch_seconds_count 4\n", text)
+            self.assertIn("fifa_load_cards_batch_seconds_sum 30.405\n", text)
+        print(
+            "✅ test_counters_add_up_across_threads_and_processes: PASS - Métricas sumadas entre hilos y procesos"
+        )
+
+
+class SimilarityIndexTestCase(TestCase):
+    # Test del índice de cartas parecidas de api.similarity
+
+    def setUp(self):
+        import io
+        from contextlib import redirect_stdout
+
+        from django.core.management import call_command
+
+        with redirect_stdout(io.StringIO()):
+            call_command("load_cards", limit=300)
+
+    def test_matches_brute_force_and_follows_changes(self):
+        import numpy as np
+
+        from api.similarity import similarity_index as index
+        from api.squad import GROUP_OF_POSITION, POSITION_GROUPS
+
+        index.reset()
+        cards = list(Card.objects.order_by("id"))
+        target = cards[0]
+
+        # 1️⃣ Los mismos vecinos que calculando todas las distancias
+        stats = np.array([[getattr(c, s) for s in STATS] for c in cards], dtype=np.float64)
+        z = (stats - stats.mean(axis=0)) / stats.std(axis=0)
+        distances = np.sqrt(((z - z[0]) ** 2).sum(axis=1))
+        expected = [cards[i].pk for i in np.argsort(distances, kind="stable")[1:21]]
+        results = index.similar(target, 20)
+        self.assertEqual(len(index), 300)
+        self.assertEqual([card_id for card_id, _ in results][:10], expected[:10])
+        self.assertAlmostEqual(results[0][1], distances[np.argsort(distances)[1]], places=3)
+
+        # 2️⃣ Filtros por grupo de posiciones y por liga
+        by_id = {card.pk: card for card in cards}
+        for group in POSITION_GROUPS:
+            found = index.similar(target, 10, group=group)
+            self.assertTrue(all(GROUP_OF_POSITION[by_id[pk].position] == group for pk, _ in found))
+        found = index.similar(target, 50, league=target.league)
+        self.assertTrue(found)
+        self.assertTrue(all(by_id[pk].league == target.league for pk, _ in found))
+        self.assertEqual(index.similar(target, 5, league="No existe"), [])
+
+        # 3️⃣ Cambios incrementales: una copia de la carta pasa a ser la más parecida
+        twin = cards[-1]
+        for stat in STATS:
+            setattr(twin, stat, getattr(target, stat))
+        twin.save()
+        nearest, distance = index.similar(target, 1)[0]
+        self.assertEqual((nearest, round(distance, 6)), (twin.pk, 0.0))
+
+        # 4️⃣ Desactivadas, borradas y nuevas
+        twin.active = False
+        twin.save()
+        self.assertNotIn(twin.pk, [pk for pk, _ in index.similar(target, 299)])
+        new = Card.objects.create(
+            **{f: getattr(target, f) for f in ("name", "country", "club", "league", "position", *STATS)}
+        )
+        self.assertEqual(index.similar(target, 1)[0][0], new.pk)
+        # El borrado llega por post_delete; en otros procesos, al reconstruir
+        new_id = new.pk
+        new.delete()
+        self.assertNotEqual(index.similar(target, 1)[0][0], new_id)
+        self.assertEqual(len(index), 299)
+        print(
+            "✅ test_matches_brute_force_and_follows_changes: PASS - Índice de cartas parecidas exacto e incremental"
+        )
+
+
+class PercentileTableTestCase(TestCase):
+    # Test de la tabla de percentiles por posición de api.percentiles
+
+    def setUp(self):
+        import io
+        from contextlib import redirect_stdout
+
+        from django.core.management import call_command
+
+        from api.percentiles import reset_percentiles
+
+        with redirect_stdout(io.StringIO()):
+            call_command("load_cards", limit=300)
+        # La tabla es global (base de datos y proceso): sin la de otros tests
+        reset_percentiles()
+
+    def test_matches_brute_force_and_refreshes(self):
+        from datetime import timedelta
+
+        import numpy as np
+
+        from api.percentiles import FIELDS, percentile_table, refresh_percentiles
+
+        table = percentile_table()
+        card = Card.objects.order_by("id").first()
+        same_position = Card.objects.filter(position=card.position)
+
+        # 1️⃣ Mismo percentil que contando todas las cartas de la posición
+        for field in FIELDS:
+            values = np.array(same_position.values_list(field, flat=True))
+            value = getattr(card, field)
+            result = table.lookup(card.position, field, value)
+            below, equal = (values < value).sum(), (values == value).sum()
+            self.assertEqual(result["cards"], len(values))
+            self.assertEqual(result["percentile"], round(100 * (below + equal / 2) / len(values), 1))
+            self.assertEqual(result["top"], round(100 * (values >= value).sum() / len(values), 1))
+        self.assertEqual(set(table.card(card)), set(FIELDS))
+
+        # 2️⃣ El máximo de la posición está en el top, el mínimo en el 100%
+        best = same_position.order_by("-overall_rating").first().overall_rating
+        worst = same_position.order_by("overall_rating").first().overall_rating
+        self.assertLess(table.lookup(card.position, "overall_rating", best)["top"], 100)
+        self.assertEqual(table.lookup(card.position, "overall_rating", worst)["top"], 100)
+
+        # 3️⃣ Los cambios no recalculan la tabla en cada petición...
+        Card.objects.filter(position=card.position).exclude(pk=card.pk).update(active=False)
+        card.save()  # sube la versión del catálogo
+        self.assertIs(percentile_table(), table)
+
+        # 4️⃣ ...solo al refrescarla o cuando caduca
+        refreshed = refresh_percentiles()
+        self.assertEqual(refreshed.lookup(card.position, "pace", card.pace)["cards"], 1)
+        Card.all_objects.filter(position=card.position).update(active=True)
+        self.assertIs(percentile_table(), refreshed)  # sin cambio de versión
+        card.save()
+        with self.settings(PERCENTILES_MAX_AGE=0):
+            recomputed = percentile_table()
+        self.assertIsNot(recomputed, refreshed)
+        self.assertEqual(
+            recomputed.lookup(card.position, "pace", card.pace)["cards"], same_position.count()
+        )
+        print(
+            "✅ test_matches_brute_force_and_refreshes: PASS - Percentiles por posición exactos y precalculados"
+        )
+
+    def test_sees_refresh_from_other_processes(self):
+        import numpy as np
+
+        from api import percentiles
+        from api.percentiles import claim_refresh, compute_table, percentile_table, save_table
+
+        table = percentile_table()
+        card = Card.objects.order_by("id").first()
+
+        # 1️⃣ Otro proceso (el cron) la recalcula: este lo ve sin recalcular
+        Card.objects.filter(position=card.position).exclude(pk=card.pk).update(active=False)
+        save_table(compute_table())
+        with self.assertNumQueries(2):
+            seen = percentile_table()
+        self.assertIsNot(seen, table)
+        self.assertEqual(seen.lookup(card.position, "pace", card.pace)["cards"], 1)
+        with self.assertNumQueries(1):
+            self.assertIs(percentile_table(), seen)
+
+        # 2️⃣ Un proceso nuevo carga la guardada en vez de calcularla
+        percentiles._local.table = None
+        with self.assertNumQueries(2):
+            loaded = percentile_table()
+        self.assertTrue(np.array_equal(loaded.counts, seen.counts))
+        self.assertEqual(loaded.computed_at, seen.computed_at)
+
+        # 3️⃣ Si caduca, solo un proceso se queda con el recálculo
+        self.assertTrue(claim_refresh(loaded))
+        self.assertFalse(claim_refresh(loaded))
+        print("✅ test_sees_refresh_from_other_processes: PASS - Tabla de percentiles compartida entre procesos")
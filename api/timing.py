@@ -0,0 +1,222 @@
+import math
+import random
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+# Tiempos por petición (cabecera Server-Timing)
+#
+# Con REQUEST_TIMING activado, una de cada 1/REQUEST_TIMING_SAMPLE_RATE
+# peticiones mide:
+#   - db: número de consultas SQL y tiempo en la base de datos (execute_wrapper
+#     en todas las conexiones, también las de los hilos de sync_to_async)
+#   - serializer: tiempo en to_representation de los serializers de la API
+#   - view: la vista y el renderizado de la respuesta
+#   - total: la petición entera a partir de este middleware
+# Se envían en la cabecera Server-Timing (la muestran las devtools del
+# navegador) y se acumulan por ruta en memoria (GET /timing/stats/). Las
+# peticiones no muestreadas solo cuestan un random().
+
+DEFAULT_SAMPLE_RATE = 1.0
+LATENCY_WINDOW = 1000  # últimas latencias guardadas por ruta para los percentiles
+
+
+def percentile(values, pct):
+    """Percentil ``pct`` (0-100) de una lista ya ordenada (método nearest-rank)."""
+    if not values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100 * len(values)))
+    return values[min(rank, len(values)) - 1]
+
+
+class RequestTimings:
+    def __init__(self):
+        self.queries = 0
+        self.db = 0.0
+        self.serializer = 0.0
+        self.serializer_depth = 0
+        self.view_started = None
+
+
+# Objeto mutable: lo que se suma en los hilos de sync_to_async se ve aquí
+_current = ContextVar("request_timings", default=None)
+
+
+def record_query(execute, sql, params, many, context):
+    """execute_wrapper: cuenta la consulta si la petición en curso se mide."""
+    timings = _current.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.db += time.perf_counter() - start
+        timings.queries += 1
+
+
+def install_query_wrapper(connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+class TimedRepresentationMixin:
+    """
+    Suma el tiempo de ``to_representation`` a la petición medida. Solo cuenta
+    el serializer más externo: los anidados ya están dentro de su tiempo.
+    """
+
+    def to_representation(self, instance):
+        timings = _current.get()
+        if timings is None:
+            return super().to_representation(instance)
+        timings.serializer_depth += 1
+        start = time.perf_counter()
+        try:
+            return super().to_representation(instance)
+        finally:
+            timings.serializer_depth -= 1
+            if not timings.serializer_depth:
+                timings.serializer += time.perf_counter() - start
+
+
+class RouteStats:
+    """Tiempos acumulados por ruta (método + patrón de URL) en este proceso."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self._routes = {}
+
+    def add(self, route, total, timings):
+        with self._lock:
+            stats = self._routes.get(route)
+            if stats is None:
+                stats = self._routes[route] = {
+                    "requests": 0,
+                    "queries": 0,
+                    "total": 0.0,
+                    "db": 0.0,
+                    "serializer": 0.0,
+                    "max": 0.0,
+                    "latencies": deque(maxlen=LATENCY_WINDOW),
+                }
+            stats["requests"] += 1
+            stats["queries"] += timings.queries
+            stats["total"] += total
+            stats["db"] += timings.db
+            stats["serializer"] += timings.serializer
+            stats["max"] = max(stats["max"], total)
+            stats["latencies"].append(total)
+
+    def as_dict(self):
+        """Medias en milisegundos; p50/p95 sobre las últimas LATENCY_WINDOW peticiones."""
+        with self._lock:
+            routes = {
+                route: dict(stats, latencies=sorted(stats["latencies"]))
+                for route, stats in self._routes.items()
+            }
+        result = {}
+        for route, stats in sorted(routes.items()):
+            n = stats["requests"]
+            result[route] = {
+                "requests": n,
+                "avg_queries": round(stats["queries"] / n, 2),
+                "avg_ms": round(stats["total"] / n * 1000, 3),
+                "avg_db_ms": round(stats["db"] / n * 1000, 3),
+                "avg_serializer_ms": round(stats["serializer"] / n * 1000, 3),
+                "p50_ms": round(percentile(stats["latencies"], 50) * 1000, 3),
+                "p95_ms": round(percentile(stats["latencies"], 95) * 1000, 3),
+                "max_ms": round(stats["max"] * 1000, 3),
+            }
+        return result
+
+
+route_stats = RouteStats()
+
+
+def route_name(request):
+    match = getattr(request, "resolver_match", None)
+    pattern = match.route if match is not None else "<sin ruta>"
+    return f"{request.method} /{pattern}"
+
+
+def server_timing(total, timings, view):
+    return ", ".join(
+        [
+            f'db;dur={timings.db * 1000:.2f};desc="{timings.queries} consultas"',
+            f"serializer;dur={timings.serializer * 1000:.2f}",
+            f"view;dur={view * 1000:.2f}",
+            f"total;dur={total * 1000:.2f}",
+        ]
+    )
+
+
+class ServerTimingMiddleware:
+    """
+    Middleware opcional (REQUEST_TIMING). Va al principio de MIDDLEWARE para
+    que ``total`` incluya al resto de middlewares.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, "REQUEST_TIMING", False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.sample_rate = getattr(settings, "REQUEST_TIMING_SAMPLE_RATE", DEFAULT_SAMPLE_RATE)
+        # Las conexiones que ya existen y las que se abran después (otros hilos)
+        connection_created.connect(install_query_wrapper, dispatch_uid="api.timing")
+        for connection in connections.all(initialized_only=True):
+            install_query_wrapper(connection)
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if random.random() >= self.sample_rate:
+            return self.get_response(request)
+        token = _current.set(RequestTimings())
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+            return self.finish(request, response, start)
+        finally:
+            _current.reset(token)
+
+    async def __acall__(self, request):
+        if random.random() >= self.sample_rate:
+            return await self.get_response(request)
+        token = _current.set(RequestTimings())
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+            return self.finish(request, response, start)
+        finally:
+            _current.reset(token)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        timings = _current.get()
+        if timings is not None:
+            timings.view_started = time.perf_counter()
+        return None
+
+    def finish(self, request, response, start):
+        end = time.perf_counter()
+        timings = _current.get()
+        total = end - start
+        view = end - timings.view_started if timings.view_started is not None else 0.0
+        response["Server-Timing"] = server_timing(total, timings, view)
+        route_stats.add(route_name(request), total, timings)
+        return response
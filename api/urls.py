@@ -1,5 +1,5 @@
 from django.urls import path
-from . import views
+from . import async_views, views
 
 urlpatterns = [
     # Endpoints
@@ -15,6 +15,14 @@ urlpatterns = [
         views.CardRetrieveUpdateDestroy.as_view(),
         name="card-retrieve-update-destroy",
     ),
+    path("cards/<int:pk>/similar/", views.CardSimilar.as_view(), name="card-similar"),
+    path(
+        "cards/<int:pk>/percentiles/", views.CardPercentiles.as_view(), name="card-percentiles"
+    ),
+    path("cards/bulk/", views.CardBulk.as_view(), name="card-bulk"),
+    path("cards/export/", views.CardExport.as_view(), name="card-export"),
+    path("cards/cache/stats/", views.CardCacheStats.as_view(), name="card-cache-stats"),
+    path("squad/build/", views.SquadBuild.as_view(), name="squad-build"),
     path("teams/", views.TeamListCreate.as_view(), name="team-list-create"),
     path(
         "teams/<int:pk>/",
@@ -22,4 +30,23 @@ urlpatterns = [
         name="team-retrieve-update-destroy",
     ),
     path("users/<int:pk>/team/", views.UserTeamView.as_view(), name="user-team-view"),
+    path("users/<int:pk>/rank/", views.UserRank.as_view(), name="user-rank"),
+    path(
+        "users/<int:pk>/team/percentiles/",
+        views.UserTeamPercentiles.as_view(),
+        name="user-team-percentiles",
+    ),
+    path("leaderboard/", views.LeaderboardView.as_view(), name="leaderboard"),
+    path("timing/stats/", views.TimingStats.as_view(), name="timing-stats"),
+    path("metrics/", views.Metrics.as_view(), name="metrics"),
+    path("profiles/", views.ProfileList.as_view(), name="profile-list"),
+    path(
+        "profiles/<str:profile_id>/<str:kind>/",
+        views.ProfileDownload.as_view(),
+        name="profile-download",
+    ),
+    # Ruta de lectura asíncrona (ASGI), mismas respuestas que las de arriba
+    path("async/cards/", async_views.card_list, name="async-card-list"),
+    path("async/cards/<int:pk>/", async_views.card_detail, name="async-card-detail"),
+    path("async/users/<int:pk>/team/", async_views.user_team, name="async-user-team"),
 ]
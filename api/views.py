@@ -1,35 +1,131 @@
+from django.conf import settings
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
 from django.shortcuts import render
+from django.utils import timezone
 from rest_framework import generics, status
+from rest_framework.exceptions import ValidationError
+from rest_framework.views import APIView
 from .serializers import *
 from .models import *
+from django.db.models import Max
+from .cache import (
+    CardCacheMixin,
+    card_cache_stats,
+    catalogue_version,
+    memoize_for_versions,
+    model_versions,
+    version_time,
+)
+from .conditional import ConditionalGetMixin, latest
+from .export import DEFAULT_CHUNK_SIZE, stream_cards
+from .filters import card_queryset, filter_cards, parse_int
+from .metrics import exposition
+from .leaderboard import leaderboard
+from .pagination import CardKeysetPagination
+from .percentiles import percentile_table
+from .profiling import FILES, authorized, list_profiles, profile_path
+from .renderers import CSVRenderer, NDJSONRenderer
+from .serializers import card_pk
+from .signals import cards_changed
+from .similarity import DEFAULT_K, MAX_K, similarity_index
+from .squad import POSITION_GROUPS, SquadBuilder
+from .timing import route_stats
 from rest_framework.response import Response
 
 
+def user_list_validators():
+    """
+    Validadores de los listados de usuarios: cada usuario lleva su equipo y
+    sus cartas, así que cuenta la última modificación de las tres tablas. Los
+    contadores de versión detectan además los borrados, también en la fecha.
+    """
+    versions = model_versions("users", "teams", "cards")
+    last_modified = memoize_for_versions(
+        "users:last_modified",
+        versions,
+        lambda: latest(
+            User.objects.aggregate(last=Max("updated_at"))["last"],
+            Team.objects.aggregate(last=Max("updated_at"))["last"],
+            Card.all_objects.aggregate(last=Max("updated_at"))["last"],
+            *map(version_time, versions),
+        ),
+    )
+    return versions, last_modified
+
+
 # Views para listar todos los usuarios y crear uno nuevo
-class UserListCreate(generics.ListCreateAPIView):
-    queryset = User.objects.all()
+class UserListCreate(ConditionalGetMixin, generics.ListCreateAPIView):
+    queryset = User.objects.with_team()
     serializer_class = UserSerializer
 
+    def get_validators(self, request, *args, **kwargs):
+        return user_list_validators()
+
 
 # Views para obtener, actualizar o eliminar un usuario específico
-class UserRetrieveUpdateDestroy(generics.RetrieveUpdateDestroyAPIView):
-    queryset = User.objects.all()
+class UserRetrieveUpdateDestroy(ConditionalGetMixin, generics.RetrieveUpdateDestroyAPIView):
+    queryset = User.objects.with_team()
     serializer_class = UserSerializer
     lookup_field = "pk"
 
+    def get_validators(self, request, *args, **kwargs):
+        # Una sola consulta: usuario, su equipo y las cartas del equipo
+        dates = User.objects.filter(pk=kwargs.get("pk")).aggregate(
+            user_updated=Max("updated_at"),
+            team_updated=Max("team__updated_at"),
+            cards_updated=Max("team__cards__updated_at"),
+        )
+        if dates["user_updated"] is None:
+            return None
+        last_modified = latest(*dates.values())
+        return tuple(dates.values()), last_modified
 
-# Views para listar todas las tarjetas y crear una nueva
-class CardListCreate(generics.ListCreateAPIView):
-    queryset = Card.objects.all()
+
+# Views para listar todas las tarjetas y crear una nueva (GET cacheado)
+class CardListCreate(ConditionalGetMixin, CardCacheMixin, generics.ListCreateAPIView):
+    queryset = Card.objects.all()  # solo activas, salvo ?active= (ver card_queryset)
     serializer_class = CardSerializer
+    pagination_class = CardKeysetPagination
+
+    def get_validators(self, request, *args, **kwargs):
+        # MAX(updated_at) se resuelve con el índice y se calcula una vez por
+        # versión del catálogo. Un borrado (o archive_cards) no sube MAX(updated_at),
+        # pero sí la versión: la fecha de la versión cuenta también
+        version = self.request_catalogue_version()
+        last_modified = memoize_for_versions(
+            "cards:last_modified",
+            (version,),
+            lambda: latest(
+                Card.all_objects.aggregate(last=Max("updated_at"))["last"], version_time(version)
+            ),
+        )
+        return version, last_modified
 
+    def get_queryset(self):
+        # Filtros por igualdad y rangos de la query string (ver api/filters.py)
+        params = self.request.query_params
+        return filter_cards(card_queryset(params), params)
 
-# Views para obtener, actualizar o eliminar una tarjeta específica
-class CardRetrieveUpdateDestroy(generics.RetrieveUpdateDestroyAPIView):
-    queryset = Card.objects.all()
+
+# Views para obtener, actualizar o eliminar una tarjeta específica (GET cacheado)
+class CardRetrieveUpdateDestroy(
+    ConditionalGetMixin, CardCacheMixin, generics.RetrieveUpdateDestroyAPIView
+):
+    # Las cartas borradas se siguen pudiendo consultar (con active=False)
+    queryset = Card.all_objects.all()
     serializer_class = CardSerializer
     lookup_field = "pk"
 
+    def get_validators(self, request, *args, **kwargs):
+        updated_at = (
+            Card.all_objects.filter(pk=kwargs.get("pk"))
+            .values_list("updated_at", flat=True)
+            .first()
+        )
+        if updated_at is None:
+            return None
+        return updated_at, updated_at
+
     def destroy(self, request, *args, **kwargs):
         card = self.get_object()
 
@@ -47,11 +143,352 @@ class CardRetrieveUpdateDestroy(generics.RetrieveUpdateDestroyAPIView):
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
+# View para crear, actualizar o desactivar muchas cartas en una petición
+class CardBulk(generics.GenericAPIView):
+    """
+    Operaciones masivas sobre cartas. El body es una lista:
+    - POST: cartas nuevas (mismo formato que POST /cards/)
+    - PATCH: cambios parciales, cada elemento con su ``id``
+    - DELETE: ids de las cartas a desactivar
+
+    Los elementos válidos se guardan con bulk_create/bulk_update y los que
+    tienen errores se devuelven en ``errors`` con su posición en la lista.
+    """
+
+    # También las borradas: un PATCH con active=true las recupera
+    queryset = Card.all_objects.all()
+    serializer_class = CardSerializer
+
+    def get_items(self, request):
+        items = request.data
+        if not isinstance(items, list):
+            raise ValidationError({"detail": "Se esperaba una lista."})
+        max_items = getattr(settings, "CARD_BULK_MAX_ITEMS", 1000)
+        if len(items) > max_items:
+            raise ValidationError(
+                {"detail": f"Como máximo {max_items} elementos por petición."}
+            )
+        return items
+
+    def bulk_response(self, results, errors, success_status):
+        # 207 si solo se ha guardado una parte del lote, 400 si ninguna
+        if not errors:
+            code = success_status
+        elif results:
+            code = status.HTTP_207_MULTI_STATUS
+        else:
+            code = status.HTTP_400_BAD_REQUEST
+        return Response({"results": results, "errors": errors}, status=code)
+
+    def post(self, request, *args, **kwargs):
+        items = self.get_items(request)
+        serializer = self.get_serializer(data=items, many=True)
+        valid, errors = serializer.partition(items)
+
+        cards = serializer.create([data for _, _, data in valid])
+        results = CardSerializer(cards, many=True).data
+        return self.bulk_response(results, errors, status.HTTP_201_CREATED)
+
+    def patch(self, request, *args, **kwargs):
+        items = self.get_items(request)
+        ids = {card_pk(item.get("id")) for item in items if isinstance(item, dict)}
+        instances = self.get_queryset().in_bulk(ids - {None})
+
+        serializer = self.get_serializer(data=items, many=True, partial=True)
+        valid, errors = serializer.partition(items, instances=instances)
+
+        # Un id repetido en el lote se aplicaría dos veces sobre el mismo objeto
+        seen, unique = set(), []
+        for index, card, data in valid:
+            if card.pk in seen:
+                errors.append({"index": index, "errors": {"id": ["Id repetido en el lote."]}})
+            else:
+                seen.add(card.pk)
+                unique.append((card, data))
+        errors.sort(key=lambda error: error["index"])
+
+        cards = serializer.update([card for card, _ in unique], [data for _, data in unique])
+        results = CardSerializer(cards, many=True).data
+        return self.bulk_response(results, errors, status.HTTP_200_OK)
+
+    def delete(self, request, *args, **kwargs):
+        items = self.get_items(request)
+        pks = [card_pk(item) for item in items]
+        existing = set(
+            self.get_queryset().filter(pk__in=set(pks) - {None}).values_list("pk", flat=True)
+        )
+        # Igual que DELETE /cards/<pk>/: no se desactivan cartas usadas en equipos
+        in_teams = set(
+            Team.cards.through.objects.filter(card_id__in=existing).values_list(
+                "card_id", flat=True
+            )
+        )
+
+        to_deactivate, errors = [], []
+        for index, pk in enumerate(pks):
+            if pk not in existing:
+                errors.append({"index": index, "errors": {"id": ["No existe ninguna carta con ese id."]}})
+            elif pk in in_teams:
+                errors.append(
+                    {"index": index, "errors": {"id": ["Cannot delete card because it is used in a team."]}}
+                )
+            else:
+                to_deactivate.append(pk)
+
+        if to_deactivate:
+            # queryset.update no aplica auto_now ni lanza post_save
+            Card.all_objects.filter(pk__in=to_deactivate).update(
+                active=False, updated_at=timezone.now()
+            )
+            cards_changed.send(sender=Card, card_ids=to_deactivate)
+        return self.bulk_response(sorted(set(to_deactivate)), errors, status.HTTP_200_OK)
+
+
+# View con las cartas más parecidas a una dada (índice en memoria, api/similarity.py)
+class CardSimilar(APIView):
+    """
+    GET /cards/<pk>/similar/?k=20&group=DEF&league=...: las ``k`` cartas
+    activas con las stats más parecidas, de la más a la menos parecida, con
+    su distancia. ``group`` (GK, DEF, MID, FWD) y ``league`` limitan la búsqueda.
+    """
+
+    def get(self, request, *args, **kwargs):
+        params = request.query_params
+        k = parse_int("k", params.get("k", DEFAULT_K))
+        if not 1 <= k <= MAX_K:
+            raise ValidationError({"k": f"Debe estar entre 1 y {MAX_K}."})
+        group = params.get("group")
+        if group is not None and group not in POSITION_GROUPS:
+            raise ValidationError({"group": f"Opciones: {', '.join(POSITION_GROUPS)}"})
+        league = params.get("league")
+
+        # La carta de referencia puede estar borrada; las parecidas no
+        card = Card.all_objects.filter(pk=kwargs.get("pk")).first()
+        if card is None:
+            return Response({"error": "Carta no encontrada"}, status=status.HTTP_404_NOT_FOUND)
+
+        results = similarity_index.similar(card, k, group=group, league=league)
+        cards = Card.objects.in_bulk([card_id for card_id, _ in results])
+        gone = [card_id for card_id, _ in results if card_id not in cards]
+        if gone:
+            # El índice iba por detrás (una escritura que no subió la versión):
+            # se quitan las que ya no están activas y se busca otra vez
+            similarity_index.cards_gone(gone)
+            results = similarity_index.similar(card, k, group=group, league=league)
+            cards = Card.objects.in_bulk([card_id for card_id, _ in results])
+        found = [(cards[card_id], distance) for card_id, distance in results if card_id in cards]
+        # Un solo serializer para todas (many=True): uno por carta costaba más
+        # que la búsqueda en el índice
+        data = CardSerializer([similar for similar, _ in found], many=True).data
+        return Response(
+            {
+                "card_id": card.pk,
+                "group": group,
+                "league": league,
+                "results": [
+                    {**row, "distance": round(distance, 4)}
+                    for row, (_, distance) in zip(data, found)
+                ],
+            }
+        )
+
+
+# Views con los percentiles de una carta o de las cartas de un equipo frente a
+# las cartas activas de su misma posición (tabla precalculada, api/percentiles.py)
+class CardPercentiles(APIView):
+    def get(self, request, *args, **kwargs):
+        card = Card.all_objects.filter(pk=kwargs.get("pk")).first()
+        if card is None:
+            return Response({"error": "Carta no encontrada"}, status=status.HTTP_404_NOT_FOUND)
+        table = percentile_table()
+        return Response(
+            {
+                "card_id": card.pk,
+                "name": card.name,
+                "position": card.position,
+                "computed_at": table.computed_at,
+                "percentiles": table.card(card),
+            }
+        )
+
+
+class UserTeamPercentiles(APIView):
+    def get(self, request, *args, **kwargs):
+        user = User.objects.filter(pk=kwargs.get("pk")).first()
+        if user is None:
+            return Response({"error": "Usuario no encontrado"}, status=status.HTTP_404_NOT_FOUND)
+        if user.team_id is None:
+            return Response(
+                {"error": "Este usuario no tiene equipo"}, status=status.HTTP_404_NOT_FOUND
+            )
+
+        table = percentile_table()
+        cards = Card.objects.filter(teams=user.team_id).order_by("id")
+        return Response(
+            {
+                "user_id": user.pk,
+                "team_id": user.team_id,
+                "computed_at": table.computed_at,
+                "cards": [
+                    {
+                        "id": card.pk,
+                        "name": card.name,
+                        "position": card.position,
+                        "percentiles": table.card(card),
+                    }
+                    for card in cards
+                ],
+            }
+        )
+
+
+# View que genera la mejor plantilla legal con las cartas activas
+class SquadBuild(generics.GenericAPIView):
+    """
+    POST con restricciones opcionales (ver SquadBuildSerializer). Devuelve las
+    cartas elegidas y sus ids, listos para POST /users/<pk>/team/.
+    """
+
+    serializer_class = SquadBuildSerializer
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        options = serializer.validated_data
+
+        builder = SquadBuilder(
+            max_per_club=options.get("max_per_club"),
+            max_per_league=options.get("max_per_league"),
+            required=options["required_cards"],
+            excluded=options["excluded_cards"],
+        )
+        cards = builder.build()
+        return Response(
+            {
+                **builder.summary(),
+                "card_ids": [card.pk for card in cards],
+                "cards": CardSerializer(cards, many=True).data,
+            }
+        )
+
+
+# View para exportar el catálogo completo en streaming (NDJSON o CSV)
+class CardExport(generics.GenericAPIView):
+    """
+    Devuelve las cartas activas (admite los mismos filtros que /cards/,
+    también ?active=false) sin paginar y sin cargarlas en memoria. Formato con ?format=ndjson|csv o con
+    la cabecera Accept; por defecto NDJSON.
+    """
+
+    queryset = Card.objects.all()
+    renderer_classes = [NDJSONRenderer, CSVRenderer]
+    pagination_class = None
+
+    def get(self, request, *args, **kwargs):
+        params = request.query_params
+        queryset = filter_cards(card_queryset(params), params).order_by("id")
+        renderer = request.accepted_renderer
+        chunk_size = getattr(settings, "CARD_EXPORT_CHUNK_SIZE", DEFAULT_CHUNK_SIZE)
+
+        response = StreamingHttpResponse(
+            stream_cards(queryset, renderer.format, chunk_size),
+            content_type=f"{renderer.media_type}; charset=utf-8",
+        )
+        response["Content-Disposition"] = f'attachment; filename="cards.{renderer.format}"'
+        return response
+
+
+# View con los contadores de la caché de cartas de este proceso
+class CardCacheStats(APIView):
+    def get(self, request, *args, **kwargs):
+        return Response({**card_cache_stats.as_dict(), "version": catalogue_version()})
+
+
+# View con los tiempos acumulados por ruta de este proceso (REQUEST_TIMING)
+class TimingStats(APIView):
+    def get(self, request, *args, **kwargs):
+        return Response(
+            {
+                "enabled": getattr(settings, "REQUEST_TIMING", False),
+                "sample_rate": getattr(settings, "REQUEST_TIMING_SAMPLE_RATE", 1.0),
+                "routes": route_stats.as_dict(),
+            }
+        )
+
+
+# View con las métricas de todos los procesos en formato Prometheus
+# (METRICS_ENABLED). Desactivadas, responde 404.
+class Metrics(APIView):
+    def get(self, request, *args, **kwargs):
+        if not getattr(settings, "METRICS_ENABLED", False):
+            raise Http404
+        return HttpResponse(exposition(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+# Views para listar y descargar los perfiles de peticiones (REQUEST_PROFILING).
+# Sin el secreto en X-Profile responden 404, como si no existieran.
+class ProfileList(APIView):
+    def get(self, request, *args, **kwargs):
+        if not authorized(request):
+            raise Http404
+        return Response({"results": list_profiles()})
+
+
+class ProfileDownload(APIView):
+    def get(self, request, *args, **kwargs):
+        if not authorized(request):
+            raise Http404
+        path = profile_path(kwargs["profile_id"], kwargs["kind"])
+        if path is None or not path.exists():
+            raise Http404
+        return FileResponse(
+            open(path, "rb"),
+            as_attachment=True,
+            filename=path.name,
+            content_type=FILES[kwargs["kind"]][1],
+        )
+
+
+# View con el ranking de equipos (top-K) servido desde memoria
+class LeaderboardView(APIView):
+    default_limit = 10
+    max_limit = 100
+
+    def get(self, request, *args, **kwargs):
+        limit = parse_int("limit", request.query_params.get("limit", self.default_limit))
+        offset = parse_int("offset", request.query_params.get("offset", 0))
+        if limit < 1 or offset < 0:
+            raise ValidationError({"detail": "limit debe ser mayor que 0 y offset no negativo."})
+
+        results = leaderboard.top(min(limit, self.max_limit), offset)
+        return Response({"count": len(leaderboard), "results": results})
+
+
+# View con el puesto del equipo de un usuario en el ranking
+class UserRank(APIView):
+    def get(self, request, *args, **kwargs):
+        team_id = User.objects.filter(pk=kwargs.get("pk")).values_list("team_id", flat=True)
+        if not team_id:
+            return Response(
+                {"error": "Usuario no encontrado"}, status=status.HTTP_404_NOT_FOUND
+            )
+        entry = leaderboard.team_entry(team_id[0]) if team_id[0] else None
+        if entry is None:
+            return Response(
+                {"error": "Este usuario no tiene equipo"},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+        return Response({"user_id": kwargs.get("pk"), "total_teams": len(leaderboard), **entry})
+
+
 # Views para listar todos los equipos y crear uno nuevo
-class TeamListCreate(generics.ListCreateAPIView):
-    queryset = User.objects.all()
+class TeamListCreate(ConditionalGetMixin, generics.ListCreateAPIView):
+    queryset = User.objects.with_team()
     serializer_class = UserSerializer
 
+    def get_validators(self, request, *args, **kwargs):
+        return user_list_validators()
+
 
 # Views para obtener, actualizar o eliminar un equipo específico
 class TeamRetrieveUpdateDestroy(generics.RetrieveUpdateDestroyAPIView):
@@ -60,7 +497,7 @@ class TeamRetrieveUpdateDestroy(generics.RetrieveUpdateDestroyAPIView):
     lookup_field = "pk"
 
 
-class UserTeamView(generics.GenericAPIView):
+class UserTeamView(ConditionalGetMixin, generics.GenericAPIView):
     """
     Gestiona el equipo de un usuario:
     - GET: devuelve el equipo completo del usuario (con cartas)
@@ -71,16 +508,34 @@ class UserTeamView(generics.GenericAPIView):
     queryset = Team.objects.all()
     serializer_class = TeamSerializer
 
-    def get_user(self):
+    def get_user(self, with_cards=False):
         user_id = self.kwargs.get("pk")
+        # Para leer se precargan equipo y cartas activas; al escribir no, porque
+        # las cartas precargadas quedarían desfasadas tras guardar
+        queryset = User.objects.with_team() if with_cards else User.objects.all()
         try:
-            return User.objects.get(pk=user_id)
+            return queryset.get(pk=user_id)
         except User.DoesNotExist:
             return None
 
+    def get_validators(self, request, *args, **kwargs):
+        # Una sola consulta: el equipo del usuario y sus cartas
+        dates = User.objects.filter(pk=kwargs.get("pk")).aggregate(
+            team_updated=Max("team__updated_at"),
+            cards_updated=Max("team__cards__updated_at"),
+        )
+        if dates["team_updated"] is None:
+            return None
+        return tuple(dates.values()), latest(*dates.values())
+
     # GET → obtener el equipo del usuario
     def get(self, request, *args, **kwargs):
-        user = self.get_user()
+        # 304 si el cliente ya tiene la versión actual del equipo
+        not_modified = self.check_not_modified(request, *args, **kwargs)
+        if not_modified is not None:
+            return not_modified
+
+        user = self.get_user(with_cards=True)
         if not user:
             return Response(
                 {"error": "Usuario no encontrado"}, status=status.HTTP_404_NOT_FOUND
@@ -93,7 +548,7 @@ class UserTeamView(generics.GenericAPIView):
             )
 
         serializer = TeamSerializer(user.team)
-        return Response(serializer.data)
+        return self.add_validator_headers(Response(serializer.data))
 
     # POST → crear un nuevo equipo si no tiene
     def post(self, request, *args, **kwargs):
@@ -10,11 +10,18 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import tempfile
 from pathlib import Path
 
+from environs import Env
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
+# Variables de entorno (y fichero .env opcional en la raíz del proyecto)
+env = Env()
+env.read_env(BASE_DIR / '.env', recurse=False)
+
 
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/5.2/howto/deployment/checklist/
@@ -42,13 +49,17 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.metrics.MetricsMiddleware',  # solo con METRICS_ENABLED
+    'api.timing.ServerTimingMiddleware',  # solo con REQUEST_TIMING
     'django.middleware.security.SecurityMiddleware',
+    'api.routers.ReplicaStickinessMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'api.profiling.RequestProfilerMiddleware',  # solo con REQUEST_PROFILING
 ]
 
 ROOT_URLCONF = 'fifaproject.urls'
@@ -74,12 +85,79 @@ WSGI_APPLICATION = 'fifaproject.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# DB_PROFILE elige la configuración de SQLite:
+#   development (por defecto): la de Django, una conexión por petición
+#   production: WAL (los lectores no esperan al escritor), pragmas para
+#     rendimiento y conexiones persistentes
+# Cada valor se puede cambiar por separado con su variable DB_*.
+DB_PROFILE = env.str('DB_PROFILE', 'development')
+if DB_PROFILE not in ('development', 'production'):
+    raise ValueError(f"DB_PROFILE debe ser 'development' o 'production', no {DB_PROFILE!r}")
+
+DB_PROFILES = {
+    'development': {
+        'journal_mode': None,
+        'synchronous': None,
+        'cache_size': None,
+        'mmap_size': None,
+        'busy_timeout': None,
+        'conn_max_age': 0,
+    },
+    'production': {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',  # seguro con WAL; solo se fuerza el fsync en los checkpoints
+        'cache_size': -64000,  # en KiB si es negativo: 64 MB de caché de páginas
+        'mmap_size': 268435456,  # 256 MB leídos con mmap
+        'busy_timeout': 5000,  # ms esperando un bloqueo antes de "database is locked"
+        'conn_max_age': 600,
+    },
+}
+_db = DB_PROFILES[DB_PROFILE]
+
+DB_PRAGMAS = {
+    'journal_mode': env.str('DB_JOURNAL_MODE', _db['journal_mode']),
+    'synchronous': env.str('DB_SYNCHRONOUS', _db['synchronous']),
+    'cache_size': env.int('DB_CACHE_SIZE', _db['cache_size']),
+    'mmap_size': env.int('DB_MMAP_SIZE', _db['mmap_size']),
+    'busy_timeout': env.int('DB_BUSY_TIMEOUT', _db['busy_timeout']),
+}
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'NAME': env.path('DB_NAME', BASE_DIR / 'db.sqlite3'),
+        'CONN_MAX_AGE': env.int('DB_CONN_MAX_AGE', _db['conn_max_age']),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            # Se ejecuta al abrir cada conexión
+            'init_command': ';'.join(
+                f'PRAGMA {name}={value}' for name, value in DB_PRAGMAS.items() if value is not None
+            ),
+        },
     }
 }
+if DB_PROFILE == 'production':
+    # Las transacciones de escritura piden el bloqueo al empezar: sin esto dos
+    # escritores pueden bloquearse mutuamente al pasar de lectura a escritura
+    DATABASES['default']['OPTIONS']['transaction_mode'] = 'IMMEDIATE'
+
+# Réplicas de lectura: DB_REPLICAS=db_replica1.sqlite3,db_replica2.sqlite3
+# Se mantienen copiando el primario con "python manage.py replicate". En los
+# tests apuntan a la base de datos de pruebas del primario (MIRROR).
+DATABASE_REPLICAS = []
+for _index, _path in enumerate(env.list('DB_REPLICAS', []), start=1):
+    _alias = f'replica_{_index}'
+    DATABASES[_alias] = {
+        **DATABASES['default'],
+        'NAME': BASE_DIR / _path,
+        'OPTIONS': dict(DATABASES['default']['OPTIONS']),
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(_alias)
+
+DATABASE_ROUTERS = ['api.routers.PrimaryReplicaRouter']
+# Segundos que un cliente lee del primario después de escribir
+REPLICA_STICKY_SECONDS = env.int('REPLICA_STICKY_SECONDS', 5)
 
 
 # Password validation
@@ -122,3 +200,55 @@ STATIC_URL = 'static/'
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# Django REST Framework
+# Los listados se paginan por cursor (api/pagination.py): sin COUNT(*) y con
+# el mismo coste para cualquier página.
+
+REST_FRAMEWORK = {
+    'DEFAULT_PAGINATION_CLASS': 'api.pagination.KeysetPagination',
+    'PAGE_SIZE': 50,
+}
+
+# Caché
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# Funciona con LocMemCache o FileBasedCache. La caché de respuestas de cartas
+# (api/cache.py) usa el alias CARD_CACHE_ALIAS. No hace falta que sea
+# compartida entre procesos: las versiones que invalidan las respuestas están
+# en la base de datos (modelo DataVersion), así una escritura de cualquier
+# proceso o comando (load_cards, seed...) se ve en todos los demás.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'fifaproject',
+    }
+}
+
+CARD_CACHE_ALIAS = 'default'
+CARD_CACHE_TIMEOUT = 300  # segundos
+CARD_EXPORT_CHUNK_SIZE = 2000  # filas leídas por bloque en /cards/export/
+CARD_BULK_MAX_ITEMS = 1000  # elementos por petición en /cards/bulk/
+LEADERBOARD_SYNC_MARGIN = 5  # segundos de margen al sincronizar el ranking
+LEADERBOARD_FULL_REBUILD_INTERVAL = 300  # segundos entre reconstrucciones completas
+SIMILARITY_SYNC_MARGIN = 5  # segundos de margen al sincronizar el índice de cartas parecidas
+SIMILARITY_FULL_REBUILD_INTERVAL = 3600  # segundos entre reconstrucciones completas
+PERCENTILES_MAX_AGE = 3600  # segundos antes de recalcular los percentiles si el catálogo cambia
+
+# Cabecera Server-Timing y tiempos por ruta (api/timing.py)
+REQUEST_TIMING = env.bool('REQUEST_TIMING', False)
+REQUEST_TIMING_SAMPLE_RATE = env.float('REQUEST_TIMING_SAMPLE_RATE', 1.0)  # 0.01 = 1 de cada 100
+
+# Perfiles bajo demanda con la cabecera X-Profile (api/profiling.py)
+REQUEST_PROFILING = env.bool('REQUEST_PROFILING', False)
+REQUEST_PROFILING_SECRET = env.str('REQUEST_PROFILING_SECRET', '')
+REQUEST_PROFILING_DIR = env.path(
+    'REQUEST_PROFILING_DIR', Path(tempfile.gettempdir()) / 'fifaproject-profiles'
+)
+REQUEST_PROFILING_INTERVAL = env.float('REQUEST_PROFILING_INTERVAL', 0.001)  # segundos entre muestras
+REQUEST_PROFILING_KEEP = env.int('REQUEST_PROFILING_KEEP', 50)  # perfiles guardados
+
+# Métricas de Prometheus en /metrics/ (api/metrics.py). Cada proceso escribe
+# en su fichero de METRICS_DIR; vaciar el directorio al desplegar.
+METRICS_ENABLED = env.bool('METRICS_ENABLED', False)
+METRICS_DIR = env.path('METRICS_DIR', Path(tempfile.gettempdir()) / 'fifaproject-metrics')
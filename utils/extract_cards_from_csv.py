@@ -1,8 +1,16 @@
+import argparse
 import csv
+import hashlib
 import json
+import os
+import shutil
+import tempfile
+from multiprocessing import Pool
 
 INPUT_FILE = "sofifa_players.csv"  # CSV original
-OUTPUT_FILE = "cards_clean.json"  # JSON final (solo los 150 primeros válidos)
+OUTPUT_FILE = "cards_clean.json"  # JSON final (solo los 600 primeros válidos)
+STREAM_OUTPUT_FILE = "cards_clean.ndjson"  # NDJSON del modo streaming (sin límite)
+CHUNK_BYTES = 64 * 1024 * 1024  # Tamaño de cada trozo del CSV en modo streaming
 
 # Campos a conservar (csv_field -> model_field)
 FIELDS = {
@@ -122,14 +130,15 @@ def build_card_from_row(row):
     return card
 
 
-def main():
+def export_json(input_file=INPUT_FILE, output_file=OUTPUT_FILE, limit=600):
+    """Modo original: carga las primeras cartas válidas en memoria y las vuelca a JSON."""
     cards = []
     seen_names = set()
 
-    with open(INPUT_FILE, newline="", encoding="utf-8") as csvfile:
+    with open(input_file, newline="", encoding="utf-8") as csvfile:
         reader = csv.DictReader(csvfile)
         for row in reader:
-            if len(cards) >= 600:
+            if len(cards) >= limit:
                 break
 
             card = build_card_from_row(row)
@@ -143,10 +152,10 @@ def main():
 
             cards.append(card)
 
-    with open(OUTPUT_FILE, "w", encoding="utf-8") as f:
+    with open(output_file, "w", encoding="utf-8") as f:
         json.dump(cards, f, ensure_ascii=False, indent=2)
 
-    print(f"✅ Exported {len(cards)} valid cards to {OUTPUT_FILE}")
+    print(f"✅ Exported {len(cards)} valid cards to {output_file}")
     # resumen por posición
     from collections import Counter
 
@@ -156,5 +165,172 @@ def main():
         print(f"  {pos}: {n}")
 
 
+# -------------------------------
+# Modo streaming (CSV de varios GB)
+# -------------------------------
+#
+# El CSV se parte en rangos de bytes que se procesan en paralelo. Cada worker
+# escribe sus cartas en un fichero NDJSON temporal y el proceso principal los
+# une en orden, así que la memoria no depende del tamaño del CSV: lo único que
+# crece es el conjunto de huellas de nombres para evitar duplicados.
+#
+# Se asume que ningún campo del CSV contiene saltos de línea (como en los
+# volcados de sofifa), ya que los rangos se cortan por líneas.
+
+
+def name_digest(name):
+    """Huella corta del nombre, para deduplicar sin guardar los nombres."""
+    return hashlib.blake2b(name.encode("utf-8"), digest_size=8).hexdigest()
+
+
+def split_ranges(input_file, chunk_bytes=CHUNK_BYTES):
+    """Devuelve la cabecera del CSV y los rangos de bytes (inicio, fin) de los datos."""
+    with open(input_file, "rb") as f:
+        header_line = f.readline()
+        data_start = f.tell()
+        size = os.fstat(f.fileno()).st_size
+
+    fieldnames = next(csv.reader([header_line.decode("utf-8-sig")]))
+    ranges = [
+        (start, min(start + chunk_bytes, size))
+        for start in range(data_start, size, chunk_bytes)
+    ]
+    return fieldnames, data_start, ranges
+
+
+def read_range_lines(input_file, start, end, data_start):
+    """
+    Genera las líneas que empiezan dentro de [start, end). La línea que cruza
+    el inicio del rango pertenece al rango anterior.
+    """
+    with open(input_file, "rb") as f:
+        if start > data_start:
+            f.seek(start - 1)
+            f.readline()
+        else:
+            f.seek(start)
+
+        while f.tell() < end:
+            line = f.readline()
+            if not line:
+                break
+            yield line.decode("utf-8")
+
+
+def process_range(task):
+    """
+    Worker: convierte las filas de un rango en cartas y las escribe en un
+    NDJSON temporal como "huella<TAB>posición<TAB>json". Quita los duplicados del propio
+    rango; los que hay entre rangos se quitan al unir.
+    """
+    input_file, start, end, data_start, fieldnames, part_path = task
+    seen = set()
+    count = 0
+
+    lines = read_range_lines(input_file, start, end, data_start)
+    with open(part_path, "w", encoding="utf-8") as out:
+        for values in csv.reader(lines):
+            card = build_card_from_row(dict(zip(fieldnames, values)))
+            if not card:
+                continue  # posición inválida o faltante
+
+            digest = name_digest(card["name"])
+            if digest in seen:
+                continue
+            seen.add(digest)
+
+            card_json = json.dumps(card, ensure_ascii=False)
+            out.write(f"{digest}\t{card['position']}\t{card_json}\n")
+            count += 1
+
+    return part_path, count
+
+
+def export_ndjson(
+    input_file=INPUT_FILE,
+    output_file=STREAM_OUTPUT_FILE,
+    workers=None,
+    chunk_bytes=CHUNK_BYTES,
+    limit=None,
+):
+    """
+    Modo streaming: procesa el CSV por rangos en un pool de procesos y escribe
+    las cartas en NDJSON a medida que los rangos terminan, en el orden del
+    fichero. Devuelve el número de cartas exportadas y su recuento por posición.
+    """
+    from collections import Counter
+
+    fieldnames, data_start, ranges = split_ranges(input_file, chunk_bytes)
+    seen = set()
+    cnt = Counter()
+    exported = 0
+
+    tmp_dir = tempfile.mkdtemp(
+        prefix="cards_parts_", dir=os.path.dirname(os.path.abspath(output_file))
+    )
+    try:
+        tasks = [
+            (input_file, start, end, data_start, fieldnames, os.path.join(tmp_dir, f"{i}.ndjson"))
+            for i, (start, end) in enumerate(ranges)
+        ]
+        with Pool(processes=workers) as pool, open(output_file, "w", encoding="utf-8") as out:
+            # imap mantiene el orden de los rangos, así gana la primera aparición
+            # de cada nombre igual que en el modo original
+            for part_path, _ in pool.imap(process_range, tasks):
+                with open(part_path, encoding="utf-8") as part:
+                    for line in part:
+                        if limit is not None and exported >= limit:
+                            break
+                        digest, position, card_json = line.rstrip("\n").split("\t", 2)
+                        if digest in seen:
+                            continue
+                        seen.add(digest)
+
+                        out.write(card_json + "\n")
+                        cnt[position] += 1
+                        exported += 1
+                os.remove(part_path)
+
+                if limit is not None and exported >= limit:
+                    break
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    return exported, cnt
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Extrae cartas del CSV de sofifa.")
+    parser.add_argument("--input", default=INPUT_FILE, help="CSV de entrada")
+    parser.add_argument("--output", default=None, help="Fichero de salida")
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Modo streaming: NDJSON en paralelo y sin límite de cartas",
+    )
+    parser.add_argument("--workers", type=int, default=None, help="Procesos del pool (por defecto, uno por CPU)")
+    parser.add_argument("--chunk-mb", type=int, default=CHUNK_BYTES // (1024 * 1024), help="Tamaño de cada rango en MB")
+    parser.add_argument("--limit", type=int, default=None, help="Máximo de cartas (600 en el modo JSON)")
+    args = parser.parse_args()
+
+    if not args.stream:
+        export_json(args.input, args.output or OUTPUT_FILE, 600 if args.limit is None else args.limit)
+        return
+
+    output_file = args.output or STREAM_OUTPUT_FILE
+    exported, cnt = export_ndjson(
+        args.input,
+        output_file,
+        workers=args.workers,
+        chunk_bytes=args.chunk_mb * 1024 * 1024,
+        limit=args.limit,
+    )
+
+    print(f"✅ Exported {exported} valid cards to {output_file}")
+    print("Position counts:")
+    for pos, n in cnt.most_common():
+        print(f"  {pos}: {n}")
+
+
 if __name__ == "__main__":
     main()